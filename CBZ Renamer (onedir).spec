@@ -0,0 +1,49 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Fast-start build: a folder instead of a single exe, and no UPX.
+# The one-file build unpacks itself to a temp folder and UPX-decompresses its DLLs
+# on every launch; this one starts straight from dist/CBZ Renamer/.
+#     pyinstaller "CBZ Renamer (onedir).spec"
+
+
+a = Analysis(
+    ['cbz_file_renamer.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('app_icon.ico', '.'), ('app_icon.png', '.')],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='CBZ Renamer',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=['app_icon.ico'],
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='CBZ Renamer',
+)
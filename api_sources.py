@@ -1,95 +1,313 @@
 import re
-import json
 import os
 import time
-import urllib.request
 import urllib.parse
 import urllib.error
+from collections import namedtuple
+from contextlib import contextmanager
 
+import scan_metrics
+from lookup_cache import SqliteCache, CachePolicy, import_json_cache
+from rate_limit import SCHEDULER, PRIORITY_SCAN, parse_retry_after
+from http_pool import HTTP
+from title_format import extract_series_from_title
 
-def _extract_series_from_title(title, search_term):
-    """Extract (series, raw_title, subtitle, orig_separator) from a book/comic title string.
 
-    Returns:
-        series: The clean series name (e.g. "Berserk")
-        raw_title: The original unmodified title from the API (e.g. "Berserk Volume 1")
-        subtitle: Subtitle text if present (e.g. "The Black Swordsman"), or None
-        orig_sep: The separator used before the subtitle in the source (": " or " - ")
+# Bump whenever the matching rules below (or title_format.extract_series_from_title)
+# change, so cached results produced by the old rules are treated as stale instead
+# of being served forever.
+MATCH_RULES_VERSION = 1
+
+
+def _issue_key(issue_number):
+    """Normalize an issue/volume number for lookups ("001" -> "1", "1.5" stays "1.5")."""
+    issue_number = str(issue_number or "").strip()
+    try:
+        return str(int(issue_number))
+    except ValueError:
+        return issue_number
+
+
+# ─── Endpoints ────────────────────────────────────────────────────────────────
+
+GOOGLE_BOOKS_DEFAULT_URL = "https://www.googleapis.com/books/v1"
+COMICVINE_DEFAULT_URL = "https://comicvine.gamespot.com/api"
+GOOGLE_BOOKS_URL_ENV = "CBZ_RENAMER_GOOGLE_BOOKS_URL"
+COMICVINE_URL_ENV = "CBZ_RENAMER_COMICVINE_URL"
+
+GOOGLE_BOOKS_API_URL = (os.environ.get(GOOGLE_BOOKS_URL_ENV) or GOOGLE_BOOKS_DEFAULT_URL).rstrip("/")
+COMICVINE_API_URL = (os.environ.get(COMICVINE_URL_ENV) or COMICVINE_DEFAULT_URL).rstrip("/")
+
+
+def set_api_urls(google_books=None, comicvine=None):
+    """Point the fetchers at other base URLs, e.g. benchmarks/mock_api_server.py.
+
+    Empty values fall back to the CBZ_RENAMER_GOOGLE_BOOKS_URL / CBZ_RENAMER_COMICVINE_URL
+    environment variables, then to the public APIs.
     """
-    clean = re.split(r'[,:\-]?\s*(?:Vol\.?|Volume|v\.)\s*\d', title, maxsplit=1, flags=re.IGNORECASE)[0]
-    clean = re.split(r'[,:\-]?\s*(?:Chapter|Ch\.?)\s*\d', clean, maxsplit=1, flags=re.IGNORECASE)[0]
-    clean = re.sub(r'\s+\d+\s*$', '', clean)
-    clean = clean.strip(' ,:-')
-    if not clean:
-        return None, None, None, None
+    global GOOGLE_BOOKS_API_URL, COMICVINE_API_URL
+    GOOGLE_BOOKS_API_URL = (google_books or os.environ.get(GOOGLE_BOOKS_URL_ENV)
+                            or GOOGLE_BOOKS_DEFAULT_URL).rstrip("/")
+    COMICVINE_API_URL = (comicvine or os.environ.get(COMICVINE_URL_ENV) or COMICVINE_DEFAULT_URL).rstrip("/")
+
+
+# ─── Requests ─────────────────────────────────────────────────────────────────
+
+# Seconds one HTTP request may take
+REQUEST_TIMEOUT = 10
+
+GOOGLE_BOOKS_HEADERS = {'User-Agent': 'PythonRenamer/1.0'}
+COMICVINE_HEADERS = {'User-Agent': 'CBZRenamer/1.0', 'Accept': 'application/json'}
+
+# One GET a fetcher needs. The fetchers are written as step generators that yield
+# ApiCall and are sent back the decoded JSON (or None if the request failed), so the
+# same matching code runs on blocking worker threads (run_steps) and on an asyncio
+# event loop (async_api.run_steps_async). `resource` is None for Google Books.
+ApiCall = namedtuple("ApiCall", "provider resource params api_key status_callback priority")
+
+# A pause a fetcher needs without sending anything (e.g. while another process fetches
+# the same key); the driver sleeps `seconds` and sends back None.
+Wait = namedtuple("Wait", "seconds")
+
+
+def call_url(call):
+    """Return (url, headers) for an ApiCall."""
+    params = dict(call.params)
+    if call.provider == "google_books":
+        if call.api_key:
+            params["key"] = call.api_key
+        return f"{GOOGLE_BOOKS_API_URL}/volumes?{urllib.parse.urlencode(params)}", GOOGLE_BOOKS_HEADERS
+    return f"{COMICVINE_API_URL}/{call.resource}/?{urllib.parse.urlencode(params)}", COMICVINE_HEADERS
+
+
+def _pause(call, backoff, msg):
+    print(msg)
+    if call.status_callback:
+        call.status_callback(msg, "#eab308")
+    SCHEDULER.retry_after(call.provider, backoff, call.api_key, resource=call.resource)
+
+
+def retry_call(call, error, retry):
+    """Decide whether a failed ApiCall is tried again; `retry` counts from 0.
+
+    Rate-limit responses pause the provider's scheduler queue (honouring Retry-After)
+    and are retried, up to 3 attempts in total; any other error gives up at once.
+    Google Books answering 429 three times in a row is taken as the daily quota
+    running out, and further Google Books calls are skipped until reset_google_books_quota().
+    """
+    global _google_books_quota_exceeded
+
+    code = error.code if isinstance(error, urllib.error.HTTPError) else None
+    retry_after = error.headers.get("Retry-After") if code and error.headers else None
+    if call.provider == "google_books":
+        if code != 429:
+            print(f"Google Books API error for '{call.params.get('q')}': {error}")
+            return False
+        scan_metrics.count("google_books", "rate_limited")
+        if retry < 2:
+            # Prefer the server's Retry-After; otherwise back off 2s, 4s, 8s
+            backoff = parse_retry_after(retry_after, 2 ** (retry + 1))
+            _pause(call, backoff, f"Google Books: 429 rate limited, retrying in {backoff:g}s...")
+            return True
+        # Retries failed, assume Quota Limit
+        _google_books_quota_exceeded = True
+        msg = "Daily Quota Exceeded. Stopping API calls."
+        print(msg)
+        if call.status_callback:
+            call.status_callback(msg, "#ef4444")
+        return False
+
+    # ComicVine answers 420 when its velocity detection trips
+    if code in (420, 429):
+        scan_metrics.count("comicvine", "rate_limited")
+        if retry < 2:
+            backoff = parse_retry_after(retry_after, 60 * (retry + 1))
+            _pause(call, backoff, f"ComicVine: rate limited, retrying in {backoff:g}s...")
+            return True
+    label = call.params.get("query") or call.params.get("filter") or call.resource
+    print(f"ComicVine API error for '{label}': {error}")
+    return False
+
+
+def record_wait(provider, waited):
+    """Count time spent waiting for a scheduler slot in the scan metrics."""
+    scan_metrics.record_time("rate_limit_wait", waited)
+    scan_metrics.count(provider, "wait_seconds", waited)
+
+
+@contextmanager
+def timed_call(provider):
+    """Count and time one HTTP request to `provider` in the scan metrics."""
+    scan_metrics.count(provider, "calls")
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        scan_metrics.count(provider, "errors")
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        scan_metrics.record_time("http", elapsed)
+        scan_metrics.count(provider, "http_seconds", elapsed)
+
+
+def _execute(call):
+    """Send one ApiCall on the calling thread and return the decoded JSON, or None."""
+    if isinstance(call, Wait):
+        time.sleep(call.seconds)
+        return None
+    url, headers = call_url(call)
+    for retry in range(3):
+        # Shared across worker threads; also honours cooldowns from previous 429 errors
+        record_wait(call.provider, SCHEDULER.acquire(call.provider, call.api_key, resource=call.resource,
+                                                     priority=call.priority))
+        try:
+            with timed_call(call.provider):
+                return HTTP.get_json(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        except Exception as e:
+            if not retry_call(call, e, retry):
+                return None
+    return None
+
+
+def run_steps(steps):
+    """Run a fetcher step generator to completion with blocking HTTP and return its result."""
+    try:
+        call = next(steps)
+        while True:
+            call = steps.send(_execute(call))
+    except StopIteration as done:
+        return done.value
+
+
+def run_cached(steps):
+    """Run a fetcher step generator from the cache alone.
+
+    Returns its result, or None as soon as it needs a request (the generator is closed).
+    """
+    try:
+        next(steps)
+    except StopIteration as done:
+        return done.value
+    steps.close()
+    return None
+
+
+# Returned by _cache_lookup and _claim when there is no cached value to use
+_MISS = object()
+
+
+def _cache_lookup(provider, cache, key):
+    """Return the cached value of `key`, or _MISS, counting the hit or miss for `provider`.
 
-    # Extract subtitle and original separator
-    subtitle = None
-    orig_sep = " - "
-    sub_match = re.search(
-        r'(?:Vol\.?|Volume|v\.)\s*\d+\s*([:\-\u2013\u2014])\s*(.+)',
-        title, flags=re.IGNORECASE
-    )
-    if sub_match:
-        raw_sep = sub_match.group(1)
-        subtitle = sub_match.group(2).strip()
-        orig_sep = ": " if raw_sep == ":" else " - "
-
-    # Verify relevance
-    def _norm(s):
-        s = s.lower().strip()
-        # Remove leading "the ", "a ", "an "
-        s = re.sub(r'^(the|a|an)\s+', '', s)
-        # Remove special chars
-        return re.sub(r'[^a-z0-9]', '', s)
-
-    search_norm = _norm(search_term)
-    result_norm = _norm(clean)
-
-    # STRICT MATCHING: The search term must be contained in the result.
-    # We do NOT allow the result to be a substring of the search term (e.g. "Solo Leveling" in "Solo Leveling Ragnarok").
-    # This matches "Berserk" -> "Berserk Deluxe" (OK), but rejects "Fullmetal Alchemist: Brotherhood" -> "Fullmetal Alchemist" (Maybe OK? but usually we want strict)
-    # Actually, for "Solo Leveling Ragnarok", we searched specific words. If result misses "Ragnarok", it's wrong.
-    if search_norm in result_norm:
-        return clean, title, subtitle, orig_sep
-
-    return None, None, None, None
+    Loads the entry once: a separate `key in cache` check could pass and the entry
+    expire before cache[key] reads it.
+    """
+    value = cache.get(key, _MISS)
+    scan_metrics.count(provider, "cache_misses" if value is _MISS else "cache_hits")
+    return value
+
+
+# Seconds between checks while another process holds the claim on a key
+_CLAIM_POLL = 0.25
+
+
+def _claim(provider, cache, key):
+    """Step generator: claim `key` in a shared cache before fetching it.
+
+    Returns _MISS once this process holds the claim and should fetch, or the value
+    another process stored while we waited for its claim. Caches without claims
+    (a plain dict) are always ours to fill.
+    """
+    claim = getattr(cache, "claim", None)
+    if claim is None:
+        return _MISS
+    if not claim(key):
+        start = time.monotonic()
+        try:
+            while True:
+                yield Wait(_CLAIM_POLL)
+                value = cache.get(key, _MISS)
+                if value is not _MISS:
+                    scan_metrics.count(provider, "shared_hits")
+                    return value
+                if claim(key):
+                    break
+        finally:
+            scan_metrics.record_time("claim_wait", time.monotonic() - start)
+    value = cache.get(key, _MISS)
+    if value is not _MISS:
+        # Stored between our cache check and the claim
+        _release(cache, key)
+    return value
+
+
+def _release(cache, key):
+    release = getattr(cache, "release", None)
+    if release is not None:
+        release(key)
 
 
 # ─── Persistent Disk Cache ───────────────────────────────────────────────────
 
-def load_disk_cache(cache_path):
-    """Load the persistent API result cache from disk.
+def load_disk_cache(cache_path, legacy_json_path=None):
+    """Open the persistent API result cache.
 
-    Returns a dict mapping search terms to (series, raw_title, subtitle, sep) tuples.
+    Returns a dict-like SqliteCache mapping cache keys to (series, raw_title, subtitle, sep)
+    tuples. Misses expire after a few days so they get retried; results from older
+    matching rules (MATCH_RULES_VERSION) are ignored. If `legacy_json_path` points at
+    an old cache.json, it is imported once.
+    Falls back to a plain in-memory dict if the database cannot be opened.
     """
     try:
-        if os.path.exists(cache_path):
-            with open(cache_path, "r", encoding="utf-8") as f:
-                raw = json.load(f)
-            # Convert lists back to tuples
-            return {k: tuple(v) for k, v in raw.items()}
+        cache = SqliteCache(cache_path, CachePolicy(version=MATCH_RULES_VERSION))
     except Exception as e:
         print(f"Cache load error: {e}")
-    return {}
+        return {}
+    if legacy_json_path:
+        try:
+            imported = import_json_cache(cache, legacy_json_path)
+            if imported:
+                print(f"Imported {imported} cache entries from {legacy_json_path}")
+        except Exception as e:
+            print(f"Cache import error: {e}")
+    return cache
+
+
+def load_cache_snapshot(path):
+    """Open a copy of the cache written by SqliteCache.snapshot() read-only, with load_disk_cache's policy."""
+    return SqliteCache(path, CachePolicy(version=MATCH_RULES_VERSION), readonly=True)
+
+
+def cached_series_terms(cache):
+    """Yield (search_term, series_name) for every successful lookup stored in `cache`.
+
+    Used to seed fuzzy_matcher.SeriesIndex; harvest markers and misses are skipped.
+    """
+    for key, value in cache.items():
+        if key.startswith("GB_HARVEST::") or not value:
+            continue
+        if key.startswith("CV_VOL::"):
+            term, series = key[len("CV_VOL::"):], value[1] if len(value) > 1 else None
+        else:
+            if key.startswith("GB::"):
+                key = key[len("GB::"):]
+            term, series = key.split("||", 1)[0], value[0]
+        if term and isinstance(series, str) and series:
+            yield term, series
 
 
 def save_disk_cache(cache, cache_path):
-    """Save the API result cache to disk."""
+    """Evict expired/excess entries and checkpoint the cache. Entries are already written as they are added."""
     try:
-        # Convert tuples to lists for JSON serialization
-        serializable = {k: list(v) for k, v in cache.items()}
-        with open(cache_path, "w", encoding="utf-8") as f:
-            json.dump(serializable, f, indent=2, ensure_ascii=False)
+        if isinstance(cache, SqliteCache):
+            cache.flush()
     except Exception as e:
         print(f"Cache save error: {e}")
 
 
 # ─── Google Books ─────────────────────────────────────────────────────────────
 
-# Module-level cooldown: timestamp of when we can next call Google Books
-_google_books_next_allowed = 0.0
-
 
 _google_books_quota_exceeded = False
 
@@ -98,21 +316,10 @@ def reset_google_books_quota():
     global _google_books_quota_exceeded
     _google_books_quota_exceeded = False
 
-def fetch_google_books_name(search_term, cache, api_key=None, status_callback=None, vol_num=None):
-    """Fetch series info from Google Books API.
-
-    Returns (series_name, raw_title, subtitle, original_separator) or (None, None, None, None).
-
-    Args:
-        search_term: The series name guess to search for
-        cache: A dict used for caching results across calls
-        api_key: Optional Google Books API key for higher quota (1000/day vs ~100/day)
-        status_callback: Optional callable(text, color) for status display
-        vol_num: Optional volume number string (e.g. "1") to refine search for unique subtitles.
-                 If provided, API calls increase (1 per volume). If None, 1 call per series.
-    """
-    global _google_books_next_allowed, _google_books_quota_exceeded
 
+def google_books_name_steps(search_term, cache, api_key=None, status_callback=None, vol_num=None,
+                            priority=PRIORITY_SCAN):
+    """Step generator behind fetch_google_books_name (see ApiCall)."""
     if _google_books_quota_exceeded:
         if status_callback:
              # Calculate roughly time until midnight PT (UTC-8)
@@ -122,157 +329,213 @@ def fetch_google_books_name(search_term, cache, api_key=None, status_callback=No
 
     # Cache key depends on whether we are searching for specific volume
     if vol_num:
-         cache_key = f"GB::{search_term}||{vol_num}"
+         cache_key = f"GB::{search_term}||{_issue_key(vol_num)}"
     else:
          cache_key = search_term
 
     if not search_term or not search_term.strip():
         return None, None, None, None
-    if cache_key in cache:
-        return cache[cache_key]
-
-    words = search_term.strip().split()
-
-    # Smart query strategy
-    # If looking for specific volume, combine Series + Vol
-    # e.g. intitle:"Berserk" intitle:"1"
-    if vol_num:
-        attempts = [f'intitle:"{search_term}" intitle:"{vol_num}"']
-        # Fallback to just series if strict volume search fails (optional, but maybe better to fail fast?)
-        # Actually, if user wants subtitle, getting just series name without subtitle is better than nothing.
-        # But we must not cache series-only result as volume-specific result.
-        pass 
-    else:
-        # Series-only search
-        attempts = [f'intitle:"{search_term}"']
-        if len(words) > 1:
-            attempts.append(f'"{search_term}"')
-            for i in range(len(words) - 1, 0, -1):
-                shorter = " ".join(words[:i])
-                attempts.append(f'intitle:"{shorter}"')
-
-    for query in attempts:
-        # Respect cooldown from previous 429 errors
-        now = time.time()
-        if now < _google_books_next_allowed:
-            wait = _google_books_next_allowed - now
-            msg = f"Google Books rate limit: waiting {wait:.1f}s..."
-            print(msg)
-            if status_callback:
-                status_callback(msg, "#eab308")  # Yellow/Warning color
-            time.sleep(wait)
-
-        time.sleep(0.5)  # Base delay between requests
-
-        # Try up to 3 times with exponential backoff on 429
-        for retry in range(3):
-            try:
-                params = {"q": query, "maxResults": 5}
-                if api_key:
-                    params["key"] = api_key
-                url = f"https://www.googleapis.com/books/v1/volumes?{urllib.parse.urlencode(params)}"
-                req = urllib.request.Request(url, headers={'User-Agent': 'PythonRenamer/1.0'})
-                with urllib.request.urlopen(req, timeout=10) as response:
-                    data = json.loads(response.read().decode())
-                if "items" in data and len(data["items"]) > 0:
-                    for item in data["items"]:
-                        vol_info = item["volumeInfo"]
-                        title = vol_info.get("title", "")
-                        subtitle = vol_info.get("subtitle", "")
-                        if not title:
-                            continue
-                        
-                        # Check volume match if requested
-                        # Google Books isn't perfect with issue numbers, so we rely on checks
-                        # But typically if we searched intitle:"1", the result likely contains it.
-                        
-                        full_title = f"{title}: {subtitle}" if subtitle else title
-                        result = _extract_series_from_title(full_title, search_term)
-                        if result[0]:
-                            cache[cache_key] = result
-                            return result
-                break  # Request succeeded (even if no match), try next query
-            except urllib.error.HTTPError as e:
-                if e.code == 429:
-                    backoff = 2 ** (retry + 1)  # 2s, 4s, 8s
-                    if retry < 2:
-                        msg = f"Google Books: 429 rate limited, retrying in {backoff}s..."
-                        print(msg)
-                        if status_callback:
-                            status_callback(msg, "#eab308")
-                        _google_books_next_allowed = time.time() + backoff
-                        time.sleep(backoff)
+    cached = _cache_lookup("google_books", cache, cache_key)
+    if cached is not _MISS:
+        return cached
+    cached = yield from _claim("google_books", cache, cache_key)
+    if cached is not _MISS:
+        return cached
+    try:
+        words = search_term.strip().split()
+
+        # Smart query strategy
+        # If looking for specific volume, combine Series + Vol
+        # e.g. intitle:"Berserk" intitle:"1"
+        if vol_num:
+            attempts = [f'intitle:"{search_term}" intitle:"{vol_num}"']
+            # Fallback to just series if strict volume search fails (optional, but maybe better to fail fast?)
+            # Actually, if user wants subtitle, getting just series name without subtitle is better than nothing.
+            # But we must not cache series-only result as volume-specific result.
+            pass 
+        else:
+            # Series-only search
+            attempts = [f'intitle:"{search_term}"']
+            if len(words) > 1:
+                attempts.append(f'"{search_term}"')
+                for i in range(len(words) - 1, 0, -1):
+                    shorter = " ".join(words[:i])
+                    attempts.append(f'intitle:"{shorter}"')
+
+        for query in attempts:
+            data = yield ApiCall("google_books", None, {"q": query, "maxResults": 5},
+                                 api_key, status_callback, priority)
+            if data is None:
+                if _google_books_quota_exceeded:
+                    return None, None, None, None
+                continue  # Request failed, try next query
+            if "items" in data and len(data["items"]) > 0:
+                for item in data["items"]:
+                    vol_info = item.get("volumeInfo") or {}
+                    title = vol_info.get("title", "")
+                    subtitle = vol_info.get("subtitle", "")
+                    if not title:
                         continue
-                    else:
-                        # Retries failed, assume Quota Limit
-                        _google_books_quota_exceeded = True
-                        msg = "Daily Quota Exceeded. Stopping API calls."
-                        print(msg)
-                        if status_callback:
-                            status_callback(msg, "#ef4444")
-                        return None, None, None, None
-                print(f"Google Books API error for '{query}': {e}")
-                break
-            except Exception as e:
-                print(f"Google Books API error for '{query}': {e}")
-                break
 
-    cache[cache_key] = (None, None, None, None)
-    return None, None, None, None
+                    # Check volume match if requested
+                    # Google Books isn't perfect with issue numbers, so we rely on checks
+                    # But typically if we searched intitle:"1", the result likely contains it.
 
+                    full_title = f"{title}: {subtitle}" if subtitle else title
+                    result = extract_series_from_title(full_title, search_term)
+                    if result[0]:
+                        cache[cache_key] = result
+                        return result
 
-# ─── ComicVine ────────────────────────────────────────────────────────────────
+        cache[cache_key] = (None, None, None, None)
+        return None, None, None, None
+    finally:
+        _release(cache, cache_key)
 
-def fetch_comicvine_name(search_term, cache, api_key, vol_num=None, vol_prefix="#", status_callback=None):
-    """Fetch series info from ComicVine API by searching issues.
 
-    Returns (series_name, raw_title, subtitle, original_separator) or (None, None, None, None).
+def fetch_google_books_name(search_term, cache, api_key=None, status_callback=None, vol_num=None,
+                            priority=PRIORITY_SCAN):
+    """Fetch series info from Google Books API.
 
-    Searches for issues (not volumes) so we get:
-    - volume.name  = series name (e.g. "Berserk")
-    - issue_number = the issue/volume number
-    - name         = issue title / subtitle (e.g. "The Black Swordsman")
+    Returns (series_name, raw_title, subtitle, original_separator) or (None, None, None, None).
 
     Args:
         search_term: The series name guess to search for
         cache: A dict used for caching results across calls
-        api_key: ComicVine API key string
-        vol_num: Optional volume/issue number string to match (e.g. "1")
-        vol_prefix: String to use before the volume number (e.g. "#", "Vol. ", "Volume ")
-        status_callback: Optional callable(text, color) for error status display
+        api_key: Optional Google Books API key for higher quota (1000/day vs ~100/day)
+        status_callback: Optional callable(text, color) for status display
+        vol_num: Optional volume number string (e.g. "1") to refine search for unique subtitles.
+                 If provided, API calls increase (1 per volume). If None, 1 call per series.
+        priority: Scheduler priority (see rate_limit); lower is served first
+    """
+    return run_steps(google_books_name_steps(search_term, cache, api_key, status_callback, vol_num, priority))
+
+
+# ─── Google Books (series harvesting) ─────────────────────────────────────────
+
+# Google Books' maximum page size, and how many pages a single series may cost
+_GOOGLE_BOOKS_PAGE_SIZE = 40
+_GOOGLE_BOOKS_HARVEST_PAGES = 5
+
+_VOLUME_NUMBER_RE = re.compile(r'(?:\bVol\.?|\bVolume|\bv\.)\s*(\d+)|\s(\d+)\s*$', re.IGNORECASE)
+
+
+def _volume_number_from_title(title):
+    """Return the normalized volume number in a Google Books title ("Berserk, Vol. 3" -> "3"), or None."""
+    m = _VOLUME_NUMBER_RE.search(title)
+    if not m:
+        return None
+    return _issue_key(m.group(1) or m.group(2))
+
+
+def harvest_google_books_steps(search_term, cache, api_key=None, status_callback=None,
+                               priority=PRIORITY_SCAN):
+    """Step generator behind harvest_google_books_series (see ApiCall)."""
+    if _google_books_quota_exceeded or not search_term or not search_term.strip():
+        return 0
+    marker_key = f"GB_HARVEST::{search_term}"
+    cached = _cache_lookup("google_books", cache, marker_key)
+    if cached is not _MISS:
+        return cached[0] or 0
+    cached = yield from _claim("google_books", cache, marker_key)
+    if cached is not _MISS:
+        return cached[0] or 0
+    try:
+        volumes = {}
+        complete = True
+        start = 0
+        for _ in range(_GOOGLE_BOOKS_HARVEST_PAGES):
+            data = yield ApiCall("google_books", None, {
+                "q": f'intitle:"{search_term}"',
+                "maxResults": _GOOGLE_BOOKS_PAGE_SIZE,
+                "startIndex": start
+            }, api_key, status_callback, priority)
+            if data is None:
+                # Keep what we found, but don't mark the series as harvested
+                complete = False
+                break
+            items = data.get("items") or []
+            for item in items:
+                vol_info = item.get("volumeInfo") or {}
+                title = vol_info.get("title", "")
+                subtitle = vol_info.get("subtitle", "")
+                if not title:
+                    continue
+                vol = _volume_number_from_title(title)
+                if not vol:
+                    continue
+                full_title = f"{title}: {subtitle}" if subtitle else title
+                result = extract_series_from_title(full_title, search_term)
+                if not result[0]:
+                    continue
+                # Several editions may list the same volume; prefer one that carries a subtitle
+                if vol not in volumes or (result[2] and not volumes[vol][2]):
+                    volumes[vol] = result
+            start += len(items)
+            if not items or start >= (data.get("totalItems") or 0):
+                break
+
+        if volumes:
+            cache.update((f"GB::{search_term}||{vol}", result) for vol, result in volumes.items())
+        if complete:
+            cache[marker_key] = (len(volumes),)
+        return len(volumes)
+    finally:
+        _release(cache, marker_key)
+
+
+def harvest_google_books_series(search_term, cache, api_key=None, status_callback=None,
+                                priority=PRIORITY_SCAN):
+    """Page through a series' Google Books results and cache every volume found.
+
+    Queries intitle:"series" with maxResults=40, following startIndex for up to
+    _GOOGLE_BOOKS_HARVEST_PAGES pages, and stores each volume's
+    (series, raw_title, subtitle, sep) under the same per-volume key that
+    fetch_google_books_name(..., vol_num=N) reads. A whole series then costs a few
+    calls instead of one per volume. Volumes that aren't found are left uncached,
+    so per-volume lookups still fall back to a targeted query.
+
+    Returns the number of volumes cached.
     """
+    return run_steps(harvest_google_books_steps(search_term, cache, api_key, status_callback, priority))
+
+
+# ─── ComicVine ────────────────────────────────────────────────────────────────
+
+def comicvine_name_steps(search_term, cache, api_key, vol_num=None, vol_prefix="#", status_callback=None,
+                         priority=PRIORITY_SCAN):
+    """Step generator behind fetch_comicvine_name (see ApiCall)."""
     cache_key = f"{search_term}||{vol_num or ''}||{vol_prefix}"
     if not search_term or not search_term.strip():
         return None, None, None, None
-    if cache_key in cache:
-        return cache[cache_key]
+    cached = _cache_lookup("comicvine", cache, cache_key)
+    if cached is not _MISS:
+        return cached
 
     if not api_key:
         return None, None, None, None
-
-    words = search_term.strip().split()
-    # Try full name, then progressively shorter
-    queries = [search_term]
-    for i in range(len(words) - 1, 0, -1):
-        queries.append(" ".join(words[:i]))
-
-    for query in queries:
-        try:
-            params = {
+    cached = yield from _claim("comicvine", cache, cache_key)
+    if cached is not _MISS:
+        return cached
+    try:
+        words = search_term.strip().split()
+        # Try full name, then progressively shorter
+        queries = [search_term]
+        for i in range(len(words) - 1, 0, -1):
+            queries.append(" ".join(words[:i]))
+        search_tokens = _token_set(search_term)
+
+        for query in queries:
+            data = yield ApiCall("comicvine", "search", {
                 "api_key": api_key,
                 "format": "json",
                 "resources": "issue",
                 "query": query,
                 "limit": 10,
                 "field_list": "name,issue_number,volume"
-            }
-            url = f"https://comicvine.gamespot.com/api/search/?{urllib.parse.urlencode(params)}"
-            req = urllib.request.Request(url, headers={
-                'User-Agent': 'CBZRenamer/1.0',
-                'Accept': 'application/json'
-            })
-            with urllib.request.urlopen(req, timeout=10) as response:
-                data = json.loads(response.read().decode())
+            }, api_key, status_callback, priority)
+            if data is None:
+                continue
 
             if data.get("error") == "OK" and data.get("results"):
                 # First pass: find issue matching both series name and volume number
@@ -285,13 +548,10 @@ def fetch_comicvine_name(search_term, cache, api_key, vol_num=None, vol_prefix="
                             continue
 
                         # Verify series name relevance via token matching
-                        search_tokens = set(re.sub(r'[^a-z0-9\s]', '', search_term.lower()).split())
-                        result_tokens = set(re.sub(r'[^a-z0-9\s]', '', series_name.lower()).split())
-                        
-                        common = search_tokens.intersection(result_tokens)
+                        common = search_tokens.intersection(_token_set(series_name))
                         if not common:
                              continue
-                        
+                    
                         if len(search_tokens) > 1 and len(common) < len(search_tokens) * 0.5:
                              continue
 
@@ -330,9 +590,197 @@ def fetch_comicvine_name(search_term, cache, api_key, vol_num=None, vol_prefix="
                     status_callback("ComicVine: Invalid API key \u2014 check Settings", "#ef4444")
                 cache[cache_key] = (None, None, None, None)
                 return None, None, None, None
-        except Exception as e:
-            print(f"ComicVine API error for '{query}': {e}")
+
+        cache[cache_key] = (None, None, None, None)
+        return None, None, None, None
+    finally:
+        _release(cache, cache_key)
+
+
+def fetch_comicvine_name(search_term, cache, api_key, vol_num=None, vol_prefix="#", status_callback=None,
+                         priority=PRIORITY_SCAN):
+    """Fetch series info from ComicVine API by searching issues.
+
+    Returns (series_name, raw_title, subtitle, original_separator) or (None, None, None, None).
+
+    Searches for issues (not volumes) so we get:
+    - volume.name  = series name (e.g. "Berserk")
+    - issue_number = the issue/volume number
+    - name         = issue title / subtitle (e.g. "The Black Swordsman")
+
+    Args:
+        search_term: The series name guess to search for
+        cache: A dict used for caching results across calls
+        api_key: ComicVine API key string
+        vol_num: Optional volume/issue number string to match (e.g. "1")
+        vol_prefix: String to use before the volume number (e.g. "#", "Vol. ", "Volume ")
+        status_callback: Optional callable(text, color) for error status display
+        priority: Scheduler priority (see rate_limit); lower is served first
+    """
+    return run_steps(comicvine_name_steps(search_term, cache, api_key, vol_num, vol_prefix,
+                                          status_callback, priority))
+
+
+# ─── ComicVine (volume-first bulk mode) ───────────────────────────────────────
+
+# ComicVine's maximum page size for list resources
+_COMICVINE_PAGE_SIZE = 100
+# Seconds to keep an issue list whose download was interrupted
+_PARTIAL_VOLUME_TTL = 60 * 60
+
+
+def _token_set(text):
+    return set(re.sub(r'[^a-z0-9\s]', '', text.lower()).split())
+
+
+def _pick_comicvine_volume(search_term, results):
+    """Choose the best matching volume from search results using the same token rule as issue search.
+
+    Prefers an exact (normalized) name match, then the volume with the most issues.
+    """
+    search_tokens = _token_set(search_term)
+    search_norm = re.sub(r'[^a-z0-9]', '', search_term.lower())
+    best, best_rank = None, None
+    for vol in results:
+        name = (vol.get("name") or "").strip()
+        if not name or vol.get("id") is None:
+            continue
+        common = search_tokens.intersection(_token_set(name))
+        if not common:
+            continue
+        if len(search_tokens) > 1 and len(common) < len(search_tokens) * 0.5:
             continue
+        exact = re.sub(r'[^a-z0-9]', '', name.lower()) == search_norm
+        rank = (exact, len(common), vol.get("count_of_issues") or 0)
+        if best_rank is None or rank > best_rank:
+            best, best_rank = vol, rank
+    return best
+
+
+def comicvine_volume_steps(search_term, cache, api_key, status_callback=None, priority=PRIORITY_SCAN):
+    """Step generator behind fetch_comicvine_volume (see ApiCall)."""
+    if not search_term or not search_term.strip():
+        return None, None, None
+    cache_key = f"CV_VOL::{search_term}"
+    cached = _cache_lookup("comicvine", cache, cache_key)
+    if cached is not _MISS:
+        return cached
+    if not api_key:
+        return None, None, None
+    cached = yield from _claim("comicvine", cache, cache_key)
+    if cached is not _MISS:
+        return cached
+    try:
+        words = search_term.strip().split()
+        # Try full name, then progressively shorter
+        queries = [search_term] + [" ".join(words[:i]) for i in range(len(words) - 1, 0, -1)]
+
+        volume = None
+        answered = False  # did any search get a real answer (not a network error, 5xx or spent retries)?
+        for query in queries:
+            data = yield ApiCall("comicvine", "search", {
+                "api_key": api_key,
+                "format": "json",
+                "resources": "volume",
+                "query": query,
+                "limit": 10,
+                "field_list": "id,name,count_of_issues,start_year"
+            }, api_key, status_callback, priority)
+            if data is None:
+                continue
+            if data.get("error") == "Invalid API Key":
+                print("ComicVine: Invalid API key")
+                if status_callback:
+                    status_callback("ComicVine: Invalid API key — check Settings", "#ef4444")
+                return None, None, None
+            if data.get("error", "OK") != "OK":
+                continue
+            answered = True
+            volume = _pick_comicvine_volume(search_term, data.get("results") or [])
+            if volume:
+                break
+
+        if not volume:
+            # Only a real "no such series" is remembered; after an outage the next scan asks again
+            if answered:
+                cache[cache_key] = (None, None, None)
+            return None, None, None
+
+        issues = {}
+        offset = 0
+        while True:
+            data = yield ApiCall("comicvine", "issues", {
+                "api_key": api_key,
+                "format": "json",
+                "filter": f"volume:{volume['id']}",
+                "field_list": "issue_number,name",
+                "sort": "issue_number:asc",
+                "limit": _COMICVINE_PAGE_SIZE,
+                "offset": offset
+            }, api_key, status_callback, priority)
+            if data is None or data.get("error") != "OK":
+                # Keep a partial issue list only briefly so the next scan retries the download
+                result = (volume["id"], volume["name"].strip(), issues)
+                if hasattr(cache, "put"):
+                    cache.put(cache_key, result, ttl=_PARTIAL_VOLUME_TTL)
+                else:
+                    cache[cache_key] = result
+                return result
+            page = data.get("results") or []
+            for item in page:
+                key = _issue_key(item.get("issue_number"))
+                if key:
+                    issues.setdefault(key, (item.get("name") or "").strip())
+            offset += len(page)
+            if not page or offset >= (data.get("number_of_total_results") or 0):
+                break
+
+        result = (volume["id"], volume["name"].strip(), issues)
+        cache[cache_key] = result
+        return result
+    finally:
+        _release(cache, cache_key)
+
+
+def fetch_comicvine_volume(search_term, cache, api_key, status_callback=None, priority=PRIORITY_SCAN):
+    """Resolve a series to its ComicVine volume and download the volume's full issue list.
+
+    Returns (volume_id, series_name, issues) where `issues` maps normalized issue numbers
+    to issue names ("" if untitled), or (None, None, None) if no volume matched.
+    The result is cached per series, so every file of the series is then answered
+    locally: one volume search plus ceil(issues / 100) issue pages per series.
+    """
+    return run_steps(comicvine_volume_steps(search_term, cache, api_key, status_callback, priority))
+
+
+def comicvine_name_bulk_steps(search_term, cache, api_key, vol_num=None, vol_prefix="#",
+                              status_callback=None, priority=PRIORITY_SCAN):
+    """Step generator behind fetch_comicvine_name_bulk (see ApiCall)."""
+    _, series_name, issues = yield from comicvine_volume_steps(search_term, cache, api_key,
+                                                               status_callback, priority)
+    if not series_name:
+        return None, None, None, None
+
+    issue_number = _issue_key(vol_num)
+    if not vol_num or issue_number not in issues:
+        return series_name, None, None, " - "
+
+    issue_name = issues[issue_number] or None
+    raw_title = f"{series_name} {vol_prefix}{issue_number}"
+    if issue_name:
+        raw_title += f" - {issue_name}"
+    return series_name, raw_title, issue_name, " - "
+
+
+def fetch_comicvine_name_bulk(search_term, cache, api_key, vol_num=None, vol_prefix="#",
+                              status_callback=None, priority=PRIORITY_SCAN):
+    """Volume-first variant of fetch_comicvine_name with the same return value.
+
+    Answers each file from the series' cached issue list (see fetch_comicvine_volume)
+    instead of running a search cascade per file. If the issue isn't in the list, only
+    the series name is returned so the standardized name format is used.
+    """
+    return run_steps(comicvine_name_bulk_steps(search_term, cache, api_key, vol_num, vol_prefix,
+                                               status_callback, priority))
+
 
-    cache[cache_key] = (None, None, None, None)
-    return None, None, None, None
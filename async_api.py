@@ -0,0 +1,352 @@
+"""Asyncio transport for the API fetchers.
+
+The fetchers in api_sources are step generators that yield ApiCall, and
+api_sources.run_steps() sends each call on the calling thread. Here the same
+steps run as tasks on a single event-loop thread instead: hundreds of lookups
+in flight cost one thread and a socket each, every request has a deadline,
+and cancelling stops all of them at once, including those asleep in a
+rate-limit backoff or waiting on a slow server.
+
+AsyncLookupPipeline is a drop-in for scan_engine.LookupPipeline; callers on
+other threads (the scan thread, Tk) get concurrent.futures.Future objects back.
+"""
+import asyncio
+import http.client
+import io
+import json
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+from collections import deque
+from concurrent.futures import Future, CancelledError
+
+import scan_metrics
+from api_sources import REQUEST_TIMEOUT, Wait, call_url, retry_call, record_wait, timed_call
+from http_pool import DEFAULT_MAX_PER_HOST, decode_body
+from rate_limit import SCHEDULER
+
+# Lookups in flight at once. The providers are still throttled by rate_limit.SCHEDULER,
+# so this only bounds how many slow responses can overlap.
+DEFAULT_MAX_CONCURRENCY = 32
+
+_HEAD_LIMIT = 64 * 1024
+
+
+# ─── HTTP ─────────────────────────────────────────────────────────────────────
+
+class AsyncHTTPClient:
+    """Keep-alive HTTP/1.1 GET client for one event loop; the async twin of http_pool.HTTPClient.
+
+    Args:
+        max_per_host: Maximum simultaneous connections to one host; extra requests wait
+        timeout: Default deadline in seconds for a whole request (connect, send, read)
+    """
+
+    def __init__(self, max_per_host=DEFAULT_MAX_PER_HOST, timeout=REQUEST_TIMEOUT):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self._idle = {}    # (scheme, host, port) -> [(reader, writer)]
+        self._slots = {}   # (scheme, host, port) -> asyncio.Semaphore
+        self._ssl = None
+
+    async def get(self, url, headers=None, timeout=None):
+        """GET `url` and return (status, headers, body bytes), with the body already decompressed.
+
+        Raises urllib.error.HTTPError for 4xx/5xx responses and TimeoutError when the
+        request takes longer than `timeout` seconds.
+        """
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        request = {"Host": parts.netloc, "Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        if headers:
+            request.update(headers)
+        if timeout is None:
+            timeout = self.timeout
+
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+        slots = self._slots.get(key)
+        if slots is None:
+            slots = self._slots[key] = asyncio.Semaphore(self.max_per_host)
+        async with slots:
+            try:
+                status, reason, response_headers, body = await asyncio.wait_for(
+                    self._exchange(key, target, request), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"timed out after {timeout:g}s") from None
+
+        if status >= 400:
+            raise urllib.error.HTTPError(url, status, reason, response_headers, io.BytesIO(body))
+        return status, response_headers, body
+
+    async def get_json(self, url, headers=None, timeout=None):
+        """GET `url` and decode the JSON body."""
+        _, _, body = await self.get(url, headers=headers, timeout=timeout)
+        return json.loads(body.decode())
+
+    def close(self):
+        """Close every idle connection."""
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+    async def _connect(self, key):
+        scheme, host, port = key
+        if scheme == "https":
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            return await asyncio.open_connection(host, port, ssl=self._ssl, server_hostname=host,
+                                                 limit=_HEAD_LIMIT)
+        return await asyncio.open_connection(host, port, limit=_HEAD_LIMIT)
+
+    async def _exchange(self, key, target, headers):
+        idle = self._idle.setdefault(key, [])
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof():
+                reused = True
+                break
+            writer.close()
+        else:
+            reader, writer = await self._connect(key)
+            reused = False
+        try:
+            try:
+                response = await self._roundtrip(reader, writer, target, headers)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # The idle connection went away; retry once on a fresh one
+                writer.close()
+                reader, writer = await self._connect(key)
+                response = await self._roundtrip(reader, writer, target, headers)
+        except BaseException:
+            writer.close()
+            raise
+        status, reason, response_headers, body, keep_alive = response
+        if keep_alive:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+        return status, reason, response_headers, decode_body(body, response_headers.get("Content-Encoding"))
+
+    async def _roundtrip(self, reader, writer, target, headers):
+        lines = [f"GET {target} HTTP/1.1"] + [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+        head = await reader.readuntil(b"\r\n\r\n")
+        status_line, _, header_block = head.partition(b"\r\n")
+        version, status, reason = (status_line.decode("latin-1").split(" ", 2) + [""])[:3]
+        status = int(status)
+        response_headers = http.client.parse_headers(io.BytesIO(header_block))
+        keep_alive = version == "HTTP/1.1" and (response_headers.get("Connection") or "").lower() != "close"
+
+        length = response_headers.get("Content-Length")
+        if status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif "chunked" in (response_headers.get("Transfer-Encoding") or "").lower():
+            body = await self._read_chunked(reader)
+        elif length is not None:
+            body = await reader.readexactly(int(length))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return status, reason, response_headers, body, keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader):
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0].strip(), 16)
+            if size == 0:
+                while await reader.readuntil(b"\r\n") != b"\r\n":
+                    pass  # trailers
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+
+# ─── Fetcher Steps ────────────────────────────────────────────────────────────
+
+async def _acquire(call):
+    """Wait for a scheduler slot without blocking the event loop.
+
+    The call queues at its priority alongside every other task and thread, so
+    background harvesting can't starve a foreground lookup.
+    """
+    start = time.monotonic()
+    ticket = SCHEDULER.enqueue(call.provider, call.api_key, call.resource, call.priority)
+    try:
+        while True:
+            wait = SCHEDULER.poll(ticket)
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+    except BaseException:
+        SCHEDULER.cancel(ticket)  # cancelled while queued
+        raise
+    record_wait(call.provider, time.monotonic() - start)
+
+
+async def execute(call, client, timeout=REQUEST_TIMEOUT):
+    """Send one ApiCall and return the decoded JSON, or None; the async twin of api_sources' thread path."""
+    if isinstance(call, Wait):
+        await asyncio.sleep(call.seconds)
+        return None
+    url, headers = call_url(call)
+    for retry in range(3):
+        await _acquire(call)
+        try:
+            with timed_call(call.provider):
+                return await client.get_json(url, headers=headers, timeout=timeout)
+        except Exception as e:
+            if not retry_call(call, e, retry):
+                return None
+    return None
+
+
+async def run_steps_async(steps, client, timeout=REQUEST_TIMEOUT):
+    """Run a fetcher step generator to completion on the event loop and return its result."""
+    try:
+        call = next(steps)
+        while True:
+            call = steps.send(await execute(call, client, timeout))
+    except StopIteration as done:
+        return done.value
+    finally:
+        steps.close()
+
+
+# ─── Lookup Pipeline ──────────────────────────────────────────────────────────
+
+class AsyncLookupPipeline:
+    """Deduplicate online lookups and resolve them as tasks on one event-loop thread.
+
+    Same interface and ordering guarantees as scan_engine.LookupPipeline: every
+    unique (series, vol) key is resolved once, and the keys of one series are
+    resolved in submission order while different series run concurrently.
+
+    Args:
+        resolve_steps: Callable(series, vol) -> step generator yielding ApiCall
+        max_concurrency: Series being resolved at once
+        timeout: Deadline in seconds for each HTTP request
+        metrics: ScanMetrics the lookup tasks report to (see scan_metrics.activate)
+    """
+
+    def __init__(self, resolve_steps, max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=REQUEST_TIMEOUT,
+                 metrics=None):
+        self._resolve_steps = resolve_steps
+        self._metrics = metrics
+        self._timeout = timeout
+        self._futures = {}
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._tasks = set()
+        self._limit = asyncio.Semaphore(max_concurrency)
+        self._client = AsyncHTTPClient(timeout=timeout)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="lookup-loop", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def submit(self, series, vol=None):
+        """Queue a lookup for (series, vol) and return its concurrent.futures.Future."""
+        key = (series, vol)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future
+            future = Future()
+            self._futures[key] = future
+            if self._closed:
+                future.cancel()
+                return future
+            queue = self._queues.get(series)
+            if queue is None:
+                self._queues[series] = deque([(vol, future)])
+                self._loop.call_soon_threadsafe(self._start, series)
+            else:
+                queue.append((vol, future))
+            return future
+
+    def _start(self, series):
+        task = self._loop.create_task(self._drain(series))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drain(self, series):
+        # Tasks run in their own copy of the context, so this activates the run for this task only
+        with scan_metrics.activate(self._metrics):
+            async with self._limit:
+                while True:
+                    with self._lock:
+                        queue = self._queues[series]
+                        if not queue:
+                            del self._queues[series]
+                            return
+                        vol, future = queue.popleft()
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        result = await run_steps_async(self._resolve_steps(series, vol), self._client, self._timeout)
+                    except asyncio.CancelledError:
+                        future.set_exception(CancelledError())
+                        raise
+                    except BaseException as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(result)
+
+    @property
+    def unique_lookups(self):
+        return len(self._futures)
+
+    def cancel(self):
+        """Cancel every queued and in-flight lookup now; safe to call from any thread."""
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+        if not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._cancel_tasks)
+            except RuntimeError:
+                pass  # the loop closed in the meantime
+
+    def _cancel_tasks(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def _finish(self, cancel):
+        if cancel:
+            self._cancel_tasks()
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._client.close()
+        await asyncio.sleep(0)  # let the transports finish closing
+        self._loop.stop()
+
+    def shutdown(self, cancel=False):
+        """Stop the event loop, first waiting for running lookups unless `cancel` is set."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if cancel:
+            self.cancel()
+        asyncio.run_coroutine_threadsafe(self._finish(cancel), self._loop)
+        self._thread.join()
@@ -0,0 +1,92 @@
+"""Regression and speed check for filename_parser.
+
+    python benchmarks/bench_parser.py                  # golden check + timing
+    python benchmarks/bench_parser.py --names 1000000 --max-us 8
+
+Every case in parser_golden.json must parse exactly as recorded; the corpus
+was generated from the original parser, so any difference is a behavior
+change. Exits non-zero on a mismatch or when --max-us is exceeded. After an
+intentional behavior change, rerun with --update and review the diff.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from filename_parser import parse_filename, normalize, sanitize_filename  # noqa: E402
+
+GOLDEN_PATH = os.path.join(HERE, "parser_golden.json")
+GOLDEN_FIELDS = ["filename", "parse_filename", "normalize", "sanitize_filename"]
+
+
+def run_case(filename):
+    return [filename, list(parse_filename(filename)), normalize(filename), sanitize_filename(filename)]
+
+
+def load_golden(path=GOLDEN_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["cases"]
+
+
+def write_golden(cases, path=GOLDEN_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{\n "version": 1,\n "fields": ' + json.dumps(GOLDEN_FIELDS) + ',\n "cases": [\n')
+        f.write(",\n".join("  " + json.dumps(case, ensure_ascii=False) for case in cases))
+        f.write("\n ]\n}\n")
+
+
+def check_golden(cases):
+    """Return a list of (expected, actual) for every case that no longer matches."""
+    failures = []
+    for expected in cases:
+        actual = run_case(expected[0])
+        if actual != expected:
+            failures.append((expected, actual))
+    return failures
+
+
+def time_parser(filenames, total):
+    """Parse `total` names (cycling through `filenames`). Returns microseconds per name."""
+    batch = filenames * max(1, total // len(filenames))
+    start = time.perf_counter()
+    for name in batch:
+        parse_filename(name)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(batch) * 1e6, len(batch), elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, default=200_000, help="Names to parse for timing (default: 200000)")
+    parser.add_argument("--max-us", type=float, help="Fail if parse_filename averages more than this (µs/name)")
+    parser.add_argument("--update", action="store_true", help="Rewrite the golden file from the current parser")
+    args = parser.parse_args(argv)
+
+    cases = load_golden()
+    if args.update:
+        write_golden([run_case(case[0]) for case in cases])
+        print(f"Rewrote {len(cases)} golden case(s)")
+        return 0
+
+    failures = check_golden(cases)
+    for expected, actual in failures:
+        print(f"MISMATCH {expected[0]!r}\n  expected {expected[1:]}\n  actual   {actual[1:]}")
+    print(f"golden: {len(cases) - len(failures)}/{len(cases)} match")
+
+    per_name, count, elapsed = time_parser([case[0] for case in cases], args.names)
+    print(f"parse_filename: {count} names in {elapsed:.2f}s ({per_name:.2f} µs/name)")
+
+    if failures:
+        return 1
+    if args.max_us is not None and per_name > args.max_us:
+        print(f"slower than the {args.max_us} µs/name budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
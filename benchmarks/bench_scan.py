@@ -0,0 +1,194 @@
+"""End-to-end scan benchmark against the local mock API server.
+
+    python benchmarks/bench_scan.py                              # Google Books, 300 files
+    python benchmarks/bench_scan.py --source comicvine --files 1000 --latency 120 --rate 20
+    python benchmarks/bench_scan.py --rate-429 0.05 --burst-every 10 --report bench.json
+    python benchmarks/bench_scan.py --apply-embed --incremental      # round-trip check
+
+Builds a throwaway library from the series in api_fixtures.json, starts
+mock_api_server on a free port, points the fetchers at it and runs full
+Scanner passes with a fresh cache. Prints wall time, throughput, API calls,
+cache hits, 429s and how many files resolved to their catalogue series.
+With --repeat, later passes reuse the cache (and manifest) of the first.
+With --apply-embed, the last pass's renames are applied with ComicInfo.xml
+embedding and the library is scanned again; that rescan must propose no
+renames, or the script exits non-zero. Nothing is sent to the real APIs.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from config import load_config  # noqa: E402
+from filename_parser import sanitize_filename  # noqa: E402
+from api_sources import load_disk_cache, reset_google_books_quota, save_disk_cache  # noqa: E402
+from comicinfo import embed_entries  # noqa: E402
+from rename_executor import apply_renames  # noqa: E402
+from rate_limit import SCHEDULER  # noqa: E402
+from scan_engine import Scanner, walk_library  # noqa: E402
+from scan_manifest import ScanManifest  # noqa: E402
+from scan_metrics import write_report  # noqa: E402
+from mock_api_server import MockAPIServer, load_fixtures, add_fault_arguments, fault_options, FIXTURES_PATH  # noqa: E402
+
+
+def build_library(root, series, total):
+    """Write `total` small .cbz files, cycling through the catalogue's volumes.
+
+    Returns {filename: series} for scoring.
+    """
+    volumes = [(name, n) for name in sorted(series) for n in range(1, int(series[name].get("volumes", 1)) + 1)]
+    expected = {}
+    for name, n in volumes[:total]:
+        filename = sanitize_filename(f"{name} v{n:02d}.cbz")
+        with zipfile.ZipFile(os.path.join(root, filename), "w") as zf:
+            zf.writestr("001.jpg", b"\xff\xd8\xff\xd9")
+        expected[filename] = name
+    return expected
+
+
+def run_scan(root, settings, cache, manifest, workers=None, cancel_after=None):
+    """Scan `root` once. Returns (scanner, entries, seconds, seconds from cancel() to the scan returning)."""
+    entries = []
+    lock = threading.Lock()
+
+    def _collect(entry):
+        with lock:
+            entries.append(entry)
+
+    reset_google_books_quota()
+    scanner = Scanner(settings, cache, manifest=manifest, max_workers=workers)
+    cancelled_at = []
+    if cancel_after is not None:
+        def _cancel():
+            cancelled_at.append(time.perf_counter())
+            scanner.cancel()
+        timer = threading.Timer(cancel_after, _cancel)
+        timer.start()
+    start = time.perf_counter()
+    scanner.scan(walk_library(root, settings, with_stat=manifest is not None), _collect, root=root)
+    end = time.perf_counter()
+    if cancel_after is not None:
+        timer.cancel()
+    return scanner, entries, end - start, (end - cancelled_at[0]) if cancelled_at else None
+
+
+def apply_and_rescan(root, settings, cache, manifest, entries):
+    """Apply `entries` and embed their ComicInfo.xml, then scan `root` again.
+
+    Returns (renamed, embedded, errors, entries the rescan would still rename).
+    """
+    renamed, _, errors = apply_renames(entries)
+    embedded, embed_errors = embed_entries(entries, skip={path for path, _ in errors})
+    _, rescanned, _, _ = run_scan(root, settings, cache, manifest)
+    return renamed, embedded, errors + embed_errors, [e for e in rescanned if e["original"] != e["final"]]
+
+
+def summarize(label, scanner, entries, elapsed, expected, server_stats):
+    resolved = sum(1 for e in entries if e["final"].startswith(sanitize_filename(expected.get(e["original"], "\0"))))
+    providers = scanner.metrics.report()["providers"]
+    calls = sum(c.get("calls", 0) for c in providers.values())
+    hits = sum(c.get("cache_hits", 0) for c in providers.values())
+    limited = sum(c.get("rate_limited", 0) for c in providers.values())
+    if not entries:
+        print(f"{label}: no files finished in {elapsed:.2f}s")
+        return
+    print(f"{label}: {len(entries)} files in {elapsed:.2f}s ({len(entries) / elapsed:.1f} files/s), "
+          f"{calls} API calls, {hits} cache hits, {limited} rate limited, "
+          f"{resolved}/{len(entries)} resolved to their series")
+    print(f"  server: {server_stats}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", choices=("google_books", "comicvine"), default="google_books")
+    parser.add_argument("--files", type=int, default=300, help="Library size (default: 300)")
+    parser.add_argument("--subtitles", action="store_true", help="Look up per-volume subtitles")
+    parser.add_argument("--no-bulk", action="store_true", help="ComicVine: one search per file instead of per series")
+    parser.add_argument("--no-harvest", action="store_true", help="Google Books: don't page through whole series")
+    parser.add_argument("--workers", type=int, help="Lookups in flight at once (default: the Scanner default)")
+    parser.add_argument("--threads", action="store_true", help="Run lookups on a thread pool instead of asyncio")
+    parser.add_argument("--cancel-after", type=float, metavar="SECONDS",
+                        help="Cancel each pass after SECONDS and report how long stopping took")
+    parser.add_argument("--rate", type=float,
+                        help="Requests/s allowed per provider (default: the real providers' limits)")
+    parser.add_argument("--repeat", type=int, default=1, help="Scan passes; later passes reuse the cache")
+    parser.add_argument("--incremental", action="store_true", help="Use a scan manifest across passes")
+    parser.add_argument("--fixtures", default=FIXTURES_PATH)
+    parser.add_argument("--report", metavar="PATH", help="Write the scan reports (JSON) to PATH")
+    parser.add_argument("--apply-embed", action="store_true",
+                        help="Apply the last pass with ComicInfo.xml embedding; fail if a rescan renames anything")
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.fixtures)
+    settings = load_config()
+    settings.update({
+        "scan_mode": "both",
+        "online_source": args.source,
+        "comicvine_api_key": "mock-key",
+        "google_books_api_key": "",
+        "include_subtitle": args.subtitles,
+        "comicvine_bulk": not args.no_bulk,
+        "google_books_harvest": not args.no_harvest,
+        "async_lookups": not args.threads,
+        "read_comicinfo": True,
+        "recursive_scan": False,
+        "include_patterns": "",
+        "exclude_patterns": "",
+    })
+    if args.rate:
+        burst = max(1, int(args.rate))
+        SCHEDULER.limits = {"google_books": [(args.rate, burst)], "comicvine": [(args.rate, burst)]}
+        SCHEDULER.shared_limits = {"comicvine": [(args.rate, burst)]}
+
+    runs = []
+    exit_code = 0
+    with tempfile.TemporaryDirectory(prefix="cbz-bench-") as tmp, \
+            MockAPIServer(fixtures, **fault_options(args)) as server:
+        library = os.path.join(tmp, "library")
+        os.mkdir(library)
+        expected = build_library(library, fixtures["series"], args.files)
+        settings["google_books_api_url"] = server.google_books_url
+        settings["comicvine_api_url"] = server.comicvine_url
+        cache = load_disk_cache(os.path.join(tmp, "cache.db"))
+        manifest = ScanManifest(os.path.join(tmp, "manifest.db")) if args.incremental else None
+        print(f"{len(expected)} files, {args.source}, mock server at {server.url}")
+        try:
+            for n in range(1, args.repeat + 1):
+                before = dict(server.stats)
+                scanner, entries, elapsed, stopping = run_scan(library, settings, cache, manifest,
+                                                               args.workers, args.cancel_after)
+                stats = {k: v - before[k] for k, v in server.stats.items()}
+                summarize(f"pass {n}", scanner, entries, elapsed, expected, stats)
+                if stopping is not None:
+                    print(f"  cancelled after {args.cancel_after:g}s; scan returned {stopping * 1000:.1f} ms later")
+                runs.append(scanner.report(**{"pass": n, "server": stats}))
+            if args.apply_embed:
+                renamed, embedded, errors, pending = apply_and_rescan(library, settings, cache, manifest, entries)
+                print(f"apply: {len(renamed)} renamed, ComicInfo.xml written to {len(embedded)}, "
+                      f"{len(errors)} error(s); rescan proposes {len(pending)} rename(s)")
+                for entry in pending[:10]:
+                    print(f"  {entry['original']} -> {entry['final']} ({entry['status']})")
+                if errors or pending:
+                    exit_code = 1
+        finally:
+            save_disk_cache(cache, None)
+            if manifest is not None:
+                manifest.close()
+            if hasattr(cache, "close"):
+                cache.close()
+
+    if args.report:
+        write_report(args.report, runs)
+        print(f"Report written to {args.report}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Regression and speed check for title_format.
+
+    python benchmarks/bench_title_format.py                  # golden check + timing
+    python benchmarks/bench_title_format.py --titles 500000 --max-us 5
+
+Builds a corpus of API-style titles (Google Books and ComicVine spellings of
+volume, chapter and issue numbers, with and without subtitles) and checks
+pad_volume_in_title, strip_subtitle_from_title and extract_series_from_title
+against title_golden.json, recorded from the original implementations. Then
+times each helper per title. Exits non-zero on a mismatch or when any helper
+averages more than --max-us. After an intentional behavior change, rerun with
+--update and review the diff.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from title_format import pad_volume_in_title, strip_subtitle_from_title, extract_series_from_title  # noqa: E402
+
+GOLDEN_PATH = os.path.join(HERE, "title_golden.json")
+GOLDEN_FIELDS = ["title", "search_term", "padded", "pad_volume_in_title", "strip_subtitle_from_title",
+                 "extract_series_from_title"]
+
+SERIES = ["Berserk", "Blame!", "The Promised Neverland", "JoJo's Bizarre Adventure", "Re:Zero", "20th Century Boys"]
+SUBTITLES = ["The Black Swordsman", "Part 2: Battle Tendency", "Ch. 3 Special"]
+FORMATS = [
+    "{s} Volume {n}", "{s}, Vol. {n}", "{s}, Vol. {n}: {sub}", "{s} Vol {n} - {sub}", "{s} v.{n}",
+    "{s} #{n}", "{s} #{n} - {sub}", "{s} Chapter {n}", "{s} Ch. {n}: {sub}", "{s} {n}", "{s}: {sub}",
+    "{s} Deluxe Edition Volume {n}", "{s} (Omnibus) Vol. {n} – {sub}", "{s} Vol. {n} Chapter 5",
+    "#{n} - {s}", "{s} VOLUME {n}—{sub}", "{s}, v. {n}", "{s}", "Vol. {n}", "{s} Ch.{n} Vol. {n}: {sub}",
+]
+NUMBERS = [("1", "01"), ("01", "01"), ("12", "003")]
+
+
+def corpus():
+    """Yield (title, search_term, padded) for every combination, in a stable order.
+
+    The search term cycles through exact, lower-case, first-word and unrelated guesses.
+    """
+    combos = itertools.product(SERIES, FORMATS, SUBTITLES, NUMBERS)
+    for i, (s, fmt, sub, (n, padded)) in enumerate(c for c in combos if "{sub}" in c[1] or c[2] == SUBTITLES[0]):
+        title = fmt.format(s=s, n=n, sub=sub).strip()
+        yield title, (s, s.lower(), s.split()[0], "Naruto")[i % 4], padded
+
+
+def run_case(title, search_term, padded):
+    return [title, search_term, padded, pad_volume_in_title(title, padded), strip_subtitle_from_title(title),
+            list(extract_series_from_title(title, search_term))]
+
+
+def load_golden(path=GOLDEN_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["cases"]
+
+
+def write_golden(cases, path=GOLDEN_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{\n "version": 1,\n "fields": ' + json.dumps(GOLDEN_FIELDS) + ',\n "cases": [\n')
+        f.write(",\n".join("  " + json.dumps(case, ensure_ascii=False) for case in cases))
+        f.write("\n ]\n}\n")
+
+
+def check_golden(cases):
+    """Return a list of (expected, actual) for every case that no longer matches."""
+    failures = []
+    for expected in cases:
+        actual = run_case(*expected[:3])
+        if actual != expected:
+            failures.append((expected, actual))
+    return failures
+
+
+def time_helper(func, args, total):
+    """Call func(*a) for `total` argument tuples (cycling through `args`). Returns µs per call."""
+    batch = args * max(1, total // len(args))
+    start = time.perf_counter()
+    for a in batch:
+        func(*a)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(batch) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--titles", type=int, default=200_000, help="Calls per helper for timing (default: 200000)")
+    parser.add_argument("--max-us", type=float, help="Fail if any helper averages more than this (µs/title)")
+    parser.add_argument("--update", action="store_true", help="Rewrite the golden file from the current helpers")
+    args = parser.parse_args(argv)
+
+    if args.update:
+        cases = [run_case(*case) for case in corpus()]
+        write_golden(cases)
+        print(f"Rewrote {len(cases)} golden case(s)")
+        return 0
+
+    cases = load_golden()
+    failures = check_golden(cases)
+    for expected, actual in failures[:20]:
+        print(f"MISMATCH {expected[:3]!r}\n  expected {expected[3:]}\n  actual   {actual[3:]}")
+    print(f"golden: {len(cases) - len(failures)}/{len(cases)} match")
+
+    slowest = 0.0
+    for func, call_args in (
+            (pad_volume_in_title, [(case[0], case[2]) for case in cases]),
+            (strip_subtitle_from_title, [(case[0],) for case in cases]),
+            (extract_series_from_title, [(case[0], case[1]) for case in cases])):
+        per_call = time_helper(func, call_args, args.titles)
+        slowest = max(slowest, per_call)
+        print(f"{func.__name__}: {per_call:.2f} µs/title")
+
+    if failures:
+        return 1
+    if args.max_us is not None and slowest > args.max_us:
+        print(f"slower than the {args.max_us} µs/title budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""Local stand-in for the Google Books and ComicVine APIs.
+
+    python benchmarks/mock_api_server.py --port 8765 --latency 80 --rate-429 0.02
+    CBZ_RENAMER_GOOGLE_BOOKS_URL=http://127.0.0.1:8765/books/v1 \\
+    CBZ_RENAMER_COMICVINE_URL=http://127.0.0.1:8765/comicvine/api python cli.py scan ...
+
+Requests are answered from the recorded responses in api_fixtures.json when
+one matches (same path and query, ignoring API keys); anything else is
+synthesized from the fixture's series catalogue in the shape the real APIs
+use. With --record, unmatched requests are forwarded to the real APIs
+instead and their responses saved to the fixture file on exit.
+
+Latency, random 500s, random 429s and periodic 429 bursts (with a
+Retry-After header) can be injected to exercise the scheduler and retry
+paths. GET /_stats returns the request counters as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from api_sources import GOOGLE_BOOKS_DEFAULT_URL, COMICVINE_DEFAULT_URL  # noqa: E402
+
+FIXTURES_PATH = os.path.join(HERE, "api_fixtures.json")
+GOOGLE_BOOKS_PATH = "/books/v1"
+COMICVINE_PATH = "/comicvine/api"
+
+# Query parameters that don't change the answer (and must never be written to a fixture)
+_IGNORED_PARAMS = {"key", "api_key"}
+_QUOTED_RE = re.compile(r'(intitle:)?"([^"]*)"')
+
+
+def load_fixtures(path=FIXTURES_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data.setdefault("series", {})
+    data.setdefault("responses", {})
+    return data
+
+
+def request_key(path, query):
+    """Fixture key for a request: the path plus its sorted query, without API keys."""
+    params = sorted((k, v) for k, v in urllib.parse.parse_qsl(query) if k not in _IGNORED_PARAMS)
+    return f"{path}?{urllib.parse.urlencode(params)}"
+
+
+def _words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def _matches(series, query):
+    """True if the query's words all appear in the series name, in order (a loose intitle: match)."""
+    words = _words(query)
+    return bool(words) and " ".join(words) in " ".join(_words(series))
+
+
+# ─── Synthesized Responses ────────────────────────────────────────────────────
+
+class Catalogue:
+    """Answers API queries from {"series": {name: {"volumes": N, "subtitles": {vol: text}}}}.
+
+    A series may set "google_title" (default "{name}, Vol. {number}") to have Google Books
+    spell its volume titles differently.
+    """
+
+    def __init__(self, series):
+        self.series = series
+        self.ids = {name: 4000 + i for i, name in enumerate(sorted(series))}
+
+    def _volumes(self, name):
+        info = self.series[name]
+        subtitles = info.get("subtitles") or {}
+        return [(str(n), subtitles.get(str(n), "")) for n in range(1, int(info.get("volumes", 1)) + 1)]
+
+    def google_books(self, params):
+        terms = _QUOTED_RE.findall(params.get("q", ""))
+        series_terms = [text for _, text in terms if not text.isdigit()]
+        vol = next((text for _, text in terms if text.isdigit()), None)
+        items = []
+        for name in sorted(self.series):
+            if not series_terms or not all(_matches(name, term) for term in series_terms):
+                continue
+            for number, subtitle in self._volumes(name):
+                if vol is not None and number != vol:
+                    continue
+                info = {"title": self.series[name].get("google_title", "{name}, Vol. {number}").format(
+                    name=name, number=number)}
+                if subtitle:
+                    info["subtitle"] = subtitle
+                items.append({"kind": "books#volume", "id": f"{self.ids[name]}-{number}", "volumeInfo": info})
+        start = int(params.get("startIndex", 0))
+        size = int(params.get("maxResults", 10))
+        page = items[start:start + size]
+        body = {"kind": "books#volumes", "totalItems": len(items)}
+        if page:
+            body["items"] = page
+        return body
+
+    def comicvine(self, resource, params):
+        limit = int(params.get("limit", 100))
+        offset = int(params.get("offset", 0))
+        if resource == "search":
+            query = params.get("query", "")
+            names = [name for name in sorted(self.series) if _matches(name, query)]
+            if params.get("resources") == "volume":
+                results = [{"id": self.ids[name], "name": name, "count_of_issues": self.series[name].get("volumes", 1),
+                            "start_year": "2000"} for name in names]
+            else:
+                results = [{"name": subtitle or None, "issue_number": number,
+                            "volume": {"id": self.ids[name], "name": name}}
+                           for name in names for number, subtitle in self._volumes(name)]
+        elif resource == "issues":
+            match = re.fullmatch(r"volume:(\d+)", params.get("filter", ""))
+            names = [name for name, id_ in self.ids.items() if match and str(id_) == match.group(1)]
+            results = [{"name": subtitle or None, "issue_number": number}
+                       for name in names for number, subtitle in self._volumes(name)]
+        else:
+            return {"error": "Object Not Found", "status_code": 101, "results": []}
+        page = results[offset:offset + limit]
+        return {"error": "OK", "status_code": 1, "limit": limit, "offset": offset,
+                "number_of_page_results": len(page), "number_of_total_results": len(results), "results": page}
+
+
+# ─── Server ───────────────────────────────────────────────────────────────────
+
+class MockAPIServer:
+    """Threaded HTTP server answering like Google Books and ComicVine.
+
+    Args:
+        fixtures: Fixture dict (see load_fixtures)
+        host, port: Where to listen; port 0 picks a free port
+        latency: Milliseconds added to every response
+        jitter: Extra random milliseconds, 0..jitter
+        error_rate: Fraction of requests answered with a 500
+        rate_429: Fraction of requests answered with a 429
+        burst_every: Seconds between 429 bursts (0 = no bursts)
+        burst_length: Seconds each burst lasts
+        retry_after: Retry-After seconds sent with every 429
+        record: Forward unmatched requests to the real APIs and keep their responses
+        seed: Random seed for jitter and injected failures
+    """
+
+    def __init__(self, fixtures, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 rate_429=0.0, burst_every=0.0, burst_length=0.0, retry_after=1, record=False, seed=None):
+        self.fixtures = fixtures
+        self.catalogue = Catalogue(fixtures["series"])
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.retry_after = retry_after
+        self.record = record
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+        self.stats = {"requests": 0, "replayed": 0, "synthesized": 0, "recorded": 0,
+                      "rate_limited": 0, "errors": 0}
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def google_books_url(self):
+        return self.url + GOOGLE_BOOKS_PATH
+
+    @property
+    def comicvine_url(self):
+        return self.url + COMICVINE_PATH
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, counter):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def fault(self):
+        """Return (delay_seconds, status) for the next request; status is None for a normal answer."""
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            roll = self._random.random()
+        if self.burst_every and (time.monotonic() - self._t0) % self.burst_every < self.burst_length:
+            return delay, 429
+        if roll < self.rate_429:
+            return delay, 429
+        if roll < self.rate_429 + self.error_rate:
+            return delay, 500
+        return delay, None
+
+    def answer(self, path, query):
+        """Return (status, body) for a request path and raw query string."""
+        key = request_key(path, query)
+        recorded = self.fixtures["responses"].get(key)
+        if recorded is not None:
+            self._count("replayed")
+            return recorded.get("status", 200), recorded["body"]
+        if self.record:
+            return self._forward(path, query, key)
+        params = dict(urllib.parse.parse_qsl(query))
+        if path.rstrip("/") == GOOGLE_BOOKS_PATH + "/volumes":
+            body = self.catalogue.google_books(params)
+        elif path.startswith(COMICVINE_PATH + "/"):
+            body = self.catalogue.comicvine(path[len(COMICVINE_PATH) + 1:].strip("/"), params)
+        else:
+            return 404, {"error": f"Unknown endpoint {path}"}
+        self._count("synthesized")
+        return 200, body
+
+    def _forward(self, path, query, key):
+        if path.startswith(GOOGLE_BOOKS_PATH):
+            url = GOOGLE_BOOKS_DEFAULT_URL + path[len(GOOGLE_BOOKS_PATH):]
+        elif path.startswith(COMICVINE_PATH):
+            url = COMICVINE_DEFAULT_URL + path[len(COMICVINE_PATH):]
+        else:
+            return 404, {"error": f"Unknown endpoint {path}"}
+        request = urllib.request.Request(f"{url}?{query}", headers={"User-Agent": "CBZRenamer/1.0"})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                status, body = response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, {"error": str(e)}  # not recorded: failures are injected, not replayed
+        except Exception as e:
+            return 502, {"error": str(e)}
+        with self._lock:
+            self.fixtures["responses"][key] = {"status": status, "body": body}
+            self.stats["recorded"] += 1
+        return status, body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def do_GET(self):
+        mock = self.server.mock
+        path, _, query = self.path.partition("?")
+        if path == "/_stats":
+            with mock._lock:
+                self._send(200, dict(mock.stats))
+            return
+        delay, status = mock.fault()
+        if delay:
+            time.sleep(delay)
+        if status == 429:
+            mock._count("rate_limited")
+            self._send(429, {"error": "Rate limit exceeded"}, {"Retry-After": str(mock.retry_after)})
+        elif status == 500:
+            mock._count("errors")
+            self._send(500, {"error": "Injected server error"})
+        else:
+            self._send(*mock.answer(path, query))
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def save_fixtures(fixtures, path=FIXTURES_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f, indent=1, ensure_ascii=False, sort_keys=True)
+        f.write("\n")
+
+
+def add_fault_arguments(parser):
+    """Fault-injection options shared with bench_scan.py."""
+    parser.add_argument("--latency", type=float, default=0.0, help="Milliseconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, 0..N milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="Seconds between 429 bursts (0 = none)")
+    parser.add_argument("--burst-length", type=float, default=1.0, help="Seconds each 429 burst lasts")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, help="Random seed for jitter and injected failures")
+
+
+def fault_options(args):
+    return {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate,
+            "rate_429": args.rate_429, "burst_every": args.burst_every, "burst_length": args.burst_length,
+            "retry_after": args.retry_after, "seed": args.seed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=FIXTURES_PATH, help="Fixture file (default: api_fixtures.json)")
+    parser.add_argument("--record", action="store_true",
+                        help="Forward unmatched requests to the real APIs and save the responses on exit")
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.fixtures)
+    server = MockAPIServer(fixtures, host=args.host, port=args.port, record=args.record, **fault_options(args))
+    print(f"Google Books: {server.google_books_url}")
+    print(f"ComicVine:    {server.comicvine_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        if args.record and server.stats["recorded"]:
+            save_fixtures(fixtures, args.fixtures)
+            print(f"Recorded {server.stats['recorded']} response(s) to {args.fixtures}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+from startup_profile import STARTUP  # first, so its load time is the zero point of --profile-startup
 import sys
 import traceback
 import ctypes
@@ -5,25 +6,25 @@ import ctypes
 # --- CRASH CATCHER START ---
 try:
     import os
-    import re
     import threading
     import tkinter as tk
-    from tkinter import filedialog, messagebox, ttk, simpledialog
-    import webbrowser # Added by user
-    import json # Added by user
+    from tkinter import ttk
 
     from config import (
         BG_DARK, BG_PANEL, BG_SURFACE, FG_TEXT, FG_DIM, FG_MUTED,
         ACCENT_BLUE, ACCENT_HOVER, ACCENT_PURPLE, SUCCESS_GREEN,
         TABLE_BG, TABLE_FG, CONFLICT_YELLOW, ERROR_RED, BORDER_COLOR, EDIT_BG,
-        load_config, save_config
+        load_config, save_config, ensure_app_data_dir
     )
-    from filename_parser import parse_filename, normalize, sanitize_filename
-    from api_sources import (
-        fetch_google_books_name, fetch_comicvine_name,
-        load_disk_cache, save_disk_cache, reset_google_books_quota
-    )
-    from config import CACHE_PATH
+    from config import APP_DATA_DIR, CACHE_PATH, LEGACY_CACHE_PATH, JOURNAL_DIR, MANIFEST_PATH, SCAN_REPORT_PATH
+    from scan_metrics import write_report
+    from results_view import ResultsView
+    from duplicate_index import DuplicateIndex, DUPLICATE
+    # The scan, network and rename modules, tkinter's dialogs and webbrowser are imported where
+    # they are first used, to get the window up sooner. These are preloaded once it is (_preload_modules)
+    PRELOAD_MODULES = ("scan_engine", "rename_executor", "comicinfo", "scan_manifest")
+
+    STARTUP.mark("imports")
 
     class CollapsibleSection(tk.Frame):
         """A frame with a clickable header that expands/collapses its content."""
@@ -199,16 +200,27 @@ try:
 
             # ─── Load persisted settings ─────────────────────────────
             cfg = load_config()
+            STARTUP.mark("settings loaded")
             self.setting_scan_mode = tk.StringVar(value=cfg["scan_mode"])
             self.setting_num_padding = tk.IntVar(value=cfg["num_padding"])
             self.setting_include_subtitle = tk.BooleanVar(value=cfg["include_subtitle"])
+            self.setting_gb_harvest = tk.BooleanVar(value=cfg["google_books_harvest"])
             self.setting_sub_separator = tk.StringVar(value=cfg["sub_separator"])
             self.setting_online_source = tk.StringVar(value=cfg["online_source"])
             self.comicvine_api_key = tk.StringVar(value=cfg["comicvine_api_key"])
             self.google_books_api_key = tk.StringVar(value=cfg.get("google_books_api_key", ""))
             self.setting_use_source_format = tk.BooleanVar(value=cfg["use_source_format"])
             self.setting_cv_prefix = tk.StringVar(value=cfg.get("comicvine_vol_prefix", "#"))
+            self.setting_cv_bulk = tk.BooleanVar(value=cfg["comicvine_bulk"])
             self.setting_chapter_prefix = tk.StringVar(value=cfg.get("chapter_prefix", "Ch."))
+            self.setting_recursive = tk.BooleanVar(value=cfg["recursive_scan"])
+            self.setting_max_depth = tk.IntVar(value=cfg["max_depth"])
+            self.setting_include_patterns = tk.StringVar(value=cfg["include_patterns"])
+            self.setting_exclude_patterns = tk.StringVar(value=cfg["exclude_patterns"])
+            self.setting_incremental = tk.BooleanVar(value=cfg["incremental_scan"])
+            self.setting_comicinfo = tk.BooleanVar(value=cfg["read_comicinfo"])
+            self.setting_fuzzy = tk.BooleanVar(value=cfg["fuzzy_match"])
+            self.setting_embed = tk.BooleanVar(value=cfg["embed_comicinfo"])
 
             # --- STYLES ---
             style = ttk.Style()
@@ -284,6 +296,10 @@ try:
             self.btn_apply.pack(side=tk.RIGHT)
             self.btn_apply.config(state=tk.DISABLED)
 
+            self.btn_undo = self._make_btn(controls, "  UNDO  ", self.undo_last_rename, "#333", FG_DIM)
+            self.btn_undo.pack(side=tk.RIGHT, padx=(0, 8))
+            self.btn_undo.config(state=tk.DISABLED)
+
             self.hint_lbl = tk.Label(controls, text="Double-click Final to edit  \u00b7  Right-click to toggle Web/Local",
                                      bg=BG_DARK, fg="#444444", font=("Segoe UI", 8))
             self.hint_lbl.pack(side=tk.RIGHT, padx=(0, 16))
@@ -310,9 +326,7 @@ try:
             self.tree.column("final",    width=260, minwidth=140)
             self.tree.column("status",   width=100, minwidth=70, anchor="center")
 
-            scroll = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview,
-                                    style="Dark.Vertical.TScrollbar")
-            self.tree.configure(yscroll=scroll.set)
+            scroll = ttk.Scrollbar(table_frame, orient="vertical", style="Dark.Vertical.TScrollbar")
             scroll.pack(side=tk.RIGHT, fill=tk.Y)
             self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
@@ -326,6 +340,9 @@ try:
             self.tree.tag_configure("edited",    foreground=ACCENT_BLUE)
             self.tree.tag_configure("ready",     foreground=TABLE_FG)
 
+            # Only the visible rows live in the tree; the scrollbar scrolls the whole result set
+            self.results = ResultsView(self.tree, scroll, on_scroll=self._destroy_edit)
+
             # --- STATUS BAR ---
             status_bar = tk.Frame(self.content, bg=BG_PANEL, height=28)
             status_bar.pack(side=tk.BOTTOM, fill=tk.X)
@@ -338,9 +355,19 @@ try:
 
             # Logic
             self.selected_directory = None
-            self.rename_data = {}
-            self.series_cache = load_disk_cache(CACHE_PATH)
+            self.rename_data = self.results.rows
+            self.conflicts = DuplicateIndex()
+            self.series_cache = None  # cache and manifest are opened by the first scan (_open_stores)
+            self.manifest = None
+            self._stores_open = False
             self.scan_in_progress = False
+            self._scan_settings = None
+            self._scanner = None
+            self._stop_requested = False
+            self._journal = None  # found by _check_interrupted_rename once the window is up
+            self.root.after(300, self._check_interrupted_rename)
+            self.root.after(500, self._preload_modules)
+            STARTUP.mark("window built")
 
         # ─── UI Helpers ──────────────────────────────────────────────
 
@@ -359,22 +386,61 @@ try:
         def on_closing(self):
             self._save_settings()
             self.is_running = False
+            if self._scanner:
+                self._scanner.cancel()
+            self.results.stop(flush=False)
             self._destroy_edit()
             self.root.destroy()
 
+        def _preload_modules(self):
+            """Import the modules deferred at startup on a daemon thread, so the first scan doesn't wait for them."""
+            def _load():
+                import importlib
+                for name in PRELOAD_MODULES:
+                    try:
+                        importlib.import_module(name)
+                    except Exception as e:
+                        print(f"Preload of {name} failed: {e}")
+            threading.Thread(target=_load, daemon=True).start()
+
+        def _open_stores(self):
+            """Open the lookup cache and scan manifest on first use (from the scan thread)."""
+            if self._stores_open:
+                return
+            from api_sources import load_disk_cache
+            from scan_manifest import open_manifest
+            ensure_app_data_dir()
+            self.series_cache = load_disk_cache(CACHE_PATH, LEGACY_CACHE_PATH)
+            self.manifest = open_manifest(MANIFEST_PATH)
+            self._stores_open = True
+
         def _save_settings(self):
-            save_config({
+            save_config(self._settings_dict())
+
+        def _settings_dict(self):
+            """Snapshot the current settings as a plain dict (config.load_config keys)."""
+            return {
                 "scan_mode": self.setting_scan_mode.get(),
                 "num_padding": self.setting_num_padding.get(),
                 "include_subtitle": self.setting_include_subtitle.get(),
+                "google_books_harvest": self.setting_gb_harvest.get(),
                 "sub_separator": self.setting_sub_separator.get(),
                 "online_source": self.setting_online_source.get(),
                 "comicvine_api_key": self.comicvine_api_key.get(),
                 "google_books_api_key": self.google_books_api_key.get(),
                 "use_source_format": self.setting_use_source_format.get(),
                 "comicvine_vol_prefix": self.setting_cv_prefix.get(),
-                "chapter_prefix": self.setting_chapter_prefix.get()
-            })
+                "comicvine_bulk": self.setting_cv_bulk.get(),
+                "chapter_prefix": self.setting_chapter_prefix.get(),
+                "recursive_scan": self.setting_recursive.get(),
+                "max_depth": self.setting_max_depth.get(),
+                "include_patterns": self.setting_include_patterns.get(),
+                "exclude_patterns": self.setting_exclude_patterns.get(),
+                "incremental_scan": self.setting_incremental.get(),
+                "read_comicinfo": self.setting_comicinfo.get(),
+                "fuzzy_match": self.setting_fuzzy.get(),
+                "embed_comicinfo": self.setting_embed.get()
+            }
 
         # ─── Settings Dialog ─────────────────────────────────────────
 
@@ -447,6 +513,44 @@ try:
             for val, label in [("both", "Local + Online"), ("local", "Local Only"), ("online", "Online Only")]:
                 self._dark_radio(sec_scan.content, label, self.setting_scan_mode, val)
 
+            # ── LIBRARY ──
+            sec_lib = CollapsibleSection(body, "LIBRARY", expanded=False)
+            sec_lib.pack(fill=tk.X, pady=(0, 4))
+            lib = sec_lib.content
+            tk.Checkbutton(lib, text="Include subfolders",
+                variable=self.setting_recursive,
+                bg=BG_PANEL, fg=TABLE_FG, selectcolor=BG_PANEL, activebackground=BG_PANEL,
+                activeforeground=FG_TEXT, font=("Segoe UI", 9), highlightthickness=0,
+                borderwidth=0).pack(anchor="w", pady=(4, 2))
+
+            depth_frame = tk.Frame(lib, bg=BG_PANEL)
+            depth_frame.pack(fill=tk.X, anchor="w", padx=(24, 0), pady=(0, 6))
+            tk.Label(depth_frame, text="Max depth (0 = unlimited):", bg=BG_PANEL, fg=FG_DIM,
+                     font=("Segoe UI", 8)).pack(side=tk.LEFT)
+            ttk.Combobox(depth_frame, textvariable=self.setting_max_depth,
+                         values=list(range(0, 11)), state="readonly", width=4).pack(side=tk.LEFT, padx=(8, 0))
+
+            for label_text, var in [("Include patterns (e.g. *.cbz; Manga/*):", self.setting_include_patterns),
+                                    ("Exclude patterns (e.g. *preview*; Extras):", self.setting_exclude_patterns)]:
+                tk.Label(lib, text=label_text, bg=BG_PANEL, fg=FG_DIM,
+                         font=("Segoe UI", 8)).pack(anchor="w", pady=(4, 0))
+                tk.Entry(lib, textvariable=var,
+                    font=("Consolas", 9), bg=BG_SURFACE, fg=FG_TEXT, insertbackground=FG_TEXT,
+                    selectbackground=ACCENT_BLUE, relief="flat", borderwidth=0, highlightthickness=1,
+                    highlightcolor=ACCENT_BLUE, highlightbackground=BORDER_COLOR).pack(fill=tk.X, ipady=4, pady=(2, 4))
+
+            tk.Checkbutton(lib, text="Reuse results for unchanged files (fast rescans)",
+                variable=self.setting_incremental,
+                bg=BG_PANEL, fg=TABLE_FG, selectcolor=BG_PANEL, activebackground=BG_PANEL,
+                activeforeground=FG_TEXT, font=("Segoe UI", 9), highlightthickness=0,
+                borderwidth=0).pack(anchor="w", pady=(4, 2))
+
+            tk.Checkbutton(lib, text="Write ComicInfo.xml into renamed files",
+                variable=self.setting_embed,
+                bg=BG_PANEL, fg=TABLE_FG, selectcolor=BG_PANEL, activebackground=BG_PANEL,
+                activeforeground=FG_TEXT, font=("Segoe UI", 9), highlightthickness=0,
+                borderwidth=0).pack(anchor="w", pady=(0, 2))
+
             # ── ONLINE SOURCE ──
             sec_online = CollapsibleSection(body, "ONLINE SOURCE", expanded=False)
             sec_online.pack(fill=tk.X, pady=(0, 4))
@@ -455,6 +559,18 @@ try:
             for val, label in [("google_books", "Google Books"), ("comicvine", "ComicVine")]:
                 self._dark_radio(src_frame, label, self.setting_online_source, val)
 
+            tk.Checkbutton(sec_online.content, text="Use embedded ComicInfo.xml first (no API call)",
+                variable=self.setting_comicinfo,
+                bg=BG_PANEL, fg=TABLE_FG, selectcolor=BG_PANEL, activebackground=BG_PANEL,
+                activeforeground=FG_TEXT, font=("Segoe UI", 9), highlightthickness=0,
+                borderwidth=0).pack(anchor="w", pady=(0, 2))
+
+            tk.Checkbutton(sec_online.content, text="Match near-miss names to series already looked up",
+                variable=self.setting_fuzzy,
+                bg=BG_PANEL, fg=TABLE_FG, selectcolor=BG_PANEL, activebackground=BG_PANEL,
+                activeforeground=FG_TEXT, font=("Segoe UI", 9), highlightthickness=0,
+                borderwidth=0).pack(anchor="w", pady=(0, 2))
+
             # ── API KEYS ──
             sec_keys = CollapsibleSection(sec_online.content, "API Keys", expanded=False)
             sec_keys.pack(fill=tk.X, pady=(4, 0))
@@ -500,7 +616,10 @@ try:
                     if link_text and link_url:
                          l = tk.Label(link_frame, text=link_text, bg=BG_PANEL, fg="#5ba4e5", font=("Segoe UI", 7), cursor="hand2")
                          l.pack(side=tk.LEFT)
-                         l.bind("<Button-1>", lambda e: webbrowser.open(link_url))
+                         def _open_link(e):
+                             import webbrowser
+                             webbrowser.open(link_url)
+                         l.bind("<Button-1>", _open_link)
                          
                          def _enter(e): l.config(fg="#8bc4ff")
                          def _leave(e): l.config(fg="#5ba4e5")
@@ -552,6 +671,13 @@ try:
                                     state="readonly", width=10)
             cv_combo.pack(side=tk.LEFT, padx=(8, 0))
 
+            # ComicVine bulk mode
+            tk.Checkbutton(wb, text="ComicVine: fetch each series' issue list at once",
+                variable=self.setting_cv_bulk,
+                bg=BG_PANEL, fg=TABLE_FG, selectcolor=BG_PANEL, activebackground=BG_PANEL,
+                activeforeground=FG_TEXT, font=("Segoe UI", 9), highlightthickness=0,
+                borderwidth=0).pack(anchor="w", padx=(24, 0), pady=(0, 6))
+
             # Chapter Prefix Dropdown
             ch_frame = tk.Frame(wb, bg=BG_PANEL)
             ch_frame.pack(fill=tk.X, anchor="w", padx=(24, 0), pady=(0, 6))
@@ -583,7 +709,13 @@ try:
                 variable=self.setting_include_subtitle,
                 bg=BG_PANEL, fg=TABLE_FG, selectcolor=BG_PANEL, activebackground=BG_PANEL,
                 activeforeground=FG_TEXT, font=("Segoe UI", 9), highlightthickness=0, borderwidth=0)
-            cb.pack(anchor="w", pady=(4, 8))
+            cb.pack(anchor="w", pady=(4, 2))
+
+            tk.Checkbutton(wb, text="Google Books: fetch a whole series' subtitles at once",
+                variable=self.setting_gb_harvest,
+                bg=BG_PANEL, fg=TABLE_FG, selectcolor=BG_PANEL, activebackground=BG_PANEL,
+                activeforeground=FG_TEXT, font=("Segoe UI", 9), highlightthickness=0,
+                borderwidth=0).pack(anchor="w", padx=(24, 0), pady=(0, 8))
 
             # Force scroll region calculation after all sections are packed
             body.update_idletasks()
@@ -614,6 +746,7 @@ try:
         # ─── Folder / Scan ───────────────────────────────────────────
 
         def select_folder(self):
+            from tkinter import filedialog
             folder = filedialog.askdirectory()
             if folder:
                 self.selected_directory = folder
@@ -621,8 +754,8 @@ try:
                 self.lbl_path.config(text=display, fg=FG_MUTED)
                 self._enable_btn(self.btn_scan, ACCENT_PURPLE)
                 self.status_lbl.config(text="Folder loaded \u2014 ready to scan", fg=FG_DIM)
-                self.tree.delete(*self.tree.get_children())
-                self.rename_data.clear()
+                self.results.clear()
+                self.conflicts.clear()
                 self.file_count_lbl.config(text="")
 
         def start_scan_thread(self):
@@ -630,12 +763,14 @@ try:
                 return
 
             # Reset API quotas (Give fresh chance if key added)
+            from api_sources import reset_google_books_quota
             reset_google_books_quota()
 
             # Check for ComicVine key if needed (Main Thread)
             if self.setting_online_source.get() == "comicvine":
                 cv_key = self.comicvine_api_key.get().strip()
                 if not cv_key:
+                    from tkinter import simpledialog
                     new_key = simpledialog.askstring("ComicVine API Key Required", 
                                         "Please enter your ComicVine API Key:\n(Get one at comicvine.gamespot.com/api)",
                                         parent=self.root)
@@ -646,304 +781,154 @@ try:
                         return
 
             self.scan_in_progress = True
-            self._disable_btn(self.btn_scan)
+            self._scan_settings = self._settings_dict()
+            self._stop_requested = False
+            # The scan button doubles as Stop while the scan runs
+            self.btn_scan.config(text="  STOP  ", command=self.stop_scan)
+            self._enable_btn(self.btn_scan, ERROR_RED)
             self._disable_btn(self.btn_apply)
             self.status_lbl.config(text="Scanning\u2026", fg=ACCENT_BLUE)
+            self.safe_clear_tree()
+            self._scanner = None
+            self.results.start(self._show_scan_progress,
+                               metrics=lambda: self._scanner.metrics if self._scanner else None)
             threading.Thread(target=self.run_scan, daemon=True).start()
 
-        def _pad_volume_in_title(self, raw_title, vol_num_padded):
-            """Replace the volume number in a raw API title with the zero-padded version.
-
-            e.g. "Berserk Volume 1" + "01" -> "Berserk Volume 01"
-                 "Berserk, Vol. 3"  + "03" -> "Berserk, Vol. 03"
-                 "Berserk #1"       + "01" -> "Berserk #01"
-            """
-            def _replace_num(m):
-                return m.group(1) + vol_num_padded
-            # Try Vol/Volume patterns
-            result = re.sub(
-                r'((?:Vol\.?|Volume|v\.)\s*)\d+',
-                _replace_num, raw_title, count=1, flags=re.IGNORECASE
-            )
-            if result != raw_title:
-                return result
-            # Try Chapter patterns
-            result = re.sub(
-                r'((?:Chapter|Ch\.?)\s*)\d+',
-                _replace_num, raw_title, count=1, flags=re.IGNORECASE
-            )
-            if result != raw_title:
-                return result
-            # Try # pattern (ComicVine style)
-            result = re.sub(
-                r'(#)\d+',
-                _replace_num, raw_title, count=1
-            )
-            return result
-
-        def _strip_subtitle_from_title(self, raw_title):
-            """Remove the subtitle portion from a raw title.
-
-            e.g. "Berserk, Vol. 1: The Black Swordsman" -> "Berserk, Vol. 1"
-                 "Berserk #1 - The Black Swordsman"      -> "Berserk #1"
-            """
-            # Try Vol/Volume pattern
-            cleaned = re.split(
-                r'((?:Vol\.?|Volume|v\.)\s*\d+)\s*[:\-\u2013\u2014]\s*.+',
-                raw_title, maxsplit=1, flags=re.IGNORECASE
-            )
-            if len(cleaned) > 1:
-                return cleaned[0] + cleaned[1]
-            # Try # pattern (ComicVine style)
-            cleaned = re.split(
-                r'(#\d+)\s*[:\-\u2013\u2014]\s*.+',
-                raw_title, maxsplit=1
-            )
-            if len(cleaned) > 1:
-                return cleaned[0] + cleaned[1]
-            return raw_title
-
         def run_scan(self):
             try:
-                files = sorted([f for f in os.listdir(self.selected_directory) if f.lower().endswith(".cbz")])
-                self.root.after(0, self.safe_clear_tree)
+                from scan_engine import Scanner, walk_library
+                self._open_stores()
+                # Unchanged files are rebuilt from the manifest (e.g. the rescan right after a rename)
+                manifest = self.manifest if self._scan_settings["incremental_scan"] else None
+                files = walk_library(self.selected_directory, self._scan_settings, with_stat=manifest is not None)
 
-                scan_mode = self.setting_scan_mode.get()
-                pad = self.setting_num_padding.get()
-                source = self.setting_online_source.get()
-                use_source_fmt = self.setting_use_source_format.get()
-                series_probe_results = {}  # Track if series has subtitles (True/False)
-                cv_key_declined = False    # Track if user declined to provide key this session
+                def _status(text, color):
+                    if self.is_running:
+                        self.root.after(0, lambda: self.status_lbl.config(text=text, fg=color))
 
-                for i, filename in enumerate(files):
-                    if not self.is_running:
-                        break
+                scanner = self._scanner = Scanner(self._scan_settings, self.series_cache, status_callback=_status,
+                                                  manifest=manifest)
+                if self._stop_requested:
+                    scanner.cancel()
 
-                    self.root.after(0, lambda i=i, t=len(files):
-                        self.status_lbl.config(text=f"Scanning {i+1} of {t}\u2026", fg=ACCENT_BLUE))
+                def _on_entry(entry):
+                    # Queued for the results view's next timed flush rather than one callback per row
+                    if self.is_running:
+                        self.results.submit(self._row_from_entry(entry))
 
-                    series_guess, vol_num_raw, type_str = parse_filename(filename)
-
-                    try:
-                        vol_num = str(int(vol_num_raw)).zfill(pad)
-                    except ValueError:
-                        vol_num = vol_num_raw
-
-                    # Online lookup
-                    online_series = None
-                    online_raw_title = None
-                    online_subtitle = None
-                    online_orig_sep = " - "
-                    if scan_mode in ("both", "online"):
-                        try:
-                            if source == "comicvine":
-                                cv_key = self.comicvine_api_key.get().strip()
-                                if cv_key:
-                                    def _cv_status(text, color):
-                                        if self.root:
-                                            self.root.after(0, lambda: self.status_lbl.config(text=text, fg=color))
-                                    
-                                    # Add space for non-# prefixes
-                                    cv_prefix = self.setting_cv_prefix.get().strip()
-                                    if cv_prefix != "#":
-                                        cv_prefix += " "
-
-                                    text = f"Searching ComicVine for: {series_guess}"
-                                    color = FG_TEXT
-                                    if self.root:
-                                        self.root.after(0, lambda: self.status_lbl.config(text=text, fg=color))
-                                    online_series, online_raw_title, online_subtitle, online_orig_sep = \
-                                        fetch_comicvine_name(series_guess, self.series_cache,
-                                                            cv_key,
-                                                            vol_num=vol_num_raw,
-                                                            vol_prefix=cv_prefix,
-                                                            status_callback=_cv_status)
-                                else:
-                                    def _gb_status(text, color):
-                                        if self.root:
-                                            self.root.after(0, lambda: self.status_lbl.config(text=text, fg=color))
-
-                                    # Smart Probe Logic
-                                    query_vol = None
-                                    if self.setting_include_subtitle.get():
-                                        if series_guess not in series_probe_results:
-                                            query_vol = vol_num_raw  # Probe first file
-                                        elif series_probe_results[series_guess]:
-                                            query_vol = vol_num_raw  # Continue strict mode
-                                        else:
-                                            query_vol = None         # Fallback to fast mode
-
-                                    online_series, online_raw_title, online_subtitle, online_orig_sep = \
-                                        fetch_google_books_name(series_guess, self.series_cache,
-                                                                api_key=self.google_books_api_key.get().strip() or None,
-                                                                status_callback=_gb_status,
-                                                                vol_num=query_vol)
-                                    
-                                    # Update probe results
-                                    if self.setting_include_subtitle.get():
-                                        if online_subtitle:
-                                            series_probe_results[series_guess] = True
-                                        elif series_guess not in series_probe_results:
-                                            # First probe found NO subtitle. This result is likely generic enough for the series.
-                                            # Cache it under the generic series key to save a call for next files (which will use fast mode).
-                                            series_probe_results[series_guess] = False
-                                            if online_series:
-                                                self.series_cache[series_guess] = (online_series, online_raw_title, online_subtitle, online_orig_sep)
-                            else:
-                                def _gb_status(text, color):
-                                    if self.root:
-                                        self.root.after(0, lambda: self.status_lbl.config(text=text, fg=color))
-
-                                # Smart Probe Logic
-                                query_vol = None
-                                if self.setting_include_subtitle.get():
-                                    if series_guess not in series_probe_results:
-                                        query_vol = vol_num_raw  # Probe first file
-                                    elif series_probe_results[series_guess]:
-                                        query_vol = vol_num_raw  # Continue strict mode
-                                    else:
-                                        query_vol = None         # Fallback to fast mode
-
-                                online_series, online_raw_title, online_subtitle, online_orig_sep = \
-                                    fetch_google_books_name(series_guess, self.series_cache,
-                                                            api_key=self.google_books_api_key.get().strip() or None,
-                                                            status_callback=_gb_status,
-                                                            vol_num=query_vol)
-
-                                # Update probe results
-                                if self.setting_include_subtitle.get():
-                                    if online_subtitle:
-                                        series_probe_results[series_guess] = True
-                                    elif series_guess not in series_probe_results:
-                                        series_probe_results[series_guess] = False
-                        except Exception as e:
-                            print(f"Online lookup failed for '{series_guess}': {e}")
-
-                    # Determine prefix based on detected type
-                    if type_str == "Volume":
-                        prefix = "Vol."
-                    else:
-                        prefix = self.setting_chapter_prefix.get()
-
-                    # Build online name
-                    online_name = "\u2014"
-                    if online_series:
-                        if use_source_fmt and online_raw_title and type_str == "Volume":
-                            # Use the raw title from the API, just pad the number
-                            # Only for Volumes — chapters should use standardized format
-                            # since APIs always return volume-based titles
-                            online_name = self._pad_volume_in_title(online_raw_title, vol_num)
-                            # Handle subtitle stripping if subtitles are disabled
-                            if not self.setting_include_subtitle.get():
-                                online_name = self._strip_subtitle_from_title(online_name)
-                            online_name += ".cbz"
-                        else:
-                            # Standardized format
-                            online_name = f"{online_series}, {prefix} {vol_num}"
-                            if self.setting_include_subtitle.get() and online_subtitle:
-                                online_name += f" - {online_subtitle}"
-                            online_name += ".cbz"
-                        online_name = sanitize_filename(online_name)
-
-                    # Build local backup name
-                    backup_name = "\u2014"
-                    if scan_mode in ("both", "local"):
-                        backup_name = sanitize_filename(f"{series_guess}, {prefix} {vol_num}.cbz")
-
-                    # Determine final name and status
-                    if scan_mode == "online":
-                        if online_series:
-                            final = online_name
-                            tag = "match"
-                            status = "Online"
-                        else:
-                            final = filename
-                            tag = "offline"
-                            status = "No Match"
-                    elif scan_mode == "local":
-                        final = backup_name
-                        tag = "ready"
-                        status = "Ready"
-                        if backup_name == filename:
-                            status = "Perfect"
-                            tag = "match"
-                    else:
-                        final = backup_name
-                        tag = "ready"
-                        status = "Ready"
-
-                        if backup_name == filename:
-                            status = "Perfect"
-                            tag = "match"
-
-                        if online_series:
-                            final = online_name
-                            if normalize(online_name) == normalize(backup_name):
-                                status = "Verified"
-                                tag = "match"
-                            else:
-                                status = "Conflict"
-                                tag = "conflict"
-
-                        if filename == final:
-                            status = "Perfect"
-                            tag = "match"
-
-                    self.root.after(0, self.insert_row, filename, online_name, backup_name, final, status, tag)
+                total = scanner.scan(files, _on_entry, root=self.selected_directory)
 
                 if self.is_running:
-                    self.root.after(0, lambda n=len(files): self.finish_scan(n))
+                    self.root.after(0, lambda n=total: self.finish_scan(n))
 
             except Exception as e:
                 print(f"Scan Error: {e}")
                 traceback.print_exc()
                 if self.is_running:
+                    self.root.after(0, self.results.stop)
                     self.root.after(0, lambda: self.status_lbl.config(text=f"Error: {e}", fg=ERROR_RED))
                     self.root.after(0, lambda: setattr(self, 'scan_in_progress', False))
+                    self.root.after(0, self._reset_scan_btn)
+
+        def stop_scan(self):
+            """Cancel the running scan; rows found so far stay in the table."""
+            if not self.scan_in_progress or self._stop_requested:
+                return
+            self._stop_requested = True
+            self._disable_btn(self.btn_scan)
+            if self._scanner:
+                self._scanner.cancel()
+            self.status_lbl.config(text="Stopping\u2026", fg=CONFLICT_YELLOW)
+
+        def _reset_scan_btn(self):
+            self.btn_scan.config(text="  SCAN  ", command=self.start_scan_thread)
+            self._enable_btn(self.btn_scan, ACCENT_PURPLE)
 
         def finish_scan(self, total):
+            from api_sources import save_disk_cache
+            self.results.stop()
             save_disk_cache(self.series_cache, CACHE_PATH)
             self.scan_in_progress = False
             self.check_duplicates()
             self._enable_btn(self.btn_apply, SUCCESS_GREEN)
-            self._enable_btn(self.btn_scan, ACCENT_PURPLE)
-            self.status_lbl.config(text="Scan complete", fg=SUCCESS_GREEN)
+            self._reset_scan_btn()
+            scanner = self._scanner
+            notes = []
+            if scanner and scanner.reused:
+                notes.append(f"{scanner.reused} unchanged")
+            if scanner and scanner.comicinfo_hits:
+                notes.append(f"{scanner.comicinfo_hits} from ComicInfo.xml")
+            if scanner:
+                notes.append(f"{scanner.metrics.elapsed:.1f}s")
+                try:
+                    write_report(SCAN_REPORT_PATH, [scanner.report(directory=self.selected_directory)])
+                except OSError as e:
+                    print(f"Could not write scan report: {e}")
+            label = "Scan stopped" if scanner and scanner.cancelled else "Scan complete"
+            self.status_lbl.config(text=f"{label} ({', '.join(notes)})" if notes else label,
+                                   fg=CONFLICT_YELLOW if label == "Scan stopped" else SUCCESS_GREEN)
             self.file_count_lbl.config(text=f"{total} file{'s' if total != 1 else ''}")
 
+        def _show_scan_progress(self, done):
+            # Called once per results flush, so the label updates a few times a second at most.
+            # Files are discovered while the scan runs, so the total grows as folders are read
+            if self._stop_requested:
+                return
+            scanner = self._scanner
+            if scanner is None:
+                text = f"Scanning {done}\u2026"
+            else:
+                text = scanner.metrics.progress(done, scanner.submitted)
+            self.status_lbl.config(text=text, fg=ACCENT_BLUE)
+
         def safe_clear_tree(self):
             self._destroy_edit()
-            self.tree.delete(*self.tree.get_children())
-            self.rename_data.clear()
+            self.results.clear()
+            self.conflicts.clear()
 
         # ─── Table Rows ──────────────────────────────────────────────
 
-        def insert_row(self, original, online, backup, final, status, tag):
-            item_id = self.tree.insert("", tk.END, values=(original, online, backup, final, status), tags=(tag,))
-            self.rename_data[item_id] = {'original': original, 'online': online, 'backup': backup, 'final': final}
+        def _row_from_entry(self, entry):
+            # Files from subfolders show their path relative to the opened folder
+            display = entry['original']
+            rel_dir = os.path.relpath(entry['directory'], self.selected_directory)
+            if rel_dir != os.curdir:
+                display = os.path.join(rel_dir, display)
+            return {
+                'directory': entry['directory'], 'display': display, 'original': entry['original'],
+                'online': entry['online'], 'backup': entry['backup'], 'final': entry['final'],
+                'status': entry['status'], 'tag': entry['tag'], 'metadata': entry['metadata'],
+                'proposed': entry['final'], 'scan_metadata': entry['metadata']
+            }
 
         def check_duplicates(self):
-            final_counts = {}
+            # Full pass, once per scan; edits afterwards go through _update_row
+            self.conflicts.clear()
+            changed = set()
             for item_id, data in self.rename_data.items():
-                if data['original'] == data['final']:
-                    continue
-                final_counts.setdefault(data['final'], []).append(item_id)
-
-            for final, item_ids in final_counts.items():
-                if len(item_ids) > 1:
-                    for item_id in item_ids:
-                        data = self.rename_data[item_id]
-                        self.tree.item(item_id, values=(
-                            data['original'], data['online'], data['backup'],
-                            data['final'], "Duplicate"
-                        ), tags=("duplicate",))
+                changed |= self.conflicts.set(item_id, data['directory'], data['original'], data['final'])
+            self._show_conflicts(changed)
+
+        def _show_conflicts(self, item_ids):
+            # Only rows whose duplicate / already-on-disk state flipped get redrawn
+            for item_id in item_ids:
+                state = self.conflicts.conflict(item_id)
+                data = self.rename_data[item_id]
+                if state is None:
+                    data.pop('conflict', None)
+                else:
+                    data['conflict'] = "Duplicate" if state == DUPLICATE else "Exists"
+                self.results.update(item_id)
 
         def _update_row(self, item_id, new_final, status_text, tag):
             data = self.rename_data[item_id]
             data['final'] = new_final
-            self.tree.item(item_id, values=(
-                data['original'], data['online'], data['backup'], new_final, status_text
-            ), tags=(tag,))
-            self.check_duplicates()
+            data['status'] = status_text
+            data['tag'] = tag
+            # The scan's ComicInfo fields describe the name it proposed; any other choice embeds nothing
+            data['metadata'] = data['scan_metadata'] if new_final == data['proposed'] else None
+            self.results.update(item_id)
+            self._show_conflicts(self.conflicts.set(item_id, data['directory'], data['original'], new_final))
 
         # ─── Inline Editing (Double-Click Final Column) ──────────────
 
@@ -1026,46 +1011,85 @@ try:
         # ─── Apply Rename ─────────────────────────────────────────────
 
         def apply_rename(self):
+            from tkinter import messagebox
+            from scan_engine import find_duplicate_targets
+            from rename_executor import ROLLBACK_NOTE, apply_renames, new_journal_path
+            from comicinfo import embed_entries
             self._destroy_edit()
 
-            final_names = {}
-            for item_id, data in self.rename_data.items():
-                if data['original'] == data['final']:
-                    continue
-                final = data['final']
-                if final in final_names:
-                    messagebox.showerror("Duplicate Error",
-                        f"Multiple files would become:\n\n{final}\n\nResolve duplicates first.")
-                    return
-                final_names[final] = item_id
+            dupes = find_duplicate_targets(self.rename_data.values())
+            if dupes:
+                final = sorted(dupes)[0][1]
+                messagebox.showerror("Duplicate Error",
+                    f"Multiple files would become:\n\n{final}\n\nResolve duplicates first.")
+                return
 
-            if not final_names:
+            pending = sum(1 for data in self.rename_data.values() if data['original'] != data['final'])
+            if not pending:
                 self.status_lbl.config(text="Nothing to rename", fg=FG_DIM)
                 return
 
-            if not DarkConfirmDialog(self.root, "Confirm", f"Rename {len(final_names)} file(s)?").result:
+            if not DarkConfirmDialog(self.root, "Confirm", f"Rename {pending} file(s)?").result:
                 return
 
-            renamed, skipped, errors = [], [], []
-            for item_id, data in self.rename_data.items():
-                if data['original'] == data['final']:
-                    skipped.append(data['original'])
-                    continue
-                try:
-                    old = os.path.join(self.selected_directory, data['original'])
-                    safe_final = sanitize_filename(data['final'])
-                    new = os.path.join(self.selected_directory, safe_final)
-                    if os.path.exists(new) and old != new:
-                        errors.append((data['original'], "Target already exists"))
-                        continue
-                    os.rename(old, new)
-                    renamed.append((data['original'], data['final']))
-                except OSError as e:
-                    errors.append((data['original'], str(e)))
+            # Journaled so the batch can be undone, or resumed after a crash
+            journal = new_journal_path(JOURNAL_DIR)
+            entries = list(self.rename_data.values())
+            renamed, skipped, errors = apply_renames(entries, journal_path=journal)
+            if renamed:  # a batch that renamed nothing keeps Undo on the previous one
+                self._journal = journal
+            self._refresh_undo_btn()
+
+            failed = {path for path, _ in errors}
+            if self.setting_embed.get() and ROLLBACK_NOTE not in failed:
+                _, embed_errors = embed_entries(entries, skip=failed)
+                errors = errors + embed_errors
 
             self.show_results_dialog(renamed, skipped, errors)
             self.start_scan_thread()
 
+        # ─── Undo / Resume ────────────────────────────────────────────
+
+        def _refresh_undo_btn(self):
+            from rename_executor import read_journal, can_undo
+            try:
+                undoable = self._journal is not None and can_undo(read_journal(self._journal))
+            except (OSError, ValueError, KeyError):
+                undoable = False
+            if undoable:
+                self._enable_btn(self.btn_undo, "#2a2a2a")
+            else:
+                self._disable_btn(self.btn_undo)
+
+        def undo_last_rename(self):
+            if self.scan_in_progress or self._journal is None:
+                return
+            self._destroy_edit()
+            if not DarkConfirmDialog(self.root, "Undo", "Revert the last rename?").result:
+                return
+            from rename_executor import undo_journal
+            reverted, errors = undo_journal(self._journal)
+            self._refresh_undo_btn()
+            self.show_results_dialog(reverted, [], errors)
+            if self.selected_directory:
+                self.start_scan_thread()
+
+        def _check_interrupted_rename(self):
+            from rename_executor import latest_journal, read_journal, can_resume, resume_journal
+            self._journal = latest_journal(JOURNAL_DIR)
+            try:
+                interrupted = self._journal is not None and can_resume(read_journal(self._journal))
+            except (OSError, ValueError, KeyError):
+                interrupted = False
+            if not interrupted:
+                self._refresh_undo_btn()
+                return
+            if DarkConfirmDialog(self.root, "Interrupted Rename",
+                                 "The last rename did not finish.\nResume it now? (Undo reverts it)").result:
+                renamed, errors = resume_journal(self._journal)
+                self.show_results_dialog(renamed, [], errors)
+            self._refresh_undo_btn()
+
         # ─── Results Dialog ───────────────────────────────────────────
 
         def show_results_dialog(self, renamed, skipped, errors):
@@ -1147,6 +1171,9 @@ try:
             if errors:
                 text_box.insert(tk.END, f"  ERRORS ({len(errors)})\n", "section")
                 for name, err in errors:
+                    # Rename errors carry the file's path; show it relative to the opened folder
+                    if os.path.isabs(name) and self.selected_directory:
+                        name = os.path.relpath(name, self.selected_directory)
                     text_box.insert(tk.END, f"    \u2717  {name}\n", "error")
                     text_box.insert(tk.END, f"       {err}\n", "dim")
                 text_box.insert(tk.END, "\n")
@@ -1181,8 +1208,33 @@ try:
         except Exception:
             pass
 
+        # --profile-startup [PATH]: time each startup stage, write the report and quit once the window is up
+        profile_path = None
+        if "--profile-startup" in sys.argv:
+            i = sys.argv.index("--profile-startup") + 1
+            profile_path = sys.argv[i] if i < len(sys.argv) and not sys.argv[i].startswith("-") else None
+            if profile_path is None:
+                ensure_app_data_dir()
+                profile_path = os.path.join(APP_DATA_DIR, "startup_profile.json")
+
         root = tk.Tk()
+        STARTUP.mark("tk.Tk()")
         app = DarkRenamerApp(root)
+
+        if profile_path:
+            def _first_idle():
+                STARTUP.mark("first idle")
+                STARTUP.write(profile_path)
+                app.is_running = False
+                root.destroy()
+
+            def _mapped(event):
+                if event.widget is root:
+                    root.unbind("<Map>")
+                    STARTUP.mark("window mapped")
+                    root.after_idle(_first_idle)
+            root.bind("<Map>", _mapped)
+
         root.mainloop()
 
 # --- CRASH CATCHER LOGIC ---
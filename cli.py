@@ -0,0 +1,383 @@
+"""Headless command line for CBZ Renamer.
+
+    cbz-renamer scan DIR [DIR ...] [-o plan.json|plan.csv]
+    cbz-renamer apply plan.json|plan.csv [--status Verified,Perfect] [--dry-run]
+    cbz-renamer undo [JOURNAL]      # revert the last apply
+    cbz-renamer resume [JOURNAL]    # finish an apply that was interrupted
+    cbz-renamer watch DIR [DIR ...] # rename new arrivals as they land
+
+Settings default to the saved GUI settings and can be overridden per run.
+Run with `python cli.py ...` when no launcher is installed.
+"""
+import argparse
+import csv
+import json
+import os
+import signal
+import sys
+
+from config import load_config, ensure_app_data_dir, CACHE_PATH, LEGACY_CACHE_PATH, JOURNAL_DIR, MANIFEST_PATH
+from api_sources import load_disk_cache, save_disk_cache
+from scan_engine import PLACEHOLDER, Scanner, find_duplicate_targets, group_by_directory, walk_library
+from scan_shards import scan_sharded
+from scan_manifest import open_manifest
+from scan_metrics import write_report
+from rename_executor import (
+    DEFAULT_RENAME_WORKERS, ROLLBACK_NOTE, apply_renames, undo_journal, resume_journal,
+    new_journal_path, latest_journal, read_journal, can_undo, can_resume
+)
+from comicinfo import embed_entries
+from watcher import LibraryWatcher, AUTO_APPLY_STATUSES, DEBOUNCE_SECONDS, POLL_SECONDS
+
+PLAN_VERSION = 1
+PLAN_FIELDS = ["directory", "original", "online", "backup", "final", "status", "metadata"]
+
+
+# ─── Plans ────────────────────────────────────────────────────────────────────
+
+def write_plan(entries, out, fmt):
+    """Write plan entries to a file object as JSON or CSV."""
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=PLAN_FIELDS, extrasaction="ignore", lineterminator="\n")
+        writer.writeheader()
+        # ComicInfo fields go into one JSON cell, so `apply --embed` works from CSV plans too
+        writer.writerows({**e, "metadata": json.dumps(e["metadata"], ensure_ascii=False) if e.get("metadata") else ""}
+                         for e in entries)
+    else:
+        json.dump({"version": PLAN_VERSION, "entries": entries}, out, indent=2, ensure_ascii=False)
+        out.write("\n")
+
+
+def read_plan(path):
+    """Read plan entries from a JSON or CSV plan file (chosen by extension)."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            entries = list(csv.DictReader(f))
+            for entry in entries:
+                entry["metadata"] = json.loads(entry["metadata"]) if entry.get("metadata") else None
+            return entries
+        data = json.load(f)
+    if isinstance(data, dict):
+        if data.get("version", PLAN_VERSION) > PLAN_VERSION:
+            raise ValueError(f"Unsupported plan version: {data['version']}")
+        return data.get("entries", [])
+    return data
+
+
+def _embeddable(entry):
+    """True if the entry still carries the name its metadata was built for (not edited by hand)."""
+    proposed = entry.get("online") if entry.get("online") not in (None, "", PLACEHOLDER) else entry.get("backup")
+    return bool(entry.get("metadata")) and entry["final"] == proposed
+
+
+def _plan_format(args):
+    if args.format:
+        return args.format
+    if args.output and args.output.lower().endswith(".csv"):
+        return "csv"
+    return "json"
+
+
+# ─── Commands ─────────────────────────────────────────────────────────────────
+
+def _settings_from_args(args):
+    settings = load_config()
+    overrides = {
+        "scan_mode": args.mode,
+        "online_source": args.source,
+        "num_padding": args.padding,
+        "include_subtitle": args.subtitle,
+        "chapter_prefix": args.chapter_prefix,
+        "comicvine_bulk": args.cv_bulk,
+        "google_books_harvest": args.gb_harvest,
+        "recursive_scan": args.recursive,
+        "max_depth": args.max_depth,
+        "incremental_scan": args.incremental,
+        "read_comicinfo": args.comicinfo,
+        "fuzzy_match": args.fuzzy,
+        "async_lookups": args.async_lookups,
+        "include_patterns": args.include,
+        "exclude_patterns": args.exclude,
+    }
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    return settings
+
+
+def _print_status(text, color):
+    print(text, file=sys.stderr)
+
+
+def cmd_scan(args):
+    settings = _settings_from_args(args)
+    if settings["scan_mode"] != "local" and settings["online_source"] == "comicvine" \
+            and not settings["comicvine_api_key"].strip():
+        print("ComicVine key required (set it in the GUI settings).", file=sys.stderr)
+        return 2
+
+    sharded = args.processes != 1
+    ensure_app_data_dir()
+    cache = load_disk_cache(CACHE_PATH, LEGACY_CACHE_PATH)
+    manifest = open_manifest(MANIFEST_PATH) if settings["incremental_scan"] and not sharded else None
+    plan = []
+    reports = []
+    try:
+        for directory in args.directories:
+            if not os.path.isdir(directory):
+                print(f"Not a directory: {directory}", file=sys.stderr)
+                continue
+            directory = os.path.abspath(directory)
+            if sharded:
+                entries, report = scan_sharded(walk_library(directory, settings), settings, cache,
+                                               processes=args.processes or None, status_callback=_print_status,
+                                               max_workers=args.workers)
+                plan.extend(entries)
+                reports.append(dict(report, directory=directory))
+                print(f"{directory}: {len(entries)} file(s) on {report['processes']} process(es), "
+                      f"{report['offline']} resolved from the cache, {report['online']} looked up "
+                      f"in {report['duration']:.1f}s", file=sys.stderr)
+                continue
+            scanner = Scanner(settings, cache, status_callback=_print_status, max_workers=args.workers,
+                              manifest=manifest)
+            entries = scanner.scan_library(directory)
+            plan.extend(entries)
+            reports.append(scanner.report(directory=directory))
+            print(f"{directory}: {len(entries)} file(s), {scanner.reused} unchanged, "
+                  f"{scanner.comicinfo_hits} from ComicInfo.xml in {scanner.metrics.elapsed:.1f}s",
+                  file=sys.stderr)
+    finally:
+        save_disk_cache(cache, CACHE_PATH)
+        if args.report:
+            write_report(args.report, reports)
+
+    # Checked over the whole plan, since a sharded scan splits folders across processes
+    for directory, final in sorted(find_duplicate_targets(plan)):
+        print(f"{directory}: multiple files would become {final!r}", file=sys.stderr)
+
+    fmt = _plan_format(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            write_plan(plan, f, fmt)
+    else:
+        write_plan(plan, sys.stdout, fmt)
+    return 0
+
+
+def cmd_apply(args):
+    entries = read_plan(args.plan)
+    allowed = {s.strip() for s in args.status.split(",")} if args.status else None
+
+    if allowed is not None:
+        entries = [e for e in entries if e.get("status") in allowed]
+
+    exit_code = 0
+    batch = []
+    for directory, dir_entries in group_by_directory(entries).items():
+        dupes = find_duplicate_targets(dir_entries)
+        if dupes:
+            for _, final in sorted(dupes):
+                print(f"{directory}: multiple files would become {final!r}; skipping directory",
+                      file=sys.stderr)
+            exit_code = 1
+            continue
+
+        if args.dry_run:
+            for entry in dir_entries:
+                if entry["original"] != entry["final"]:
+                    print(f"{os.path.join(directory, entry['original'])} -> {entry['final']}")
+            continue
+        batch.extend(dir_entries)
+
+    if not batch:
+        return exit_code
+
+    journal = new_journal_path(JOURNAL_DIR)
+    renamed, skipped, errors = apply_renames(batch, journal_path=journal, workers=args.workers)
+    embedded = []
+    failed = {path for path, _ in errors}
+    embed = args.embed if args.embed is not None else load_config()["embed_comicinfo"]
+    if embed and not any(e.get("metadata") for e in batch):
+        print("No entry in the plan has ComicInfo metadata (plans from older versions don't); nothing to embed",
+              file=sys.stderr)
+    elif embed and ROLLBACK_NOTE not in failed:
+        embedded, embed_errors = embed_entries([e for e in batch if _embeddable(e)], skip=failed,
+                                               workers=args.workers)
+        errors = errors + embed_errors
+    _print_renames(renamed, errors)
+    if errors:
+        exit_code = 1
+    summary = f"{len(renamed)} renamed, {len(skipped)} unchanged, {len(errors)} error(s)"
+    if embed:
+        summary += f", ComicInfo.xml written to {len(embedded)} file(s)"
+    print(summary, file=sys.stderr)
+    if renamed:
+        print(f"Journal: {journal} (revert with `cbz-renamer undo`)", file=sys.stderr)
+    return exit_code
+
+
+def _print_renames(renamed, errors):
+    for old, new in renamed:
+        print(f"{old} -> {new}")
+    for name, err in errors:
+        print(f"{name}: {err}", file=sys.stderr)
+
+
+def _journal_arg(args):
+    path = args.journal or latest_journal(JOURNAL_DIR)
+    if path is None or not os.path.exists(path):
+        print("No rename journal found.", file=sys.stderr)
+        return None
+    return path
+
+
+def cmd_undo(args):
+    path = _journal_arg(args)
+    if path is None:
+        return 1
+    if not can_undo(read_journal(path)):
+        print(f"Nothing to undo in {path}", file=sys.stderr)
+        return 1
+    reverted, errors = undo_journal(path, workers=args.workers)
+    _print_renames(reverted, errors)
+    print(f"{len(reverted)} reverted, {len(errors)} error(s)", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def cmd_resume(args):
+    path = _journal_arg(args)
+    if path is None:
+        return 1
+    if not can_resume(read_journal(path)):
+        print(f"{path} is not an interrupted rename", file=sys.stderr)
+        return 1
+    renamed, errors = resume_journal(path, workers=args.workers)
+    _print_renames(renamed, errors)
+    print(f"{len(renamed)} renamed, {len(errors)} error(s)", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def cmd_watch(args):
+    settings = _settings_from_args(args)
+    if args.embed is not None:
+        settings["embed_comicinfo"] = args.embed
+    if settings["scan_mode"] != "local" and settings["online_source"] == "comicvine" \
+            and not settings["comicvine_api_key"].strip():
+        print("ComicVine key required (set it in the GUI settings).", file=sys.stderr)
+        return 2
+    roots = [d for d in args.directories if os.path.isdir(d)]
+    for directory in set(args.directories) - set(roots):
+        print(f"Not a directory: {directory}", file=sys.stderr)
+    if not roots:
+        return 1
+
+    ensure_app_data_dir()
+    cache = load_disk_cache(CACHE_PATH, LEGACY_CACHE_PATH)
+    manifest = open_manifest(MANIFEST_PATH) if settings["incremental_scan"] else None
+    statuses = [s.strip() for s in args.status.split(",")] if args.status else AUTO_APPLY_STATUSES
+    watcher = LibraryWatcher(roots, settings, cache, cache_path=CACHE_PATH, manifest=manifest,
+                             auto_apply=statuses, debounce=args.debounce, poll_interval=args.poll_interval,
+                             use_inotify=not args.poll, workers=args.workers,
+                             log=lambda text: print(text, file=sys.stderr, flush=True))
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: watcher.stop())
+    try:
+        watcher.run(scan_existing=args.initial_scan)
+    finally:
+        if manifest:
+            manifest.close()
+    return 0
+
+
+# ─── Entry Point ──────────────────────────────────────────────────────────────
+
+def _add_settings_arguments(cmd):
+    """Per-run overrides of the saved scan settings (see _settings_from_args)."""
+    cmd.add_argument("--mode", choices=["both", "local", "online"])
+    cmd.add_argument("--source", choices=["google_books", "comicvine"])
+    cmd.add_argument("--padding", type=int, choices=[2, 3])
+    cmd.add_argument("--subtitle", action=argparse.BooleanOptionalAction, default=None,
+                     help="Include subtitles from the API")
+    cmd.add_argument("--chapter-prefix", choices=["Ch.", "Chapter", "#"])
+    cmd.add_argument("--gb-harvest", action=argparse.BooleanOptionalAction, default=None,
+                     help="Google Books: page through each series once to fill subtitles")
+    cmd.add_argument("--cv-bulk", action=argparse.BooleanOptionalAction, default=None,
+                     help="ComicVine: fetch each series' issue list once instead of searching per file")
+    cmd.add_argument("-r", "--recursive", action=argparse.BooleanOptionalAction, default=None,
+                     help="Scan subfolders too")
+    cmd.add_argument("--max-depth", type=int, help="Maximum subfolder depth (0 = unlimited)")
+    cmd.add_argument("--incremental", action=argparse.BooleanOptionalAction, default=None,
+                     help="Reuse stored results for files unchanged since the last scan")
+    cmd.add_argument("--comicinfo", action=argparse.BooleanOptionalAction, default=None,
+                     help="Name files from their embedded ComicInfo.xml before asking the online source")
+    cmd.add_argument("--fuzzy", action=argparse.BooleanOptionalAction, default=None,
+                     help="Map near-miss series names to series already in the cache before going online")
+    cmd.add_argument("--async-lookups", action=argparse.BooleanOptionalAction, default=None,
+                     help="Run online lookups on one event loop instead of a thread pool")
+    cmd.add_argument("--include", action="append", metavar="GLOB",
+                     help="Only scan files matching this glob (repeatable)")
+    cmd.add_argument("--exclude", action="append", metavar="GLOB",
+                     help="Skip files or folders matching this glob (repeatable)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cbz-renamer",
+                                     description="Scan and rename CBZ files without the GUI.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    scan = sub.add_parser("scan", help="Scan folders and write a rename plan")
+    scan.add_argument("directories", nargs="+", metavar="DIR")
+    scan.add_argument("-o", "--output", help="Plan file to write (default: stdout)")
+    scan.add_argument("--format", choices=["json", "csv"],
+                      help="Plan format (default: from --output extension, else json)")
+    _add_settings_arguments(scan)
+    scan.add_argument("--workers", type=int,
+                      help="Lookups in flight at once (default: 32 async, 4 with --no-async-lookups)")
+    scan.add_argument("--report", metavar="PATH",
+                      help="Write a JSON run report (stage timings, API calls, cache hits) to PATH")
+    scan.add_argument("--processes", type=int, default=1, metavar="N",
+                      help="Split the scan across N processes for very large libraries "
+                           "(0 = one per CPU core; default: 1). Sharded scans skip the scan manifest")
+    scan.set_defaults(func=cmd_scan)
+
+    apply = sub.add_parser("apply", help="Apply a rename plan written by `scan`")
+    apply.add_argument("plan")
+    apply.add_argument("--status", help="Only apply entries with these statuses (comma-separated)")
+    apply.add_argument("--dry-run", action="store_true", help="Print the renames without performing them")
+    apply.add_argument("--embed", action=argparse.BooleanOptionalAction, default=None,
+                       help="Write each file's metadata into its ComicInfo.xml after renaming")
+    apply.add_argument("--workers", type=int, default=DEFAULT_RENAME_WORKERS,
+                       help=f"Renames run in parallel (default: {DEFAULT_RENAME_WORKERS})")
+    apply.set_defaults(func=cmd_apply)
+
+    watch = sub.add_parser("watch", help="Watch folders and rename new files as they arrive")
+    watch.add_argument("directories", nargs="+", metavar="DIR")
+    _add_settings_arguments(watch)
+    watch.add_argument("--status", help="Statuses renamed without review (comma-separated, "
+                                        f"default: {','.join(AUTO_APPLY_STATUSES)})")
+    watch.add_argument("--embed", action=argparse.BooleanOptionalAction, default=None,
+                       help="Write each renamed file's metadata into its ComicInfo.xml")
+    watch.add_argument("--initial-scan", action="store_true", help="Process the files already there first")
+    watch.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS,
+                       help=f"Seconds a new file must be quiet before it is scanned (default: {DEBOUNCE_SECONDS:g})")
+    watch.add_argument("--poll", action="store_true", help="Poll the folders instead of using inotify")
+    watch.add_argument("--poll-interval", type=float, default=POLL_SECONDS,
+                       help=f"Seconds between folder polls (default: {POLL_SECONDS:g})")
+    watch.add_argument("--workers", type=int,
+                       help="Lookups in flight at once (default: 32 async, 4 with --no-async-lookups)")
+    watch.set_defaults(func=cmd_watch)
+
+    for name, func, text in (("undo", cmd_undo, "Revert the renames recorded in a journal"),
+                             ("resume", cmd_resume, "Finish an interrupted apply from its journal")):
+        cmd = sub.add_parser(name, help=text)
+        cmd.add_argument("journal", nargs="?", help="Journal file (default: the most recent one)")
+        cmd.add_argument("--workers", type=int, default=DEFAULT_RENAME_WORKERS)
+        cmd.set_defaults(func=func)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+"""Read and write ComicInfo.xml metadata straight in a CBZ.
+
+Only the ZIP's end-of-central-directory record, the central directory and
+the ComicInfo.xml member itself are read, with a handful of seeks, so the
+cost stays in the kilobytes even for a 500 MB archive on a network share.
+Writing appends a new member and rewrites the central directory in place;
+page entries are never decompressed or copied. ZIP64 archives are supported.
+"""
+import os
+import struct
+import time
+import zlib
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+from filename_parser import sanitize_filename
+from title_format import extract_series_from_title, same_series
+
+COMICINFO_NAME = "comicinfo.xml"
+
+_EOCD_SIG = b"PK\x05\x06"
+_EOCD64_LOCATOR_SIG = b"PK\x06\x07"
+_EOCD64_SIG = b"PK\x06\x06"
+_CENTRAL_SIG = b"PK\x01\x02"
+_LOCAL_SIG = b"PK\x03\x04"
+
+# Central directory file header fields we need: flags, method, sizes, name/extra/comment lengths, offset
+_CENTRAL_FORMAT = "<8xHH8xIIHHH8xI"
+
+_EOCD_SIZE = 22
+_EOCD_SEARCH = _EOCD_SIZE + 0xFFFF           # the record is followed by at most a 64 KiB comment
+_MAX_CENTRAL_DIR = 32 * 1024 * 1024
+_MAX_COMICINFO = 1024 * 1024
+
+_STORED, _DEFLATED = 0, 8
+
+
+# ─── ZIP Structures ───────────────────────────────────────────────────────────
+
+def _read_at(f, offset, size):
+    f.seek(offset)
+    return f.read(size)
+
+
+def _central_directory(f, file_size):
+    """Locate the central directory.
+
+    Returns (offset, size, comment) or None if this is not a ZIP.
+    """
+    tail_size = min(file_size, _EOCD_SEARCH)
+    tail_start = file_size - tail_size
+    tail = _read_at(f, tail_start, tail_size)
+    pos = tail.rfind(_EOCD_SIG)
+    if pos < 0 or pos + _EOCD_SIZE > len(tail):
+        return None
+    cd_size, cd_offset, comment_len = struct.unpack_from("<IIH", tail, pos + 12)
+    comment = tail[pos + _EOCD_SIZE:pos + _EOCD_SIZE + comment_len]
+
+    if cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+        # ZIP64: the locator sits immediately before the classic record
+        loc = pos - 20
+        if loc >= 0 and tail[loc:loc + 4] == _EOCD64_LOCATOR_SIG:
+            (eocd64_offset,) = struct.unpack_from("<Q", tail, loc + 8)
+            record = _read_at(f, eocd64_offset, 56)
+            if len(record) == 56 and record[:4] == _EOCD64_SIG:
+                cd_size, cd_offset = struct.unpack_from("<QQ", record, 40)
+    if cd_offset + cd_size > file_size:
+        return None
+    return cd_offset, cd_size, comment
+
+
+def _zip64_extra(extra, usize, csize, offset):
+    """Apply the ZIP64 extended-information extra field to maxed-out 32-bit values."""
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack_from("<HH", extra, pos)
+        body = extra[pos + 4:pos + 4 + length]
+        if tag == 0x0001:
+            values = iter(struct.unpack_from(f"<{len(body) // 8}Q", body))
+            # Only the fields that overflowed are present, in this order
+            if usize == 0xFFFFFFFF:
+                usize = next(values, usize)
+            if csize == 0xFFFFFFFF:
+                csize = next(values, csize)
+            if offset == 0xFFFFFFFF:
+                offset = next(values, offset)
+            break
+        pos += 4 + length
+    return usize, csize, offset
+
+
+def _central_entries(directory):
+    """Yield (start, end, name, flags, method, csize, usize, offset) for each central directory record."""
+    pos = 0
+    while pos + 46 <= len(directory) and directory[pos:pos + 4] == _CENTRAL_SIG:
+        (flags, method, csize, usize, name_len, extra_len, comment_len,
+         offset) = struct.unpack_from(_CENTRAL_FORMAT, directory, pos)
+        raw_name = directory[pos + 46:pos + 46 + name_len]
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437", "replace")
+        extra = directory[pos + 46 + name_len:pos + 46 + name_len + extra_len]
+        usize, csize, offset = _zip64_extra(extra, usize, csize, offset)
+        end = pos + 46 + name_len + extra_len + comment_len
+        yield pos, end, name, flags, method, csize, usize, offset
+        pos = end
+
+
+def _is_comicinfo(name, root_only=False):
+    if root_only and "/" in name:
+        return False
+    return name.rsplit("/", 1)[-1].casefold() == COMICINFO_NAME
+
+
+def _find_member(directory):
+    """Find ComicInfo.xml in central directory bytes (case-insensitive, root folder preferred).
+
+    Returns (method, flags, csize, usize, local_header_offset) or None.
+    """
+    found = None
+    for _, _, name, flags, method, csize, usize, offset in _central_entries(directory):
+        if _is_comicinfo(name):
+            candidate = (method, flags, csize, usize, offset)
+            if "/" not in name:
+                return candidate
+            found = found or candidate
+    return found
+
+
+def read_comicinfo_bytes(path):
+    """Return the uncompressed ComicInfo.xml of the ZIP at `path`, or None."""
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        located = _central_directory(f, file_size)
+        if located is None or located[1] > _MAX_CENTRAL_DIR:
+            return None
+        member = _find_member(_read_at(f, located[0], located[1]))
+        if member is None:
+            return None
+        return _read_member(f, member)
+
+
+def _read_member(f, member):
+    method, flags, csize, usize, offset = member
+    if flags & 0x1 or usize > _MAX_COMICINFO or csize > _MAX_COMICINFO:
+        return None  # encrypted or implausibly large
+    header = _read_at(f, offset, 30)
+    if len(header) < 30 or header[:4] != _LOCAL_SIG:
+        return None
+    name_len, extra_len = struct.unpack_from("<HH", header, 26)
+    data = _read_at(f, offset + 30 + name_len + extra_len, csize)
+    if method == _STORED:
+        return data
+    if method == _DEFLATED:
+        return zlib.decompressobj(-zlib.MAX_WBITS).decompress(data, _MAX_COMICINFO)
+    return None
+
+
+# ─── ComicInfo ────────────────────────────────────────────────────────────────
+
+def read_comicinfo(path):
+    """Return ComicInfo.xml fields of the CBZ at `path` as a dict of stripped strings.
+
+    Returns None if the archive has no (readable) ComicInfo.xml. Empty fields are omitted.
+    """
+    try:
+        data = read_comicinfo_bytes(path)
+        if not data:
+            return None
+        root = ET.fromstring(data)
+    except (OSError, ValueError, zlib.error, struct.error, ET.ParseError):
+        return None
+    info = {}
+    for child in root:
+        tag = child.tag.rsplit("}", 1)[-1]  # drop any namespace
+        text = (child.text or "").strip()
+        if text and len(child) == 0:
+            info[tag] = text
+    return info
+
+
+def comicinfo_result(info, filename=None):
+    """Turn ComicInfo fields into a fetcher-style (series, raw_title, subtitle, sep) result, or None.
+
+    The Title is used as the subtitle when it is more than the series name repeated.
+    ComicInfo has no raw title, so when `filename` is already a title of this series
+    (e.g. a name this app gave the file before embedding), its stem stands in for
+    one; use_source_format then builds the same name again instead of switching
+    to the standardized format.
+    """
+    if not info or not info.get("Series"):
+        return None
+    series = info["Series"]
+    title = info.get("Title")
+    subtitle = title if title and title.casefold() != series.casefold() else None
+    raw_title = None
+    if filename:
+        stem = os.path.splitext(filename)[0]
+        found = extract_series_from_title(stem, series)[0]
+        if found is not None and same_series(found, series):
+            raw_title = stem
+    return (series, raw_title, subtitle, None)
+
+
+def comicinfo_number(info):
+    """The volume/issue number recorded in ComicInfo (Number, else Volume), or None."""
+    if not info:
+        return None
+    for field in ("Number", "Volume"):
+        value = info.get(field)
+        if value and value.replace(".", "", 1).isdigit():
+            return value
+    return None
+
+
+# ─── Embedding ────────────────────────────────────────────────────────────────
+
+DEFAULT_EMBED_WORKERS = 4
+
+_MEMBER_NAME = b"ComicInfo.xml"
+# The first elements of the ComicInfo schema sequence; anything else comes after them
+_FIELD_ORDER = ("Title", "Series", "Number", "Count", "Volume")
+
+ET.register_namespace("xsi", "http://www.w3.org/2001/XMLSchema-instance")
+ET.register_namespace("xsd", "http://www.w3.org/2001/XMLSchema")
+
+
+def build_comicinfo_xml(fields, existing=None):
+    """Return ComicInfo.xml bytes with `fields` set, keeping everything else from `existing`.
+
+    Args:
+        fields: {element: text}; empty values are left out
+        existing: Current ComicInfo.xml bytes, if the archive has one
+
+    Returns None if `existing` already holds exactly these values.
+    """
+    root = None
+    if existing:
+        try:
+            root = ET.fromstring(existing)
+        except ET.ParseError:
+            root = None
+    if root is None:
+        root = ET.Element("ComicInfo")
+
+    changed = False
+    for tag, text in fields.items():
+        if not text:
+            continue
+        text = str(text)
+        element = root.find(tag)
+        if element is None:
+            element = ET.Element(tag)
+            rank = _FIELD_ORDER.index(tag) if tag in _FIELD_ORDER else len(_FIELD_ORDER)
+            position = next((i for i, child in enumerate(root)
+                             if child.tag not in _FIELD_ORDER[:rank + 1]), len(root))
+            root.insert(position, element)
+        if element.text != text:
+            element.text = text
+            changed = True
+    if not changed:
+        return None
+    ET.indent(root)
+    return ET.tostring(root, encoding="utf-8", xml_declaration=True)
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(timestamp)
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((max(t.tm_year, 1980) - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+def _end_records(count, cd_offset, cd_size, comment):
+    """End-of-central-directory record for the new directory, ZIP64 records included when needed."""
+    if count < 0xFFFF and cd_offset < 0xFFFFFFFF and cd_size < 0xFFFFFFFF:
+        return struct.pack("<4s4H2IH", _EOCD_SIG, 0, 0, count, count, cd_size, cd_offset,
+                           len(comment)) + comment
+    eocd64_offset = cd_offset + cd_size
+    return (struct.pack("<4sQ2H2I4Q", _EOCD64_SIG, 44, 45, 45, 0, 0, count, count, cd_size, cd_offset)
+            + struct.pack("<4sIQI", _EOCD64_LOCATOR_SIG, 0, eocd64_offset, 1)
+            + struct.pack("<4s4H2IH", _EOCD_SIG, 0, 0, 0xFFFF, 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF,
+                          len(comment)) + comment)
+
+
+def embed_comicinfo(path, fields):
+    """Write `fields` into the root ComicInfo.xml of the CBZ at `path`, in place.
+
+    The new ComicInfo.xml is written where the central directory was (or over
+    the old ComicInfo.xml when it is the last member), followed by a rewritten
+    central directory. Page entries are neither read nor moved, so the cost is
+    independent of the archive's size. Fields already present are merged into
+    the existing document; other elements (page lists, credits...) are kept.
+
+    Returns True if the archive changed, False if it already had these values.
+    Raises OSError, or ValueError for archives it will not touch.
+    """
+    with open(path, "r+b") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        located = _central_directory(f, file_size)
+        if located is None:
+            raise ValueError("Not a ZIP archive")
+        cd_offset, cd_size, comment = located
+        if cd_size > _MAX_CENTRAL_DIR:
+            raise ValueError("Central directory too large")
+        directory = _read_at(f, cd_offset, cd_size)
+        entries = list(_central_entries(directory))
+        if (entries[-1][1] if entries else 0) != cd_size:
+            raise ValueError("Unsupported ZIP layout")  # prepended data, split archive...
+
+        member = _find_member(directory)
+        existing = _read_member(f, member) if member else None
+        xml = build_comicinfo_xml(fields, existing)
+        if xml is None:
+            return False
+
+        # Drop the old root ComicInfo.xml; reuse its space when nothing follows it
+        kept, start = [], cd_offset
+        last_offset = max((e[7] for e in entries), default=-1)
+        for entry in entries:
+            if _is_comicinfo(entry[2], root_only=True):
+                if entry[7] == last_offset:
+                    start = entry[7]
+            else:
+                kept.append(directory[entry[0]:entry[1]])
+
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        data = compressor.compress(xml) + compressor.flush()
+        crc = zlib.crc32(xml)
+        dos_time, dos_date = _dos_datetime(time.time())
+        local = struct.pack("<4s5H3I2H", _LOCAL_SIG, 20, 0, _DEFLATED, dos_time, dos_date,
+                            crc, len(data), len(xml), len(_MEMBER_NAME), 0) + _MEMBER_NAME
+        if start < 0xFFFFFFFF:
+            version, offset_field, extra = 20, start, b""
+        else:
+            version, offset_field, extra = 45, 0xFFFFFFFF, struct.pack("<2HQ", 0x0001, 8, start)
+        kept.append(struct.pack("<4s6H3I5H2I", _CENTRAL_SIG, version, version, 0, _DEFLATED,
+                                dos_time, dos_date, crc, len(data), len(xml), len(_MEMBER_NAME),
+                                len(extra), 0, 0, 0, 0, offset_field) + _MEMBER_NAME + extra)
+        new_directory = b"".join(kept)
+        new_cd_offset = start + len(local) + len(data)
+        tail = local + data + new_directory + _end_records(len(kept), new_cd_offset,
+                                                           len(new_directory), comment)
+
+        # Everything from `start` on is small (one member plus the directory); keep it to roll back
+        original_tail = _read_at(f, start, file_size - start)
+        try:
+            f.seek(start)
+            f.write(tail)
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        except OSError:
+            f.seek(start)
+            f.write(original_tail)
+            f.truncate(file_size)
+            raise
+    return True
+
+
+def embed_entries(entries, skip=(), workers=DEFAULT_EMBED_WORKERS):
+    """Embed each renamed entry's metadata into the file at its final name, on a thread pool.
+
+    Args:
+        entries: Dicts with directory, original, final and metadata (see
+                 scan_engine.build_entry); entries without metadata, and files
+                 that keep their name, are left untouched
+        skip: Original paths (directory joined with original) to leave alone, e.g. the
+              ones whose rename failed (the paths in apply_renames' errors)
+        workers: Archives written concurrently
+
+    Returns (written, errors): final names that changed, and (final, message) pairs.
+    """
+    jobs = [(os.path.join(e["directory"], sanitize_filename(e["final"])), e["metadata"])
+            for e in entries
+            if e.get("metadata") and e["original"] != sanitize_filename(e["final"]) and os.path.join(e["directory"], e["original"]) not in skip]
+
+    def _embed(job):
+        path, fields = job
+        try:
+            return os.path.basename(path), embed_comicinfo(path, fields), None
+        except (OSError, ValueError, zlib.error, struct.error) as e:
+            return os.path.basename(path), False, str(e)
+
+    written, errors = [], []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+        for name, changed, error in pool.map(_embed, jobs):
+            if error:
+                errors.append((name, f"ComicInfo.xml: {error}"))
+            elif changed:
+                written.append(name)
+    return written, errors
@@ -22,11 +22,26 @@ BORDER_COLOR = "#2a2a2a"
 EDIT_BG = "#0c2d48"
 
 # --- Config path (%LOCALAPPDATA%\CBZ Renamer\) ---
+# Created on first write (ensure_app_data_dir), not at import, so starting up costs no filesystem writes
 APP_DATA_DIR = os.path.join(os.environ.get("LOCALAPPDATA", os.path.expanduser("~")), "CBZ Renamer")
-os.makedirs(APP_DATA_DIR, exist_ok=True)
 
 CONFIG_PATH = os.path.join(APP_DATA_DIR, "settings.json")
-CACHE_PATH = os.path.join(APP_DATA_DIR, "cache.json")
+CACHE_PATH = os.path.join(APP_DATA_DIR, "cache.db")
+LEGACY_CACHE_PATH = os.path.join(APP_DATA_DIR, "cache.json")  # imported into cache.db on first run
+JOURNAL_DIR = os.path.join(APP_DATA_DIR, "journal")  # rename journals, used for undo/resume
+MANIFEST_PATH = os.path.join(APP_DATA_DIR, "manifest.db")  # per-file results for incremental rescans
+SCAN_REPORT_PATH = os.path.join(APP_DATA_DIR, "last_scan.json")  # timings and API counters of the last GUI scan
+MIGRATED_MARKER = os.path.join(APP_DATA_DIR, "legacy_migrated")  # written once the files next to the exe were checked
+
+_app_data_ready = False
+
+
+def ensure_app_data_dir():
+    """Create APP_DATA_DIR if needed. Call before writing anything under it; cheap after the first call."""
+    global _app_data_ready
+    if not _app_data_ready:
+        os.makedirs(APP_DATA_DIR, exist_ok=True)
+        _app_data_ready = True
 
 # Simple obfuscation key (avoids plain text in file)
 _KEY = b'CBZ_RENAMER_SECURE'
@@ -63,13 +78,26 @@ def load_config():
         "scan_mode": "both",
         "num_padding": 2,
         "include_subtitle": False,
+        "google_books_harvest": True,
         "sub_separator": "hyphen",
         "online_source": "google_books",
         "comicvine_api_key": "",
         "google_books_api_key": "",
         "use_source_format": True,
         "comicvine_vol_prefix": "#",
-        "chapter_prefix": "Ch."
+        "comicvine_bulk": True,
+        "chapter_prefix": "Ch.",
+        "recursive_scan": False,
+        "max_depth": 0,
+        "incremental_scan": True,
+        "read_comicinfo": True,
+        "fuzzy_match": True,
+        "async_lookups": True,
+        "embed_comicinfo": False,
+        "google_books_api_url": "",   # empty = public API (see api_sources.set_api_urls)
+        "comicvine_api_url": "",
+        "include_patterns": "",
+        "exclude_patterns": ""
     }
     try:
         if os.path.exists(CONFIG_PATH):
@@ -83,52 +111,64 @@ def load_config():
 
             defaults.update(saved)
 
-        # --- Legacy migration: read old files next to exe if they exist ---
-        if getattr(sys, 'frozen', False):
-            exe_dir = os.path.dirname(sys.executable)
-        else:
-            exe_dir = os.path.dirname(os.path.abspath(__file__))
+        # --- Legacy migration: only until it has run once on this machine ---
+        if not os.path.exists(MIGRATED_MARKER):
+            _migrate_legacy_files(defaults)
 
-        old_config = os.path.join(exe_dir, "cbz_renamer_config.json")
-        old_secrets = os.path.join(exe_dir, "cbz_renamer.secrets")
-        old_cache = os.path.join(exe_dir, "cbz_renamer_cache.json")
+    except Exception:
+        pass
+    return defaults
 
-        migrated = False
-        if os.path.exists(old_config):
-            with open(old_config, "r") as f:
-                old = json.load(f)
-            for key in ["comicvine_api_key", "google_books_api_key"]:
-                if key in old:
-                    old[key] = _decrypt(old[key])
-            defaults.update(old)
-            os.remove(old_config)
-            migrated = True
-
-        if os.path.exists(old_secrets):
-            with open(old_secrets, "r") as f:
-                old_sec = json.load(f)
-            for key in ["comicvine_api_key", "google_books_api_key"]:
-                if key in old_sec:
-                    old_sec[key] = _decrypt(old_sec[key])
-            defaults.update(old_sec)
-            os.remove(old_secrets)
-            migrated = True
 
-        if os.path.exists(old_cache):
-            # Move cache file to new location
-            import shutil
-            shutil.move(old_cache, CACHE_PATH)
+def _migrate_legacy_files(cfg):
+    """Fold the config, secrets and cache files old versions kept next to the exe into `cfg`
+    and APP_DATA_DIR, then write MIGRATED_MARKER so later starts skip the checks.
+    """
+    if getattr(sys, 'frozen', False):
+        exe_dir = os.path.dirname(sys.executable)
+    else:
+        exe_dir = os.path.dirname(os.path.abspath(__file__))
+
+    old_config = os.path.join(exe_dir, "cbz_renamer_config.json")
+    old_secrets = os.path.join(exe_dir, "cbz_renamer.secrets")
+    old_cache = os.path.join(exe_dir, "cbz_renamer_cache.json")
+
+    ensure_app_data_dir()
+    migrated = False
+    if os.path.exists(old_config):
+        with open(old_config, "r") as f:
+            old = json.load(f)
+        for key in ["comicvine_api_key", "google_books_api_key"]:
+            if key in old:
+                old[key] = _decrypt(old[key])
+        cfg.update(old)
+        os.remove(old_config)
+        migrated = True
+
+    if os.path.exists(old_secrets):
+        with open(old_secrets, "r") as f:
+            old_sec = json.load(f)
+        for key in ["comicvine_api_key", "google_books_api_key"]:
+            if key in old_sec:
+                old_sec[key] = _decrypt(old_sec[key])
+        cfg.update(old_sec)
+        os.remove(old_secrets)
+        migrated = True
 
-        if migrated:
-            save_config(defaults)
+    if os.path.exists(old_cache):
+        # Move cache file to new location (imported into the SQLite cache on next load)
+        import shutil
+        shutil.move(old_cache, LEGACY_CACHE_PATH)
 
-    except Exception:
-        pass
-    return defaults
+    if migrated:
+        save_config(cfg)
+    with open(MIGRATED_MARKER, "w") as f:
+        f.write("1\n")
 
 
 def save_config(cfg):
     try:
+        ensure_app_data_dir()
         save_data = dict(cfg)
 
         # Encrypt API keys before saving
@@ -0,0 +1,126 @@
+"""Incremental conflict tracking for pending renames.
+
+Keeps a reverse index from rename target to the rows that want it, so an
+edit only re-examines the handful of rows that share its old or new target
+instead of the whole table. Targets are compared the way NTFS does: after
+sanitizing, and case-insensitively.
+"""
+import os
+
+from filename_parser import sanitize_filename
+
+DUPLICATE = "duplicate"   # two or more pending renames produce the same name
+EXISTS = "exists"         # the target is already taken by a file that is staying put
+
+
+def target_key(directory, name):
+    """Comparison key for the file `name` will be renamed to inside `directory`."""
+    return (directory, sanitize_filename(name).casefold())
+
+
+class DuplicateIndex:
+    """Tracks which rows collide with each other or with files already on disk.
+
+    Args:
+        check_disk: Also flag targets that an existing, unrenamed file already occupies
+    """
+
+    def __init__(self, check_disk=True):
+        self.check_disk = check_disk
+        self._items = {}     # item -> (target key or None, original key)
+        self._targets = {}   # target key -> set of items renaming to it
+        self._leaving = {}   # original key -> number of items renaming that file away
+        self._state = {}     # item -> DUPLICATE / EXISTS
+        self._listings = {}  # directory -> casefolded names on disk
+
+    def clear(self):
+        """Forget every row and the cached directory listings."""
+        self._items.clear()
+        self._targets.clear()
+        self._leaving.clear()
+        self._state.clear()
+        self._listings.clear()
+
+    def conflict(self, item):
+        """DUPLICATE, EXISTS or None for `item`."""
+        return self._state.get(item)
+
+    def conflicts(self):
+        """Return {item: state} for every conflicting row."""
+        return dict(self._state)
+
+    def set(self, item, directory, original, final):
+        """Add or update a row. Returns the set of items whose conflict state changed."""
+        affected = self._detach(item)
+        origin = target_key(directory, original)
+        target = target_key(directory, final) if original != final else None
+        self._items[item] = (target, origin)
+        if target is not None:
+            self._targets.setdefault(target, set()).add(item)
+            self._leaving[origin] = self._leaving.get(origin, 0) + 1
+            affected |= self._targets[target]
+        # Rows aiming at this file's name may now be blocked or freed by it
+        affected |= self._targets.get(origin, set())
+        affected.add(item)
+        return self._recheck(affected)
+
+    def remove(self, item):
+        """Drop a row. Returns the set of items whose conflict state changed."""
+        affected = self._detach(item)
+        changed = self._recheck(affected)
+        if self._state.pop(item, None) is not None:
+            changed.add(item)
+        return changed
+
+    def _detach(self, item):
+        """Unlink `item` from the index and return the rows that shared its target or original."""
+        old = self._items.pop(item, None)
+        if old is None:
+            return set()
+        target, origin = old
+        if target is not None:
+            items = self._targets[target]
+            items.discard(item)
+            if not items:
+                del self._targets[target]
+            self._leaving[origin] -= 1
+            if not self._leaving[origin]:
+                del self._leaving[origin]
+        return set(self._targets.get(target, ())) | set(self._targets.get(origin, ()))
+
+    def _recheck(self, items):
+        changed = set()
+        for item in items:
+            if item not in self._items:
+                continue
+            state = self._compute(item)
+            if state != self._state.get(item):
+                if state is None:
+                    del self._state[item]
+                else:
+                    self._state[item] = state
+                changed.add(item)
+        return changed
+
+    def _compute(self, item):
+        target, origin = self._items[item]
+        if target is None:
+            return None
+        if len(self._targets[target]) > 1:
+            return DUPLICATE
+        # A case-only rename of the file itself, or a file that is being renamed away, is fine
+        if self.check_disk and target != origin and target not in self._leaving \
+                and target[1] in self._listing(target[0]):
+            return EXISTS
+        return None
+
+    def _listing(self, directory):
+        names = self._listings.get(directory)
+        if names is None:
+            try:
+                with os.scandir(directory) as it:
+                    names = {entry.name.casefold() for entry in it}
+            except OSError:
+                names = set()
+            self._listings[directory] = names
+        return names
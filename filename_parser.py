@@ -1,12 +1,46 @@
 import re
 
+# ─── Patterns ─────────────────────────────────────────────────────────────────
+# Compiled once at import; parse_filename runs for every file in every scan.
+
+_CBZ_EXT_RE = re.compile(r'\.cbz$', re.IGNORECASE)
+_BRACKETED_RE = re.compile(r'[\(\[][^\]\)]*[\)\]]')
+# One pattern for both markers: group 1 is set when the marker is a volume
+_MARKER_RE = re.compile(r'(?:(v|vol\.?|volume)|c|ch\.?|chapter|#)\s*(\d+)', re.IGNORECASE)
+_VOLUME_RE = re.compile(r'(?:v|vol\.?|volume)\s*(\d+)', re.IGNORECASE)
+_CHAPTER_RE = re.compile(r'(?:c|ch\.?|chapter|#)\s*(\d+)', re.IGNORECASE)
+_DIGITS_RE = re.compile(r'\d+')
+_EDGE_SEPARATORS_RE = re.compile(r'^[\s_-]+|[\s_-]+$')
+# A lone underscore, or any run of 2+ spaces/underscores, becomes a single space
+_SEPARATOR_RUN_RE = re.compile(r'[\s_]{2,}|_')
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]')
+_MARKER_WORD_RE = re.compile(r'(volume|vol|chapter)')
+_ILLEGAL_CHARS = str.maketrans('', '', '*?"<>|')
+
+
+def _strip_cbz(name):
+    """Drop a trailing .cbz (any case), exactly as re.sub(r'\\.cbz$', '', name, flags=re.I) would."""
+    if name[-4:].lower() == '.cbz':
+        return name[:-4]
+    if name.endswith('\n'):
+        # `$` also matches before a final newline; leave that corner to the regex
+        return _CBZ_EXT_RE.sub('', name)
+    return name
+
+
+def _strip_brackets(text):
+    if '(' in text or '[' in text:
+        return _BRACKETED_RE.sub('', text)
+    return text
+
 
 def normalize(s):
     """Normalize a filename for comparison (lowercase, strip extension, non-alphanumeric, vol/chapter)."""
-    s = s.lower()
-    s = re.sub(r'\.cbz$', '', s)
-    s = re.sub(r'[^a-z0-9]', '', s)
-    s = re.sub(r'(volume|vol|chapter)', '', s)
+    s = _strip_cbz(s.lower())
+    s = _NON_ALNUM_RE.sub('', s)
+    if 'vol' in s or 'chapter' in s:
+        s = _MARKER_WORD_RE.sub('', s)
     return s
 
 
@@ -15,38 +49,52 @@ def sanitize_filename(name):
     # Replace colon with ' -' for readability (e.g. "Title: Subtitle" -> "Title - Subtitle")
     name = name.replace(': ', ' - ').replace(':', '-')
     # Strip remaining illegal chars: * ? " < > |
-    name = re.sub(r'[*?"<>|]', '', name)
-    return name
+    return name.translate(_ILLEGAL_CHARS)
 
 
 def parse_filename(filename):
     """Parse a CBZ filename into (series_guess, volume_number_str, type_str).
 
+    A volume marker anywhere in the name wins over a chapter marker; with
+    neither, the first number is taken as the chapter. Bracketed tags such as
+    "(2003)" or "[Digital]" are ignored.
+
     Returns:
         series: The guessed series name (e.g. "Berserk")
         num_str: The volume/chapter number as a string (e.g. "1")
         type_str: Either "Volume" or "Chapter"
     """
-    base = re.sub(r'\.cbz$', '', filename, flags=re.IGNORECASE)
-    cleaned = re.sub(r'[\(\[][^\]\)]*[\)\]]', '', base).strip()
+    base = _strip_cbz(filename)
+    has_brackets = '(' in base or '[' in base
+    cleaned = (_BRACKETED_RE.sub('', base) if has_brackets else base).strip()
 
-    vol_match = re.search(r'(?:v|vol\.?|volume)\s*(\d+)', cleaned, re.IGNORECASE)
-    chap_match = re.search(r'(?:c|ch\.?|chapter|#)\s*(\d+)', cleaned, re.IGNORECASE)
-
-    if vol_match:
-        num_str = vol_match.group(1)
+    match = _MARKER_RE.search(cleaned)
+    if match is not None and match.group(1) is None:
+        # Chapter marker came first, but a later volume marker still takes precedence
+        vol_match = _VOLUME_RE.search(cleaned, match.end())
+        if vol_match is not None:
+            match = vol_match
+            orig_re = _VOLUME_RE
+            type_str = "Volume"
+        else:
+            orig_re = _CHAPTER_RE
+            type_str = "Chapter"
+    elif match is not None:
+        orig_re = _VOLUME_RE
         type_str = "Volume"
-        orig_match = re.search(r'(?:v|vol\.?|volume)\s*\d+', base, re.IGNORECASE)
-        series = base[:orig_match.start()] if orig_match else cleaned[:vol_match.start()]
-    elif chap_match:
-        num_str = chap_match.group(1)
-        type_str = "Chapter"
-        orig_match = re.search(r'(?:c|ch\.?|chapter|#)\s*\d+', base, re.IGNORECASE)
-        series = base[:orig_match.start()] if orig_match else cleaned[:chap_match.start()]
+
+    if match is not None:
+        num_str = match.group(match.lastindex)
+        series = cleaned[:match.start()]
+        if has_brackets:
+            # Cut the untouched name at the marker so bracketed text before it is handled below
+            orig_match = orig_re.search(base)
+            if orig_match is not None:
+                series = base[:orig_match.start()]
     else:
-        num_fallback = re.search(r'(\d+)', cleaned)
+        num_fallback = _DIGITS_RE.search(cleaned)
         if num_fallback:
-            num_str = num_fallback.group(1)
+            num_str = num_fallback.group()
             type_str = "Chapter"
             series = cleaned[:num_fallback.start()]
         else:
@@ -54,15 +102,13 @@ def parse_filename(filename):
             type_str = "Volume"
             series = cleaned
 
-    series = re.sub(r'[\(\[][^\]\)]*[\)\]]', '', series)
-    series = series.strip()
-    series = re.sub(r'[\s_-]+$', '', series)
-    series = re.sub(r'^[\s_-]+', '', series)
-    series = re.sub(r'[_]+', ' ', series)
-    series = re.sub(r'\s{2,}', ' ', series)
+    series = _strip_brackets(series).strip()
+    if series and (series[0] in '_-' or series[-1] in '_-'):
+        series = _EDGE_SEPARATORS_RE.sub('', series)
+    series = _SEPARATOR_RUN_RE.sub(' ', series)
     series = series.strip(' ,.-')
 
     if not series:
-        series = re.sub(r'\.cbz$', '', filename, flags=re.IGNORECASE)
+        series = base
 
     return series, num_str, type_str
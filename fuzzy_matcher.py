@@ -0,0 +1,113 @@
+"""Local fuzzy matching of series names against the names already known.
+
+Every series name the app has resolved before (and every filename guess that
+led to one) is indexed by its character trigrams and its words. A near-miss
+guess, such as a typo, a different romanization ("Shingeki no Kyoujin") or a
+reordered title, can then be mapped to the lookup term that is already known
+to resolve, and answered from the cache instead of the network.
+
+Scores are in 0..1: the best of the trigram Dice coefficient, the word
+overlap and (for the names sharing the most trigrams) the edit similarity
+of the normalized names. Names whose numbers differ ("Gantz 2" and "Gantz 3")
+never match.
+"""
+import re
+import threading
+import unicodedata
+from collections import Counter, namedtuple
+from difflib import SequenceMatcher
+
+MIN_SCORE = 0.8   # below this a match is not trusted to replace an online lookup
+_EDIT_CANDIDATES = 20   # names sharing the most trigrams that also get an edit-similarity score
+_EDIT_MIN_LENGTH = 6    # shorter names are one typo away from too many others ("Beach", "Bleach")
+
+SeriesMatch = namedtuple("SeriesMatch", "term name score")
+
+_ARTICLE_RE = re.compile(r"^(?:the|a|an)\s+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_series(name):
+    """Lowercase ASCII words of a series name, without accents or a leading article."""
+    text = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join(_WORD_RE.findall(_ARTICLE_RE.sub("", text.strip())))
+
+
+def _trigrams(text):
+    padded = f"  {text.replace(' ', '')} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SeriesIndex:
+    """Trigram and word index of known series names. Thread-safe.
+
+    Each indexed name points at a lookup term: the search term whose cached
+    result names that series.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = []      # (normalized, term, name, trigram count, words, numbers)
+        self._by_text = {}      # normalized -> entry id
+        self._postings = {}     # trigram -> [entry id]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, text, term, name=None):
+        """Index `text` as a way of writing the series that `term` resolves to (named `name`)."""
+        normalized = normalize_series(text)
+        if not normalized:
+            return
+        with self._lock:
+            if normalized in self._by_text:
+                return
+            grams = _trigrams(normalized)
+            words = set(normalized.split())
+            numbers = {w for w in words if w.isdigit()}
+            entry_id = len(self._entries)
+            self._entries.append((normalized, term, name or term, len(grams), words, numbers))
+            self._by_text[normalized] = entry_id
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(entry_id)
+
+    def match(self, query, min_score=MIN_SCORE, limit=5):
+        """Return up to `limit` SeriesMatch for `query`, best first, scoring at least `min_score`."""
+        normalized = normalize_series(query)
+        if not normalized:
+            return []
+        words = set(normalized.split())
+        numbers = {w for w in words if w.isdigit()}
+        grams = _trigrams(normalized)
+        with self._lock:
+            exact = self._by_text.get(normalized)
+            if exact is not None:
+                _, term, name = self._entries[exact][:3]
+                return [SeriesMatch(term, name, 1.0)]
+            shared = Counter()
+            for gram in grams:
+                for entry_id in self._postings.get(gram, ()):
+                    shared[entry_id] += 1
+            matches = []
+            compact = normalized.replace(" ", "")
+            for rank, (entry_id, common) in enumerate(shared.most_common()):
+                entry_text, term, name, count, entry_words, entry_numbers = self._entries[entry_id]
+                if entry_numbers != numbers:
+                    continue
+                dice = 2 * common / (len(grams) + count)
+                overlap = len(words & entry_words) / len(words | entry_words)
+                score = max(dice, overlap)
+                if score < min_score and rank < _EDIT_CANDIDATES and len(compact) >= _EDIT_MIN_LENGTH:
+                    # Catches typos and transpositions, which cost short names most of their trigrams
+                    edit = SequenceMatcher(None, compact, entry_text.replace(" ", ""))
+                    if edit.quick_ratio() >= min_score:
+                        score = max(score, edit.ratio())
+                if score >= min_score:
+                    matches.append(SeriesMatch(term, name, round(score, 3)))
+        matches.sort(key=lambda m: (-m.score, m.term))
+        return matches[:limit]
+
+    def best(self, query, min_score=MIN_SCORE):
+        """The best SeriesMatch for `query`, or None."""
+        matches = self.match(query, min_score, limit=1)
+        return matches[0] if matches else None
@@ -0,0 +1,155 @@
+"""Keep-alive HTTP client shared by the API fetchers.
+
+Connections are pooled per (scheme, host, port), so consecutive queries to
+the same provider reuse one TCP/TLS session instead of handshaking every
+time. Responses are requested with gzip and decompressed transparently.
+Works with plain http:// URLs too, which lets it run against a local stub server.
+"""
+import gzip
+import http.client
+import io
+import json
+import threading
+import urllib.error
+import urllib.parse
+import zlib
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_MAX_PER_HOST = 4
+
+# Errors that mean a pooled keep-alive connection was closed by the server while idle
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                 ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+
+
+class _HostPool:
+    def __init__(self, scheme, host, port, max_connections):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.idle = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_connections)
+
+    def new_connection(self, timeout):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=timeout)
+
+    def checkout(self, timeout):
+        """Return (connection, reused)."""
+        with self.lock:
+            if self.idle:
+                conn = self.idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        return self.new_connection(timeout), False
+
+    def checkin(self, conn):
+        with self.lock:
+            self.idle.append(conn)
+
+    def close(self):
+        with self.lock:
+            for conn in self.idle:
+                conn.close()
+            self.idle.clear()
+
+
+def decode_body(body, encoding):
+    encoding = (encoding or "").lower()
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)  # raw deflate
+    return body
+
+
+class HTTPClient:
+    """Pooled, keep-alive HTTP/1.1 GET client.
+
+    Args:
+        max_per_host: Maximum simultaneous connections to one host; extra callers wait
+        timeout: Default socket timeout in seconds
+    """
+
+    def __init__(self, max_per_host=DEFAULT_MAX_PER_HOST, timeout=DEFAULT_TIMEOUT):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, scheme, host, port):
+        key = (scheme, host, port)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = _HostPool(scheme, host, port, self.max_per_host)
+            return pool
+
+    def get(self, url, headers=None, timeout=None):
+        """GET `url` and return (status, headers, body bytes), with the body already decompressed.
+
+        Raises urllib.error.HTTPError for 4xx/5xx responses so callers can keep
+        handling errors the same way they did with urllib.request.urlopen.
+        """
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        req_headers = {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        if headers:
+            req_headers.update(headers)
+        if timeout is None:
+            timeout = self.timeout
+
+        pool = self._pool(scheme, parts.hostname, parts.port)
+        with pool.slots:
+            conn, reused = pool.checkout(timeout)
+            try:
+                try:
+                    conn.request("GET", path, headers=req_headers)
+                    response = conn.getresponse()
+                except _STALE_ERRORS:
+                    if not reused:
+                        raise
+                    # The idle connection went away; retry once on a fresh one
+                    conn.close()
+                    conn = pool.new_connection(timeout)
+                    conn.request("GET", path, headers=req_headers)
+                    response = conn.getresponse()
+                body = decode_body(response.read(), response.getheader("Content-Encoding"))
+            except BaseException:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                pool.checkin(conn)
+
+        if response.status >= 400:
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(body))
+        return response.status, response.headers, body
+
+    def get_json(self, url, headers=None, timeout=None):
+        """GET `url` and decode the JSON body."""
+        _, _, body = self.get(url, headers=headers, timeout=timeout)
+        return json.loads(body.decode())
+
+    def close(self):
+        """Close every idle pooled connection."""
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close()
+
+
+# Process-wide client shared by every fetcher
+HTTP = HTTPClient()
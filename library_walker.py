@@ -0,0 +1,138 @@
+"""Streaming directory walker for library scans.
+
+Files are yielded as each directory is read, so the lookup pipeline can start
+on the first series folder while the rest of the tree is still being listed.
+"""
+import os
+import fnmatch
+
+
+def split_patterns(text):
+    """Split a user-entered pattern list ("*.cbz; Extras/*") into a list of globs."""
+    if not text:
+        return []
+    if isinstance(text, (list, tuple)):
+        return [p for p in text if p]
+    return [p.strip() for p in text.replace(",", ";").split(";") if p.strip()]
+
+
+def _matches(patterns, name, rel_path):
+    """True if any glob matches the entry's name or its '/'-separated path relative to the root."""
+    for pattern in patterns:
+        if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern):
+            return True
+    return False
+
+
+def walk_cbz_files(root, recursive=False, include=None, exclude=None, max_depth=None, with_stat=False):
+    """Lazily yield (directory, filename) for every .cbz file under `root`.
+
+    Args:
+        root: Library folder to scan
+        recursive: Descend into subfolders
+        include: Glob patterns a file must match (name or relative path); empty = all
+        exclude: Glob patterns that skip a file or prune a whole subfolder
+        max_depth: Maximum folder depth below root (0 = root only, None = unlimited)
+        with_stat: Yield (directory, filename, stat_result) instead; the stat comes from
+            the directory listing where the OS provides it (no extra call on Windows)
+
+    Patterns are matched case-insensitively. Directories are read one at a time with
+    os.scandir and visited depth-first in name order; unreadable folders are skipped.
+    """
+    include = [p.lower() for p in split_patterns(include)]
+    exclude = [p.lower() for p in split_patterns(exclude)]
+    if not recursive:
+        max_depth = 0
+
+    stack = [(root, "", 0)]
+    while stack:
+        directory, rel_dir, depth = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            print(f"Cannot read folder '{directory}': {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            name_lower = entry.name.lower()
+            rel_path = f"{rel_dir}/{name_lower}" if rel_dir else name_lower
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+
+            if is_dir:
+                if max_depth is not None and depth >= max_depth:
+                    continue
+                if exclude and _matches(exclude, name_lower, rel_path):
+                    continue
+                subdirs.append((entry.path, rel_path, depth + 1))
+                continue
+
+            if not name_lower.endswith(".cbz"):
+                continue
+            if include and not _matches(include, name_lower, rel_path):
+                continue
+            if exclude and _matches(exclude, name_lower, rel_path):
+                continue
+            if with_stat:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield directory, entry.name, st
+            else:
+                yield directory, entry.name
+
+        # Reversed so the stack pops subfolders in name order
+        stack.extend(reversed(subdirs))
+
+
+def walk_folders(root, recursive=False, exclude=None, max_depth=None):
+    """Yield `root` and every subfolder walk_cbz_files() would descend into."""
+    exclude = [p.lower() for p in split_patterns(exclude)]
+    if not recursive:
+        max_depth = 0
+
+    stack = [(root, "", 0)]
+    while stack:
+        directory, rel_dir, depth = stack.pop()
+        yield directory
+        if max_depth is not None and depth >= max_depth:
+            continue
+        try:
+            with os.scandir(directory) as it:
+                subdirs = sorted((e for e in it if e.is_dir()), key=lambda e: e.name)
+        except OSError as e:
+            print(f"Cannot read folder '{directory}': {e}")
+            continue
+        for entry in reversed(subdirs):
+            name_lower = entry.name.lower()
+            rel_path = f"{rel_dir}/{name_lower}" if rel_dir else name_lower
+            if not (exclude and _matches(exclude, name_lower, rel_path)):
+                stack.append((entry.path, rel_path, depth + 1))
+
+
+def accepts_file(root, path, recursive=False, include=None, exclude=None, max_depth=None):
+    """True if walk_cbz_files(root, ...) with the same options would yield `path`.
+
+    Only the path is checked; the file does not have to exist.
+    """
+    rel_path = os.path.relpath(path, root).replace(os.sep, "/").lower()
+    parts = rel_path.split("/")
+    if parts[0] in (os.curdir, os.pardir) or not parts[-1].endswith(".cbz"):
+        return False
+    if not recursive:
+        max_depth = 0
+    if max_depth is not None and len(parts) - 1 > max_depth:
+        return False
+
+    include = [p.lower() for p in split_patterns(include)]
+    exclude = [p.lower() for p in split_patterns(exclude)]
+    if exclude:
+        for i in range(1, len(parts) + 1):
+            if _matches(exclude, parts[i - 1], "/".join(parts[:i])):
+                return False
+    return not include or _matches(include, parts[-1], rel_path)
@@ -0,0 +1,331 @@
+"""SQLite-backed store for API lookup results.
+
+Behaves like the dict the fetchers have always used (`key in cache`,
+`cache[key]`, `cache[key] = value`), but reads rows lazily on first access
+and writes each result as a single upsert, so neither startup nor the end of
+a scan touches the whole cache.
+
+Several processes (GUI, CLI batches, watch mode) can share one database: WAL
+lets readers run alongside the single writer, every write is its own short
+transaction, and `claim()` lets one process announce that it is fetching a key
+so the others wait for its result instead of paying for the same API call.
+"""
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+SCHEMA_VERSION = 3
+
+DAY = 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lookups (
+    key      TEXT PRIMARY KEY,
+    value    TEXT NOT NULL,
+    created  REAL NOT NULL,
+    ttl      REAL,
+    accessed REAL,
+    version  INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS claims (
+    key     TEXT PRIMARY KEY,
+    owner   TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+# Seconds a claim lasts unless released; a process that dies mid-lookup blocks its keys this long
+CLAIM_LEASE = 120
+
+# Succeeds if the key is unclaimed, its claim has lapsed, or we already hold it
+_CLAIM = (
+    "INSERT INTO claims (key, owner, expires) VALUES (?, ?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+    "WHERE claims.expires < ? OR claims.owner = excluded.owner"
+)
+
+_UPSERT = (
+    "INSERT INTO lookups (key, value, created, ttl, accessed, version) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, created = excluded.created, "
+    "ttl = excluded.ttl, accessed = excluded.accessed, version = excluded.version"
+)
+
+
+def is_negative(value):
+    """True for a cached miss, i.e. (None, None, None, None)."""
+    return not any(value)
+
+
+class CachePolicy:
+    """Expiry, size and versioning rules applied by SqliteCache.
+
+    Args:
+        positive_ttl: Seconds a successful lookup stays valid (None = forever)
+        negative_ttl: Seconds a miss stays valid before it is retried (None = forever)
+        max_memory_entries: Size of the in-memory LRU in front of the database
+        max_entries: Row cap for the database; least recently used rows are evicted
+        version: Matching-rules version; rows written under another version read as missing
+    """
+
+    def __init__(self, positive_ttl=180 * DAY, negative_ttl=3 * DAY,
+                 max_memory_entries=5000, max_entries=100_000, version=0):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_entries = max_entries
+        self.version = version
+
+    def ttl_for(self, value):
+        return self.negative_ttl if is_negative(value) else self.positive_ttl
+
+
+class SqliteCache:
+    """Dict-like lookup cache persisted in a WAL-mode SQLite database.
+
+    Values are tuples (stored as JSON arrays). Every entry records when it was
+    written, a time-to-live chosen by the CachePolicy (misses expire sooner
+    than hits) and the matching-rules version it was produced under; expired
+    or stale-version entries read as missing. Rows are only loaded when a key
+    is accessed and are kept in a bounded in-memory LRU.
+
+    Args:
+        path: Database file path
+        policy: CachePolicy (defaults apply if omitted)
+        readonly: Open an existing database that nobody writes to (see snapshot()).
+            Writes then only reach the in-memory LRU, and claims always succeed.
+    """
+
+    def __init__(self, path, policy=None, readonly=False):
+        self.path = path
+        self.policy = policy or CachePolicy()
+        self.readonly = readonly
+        self.owner = uuid.uuid4().hex  # identifies this instance's claims
+        self._mem = OrderedDict()  # key -> (value, expires_at or None), least recent first
+        self._lock = threading.RLock()
+        if readonly:
+            uri = pathlib.Path(path).resolve().as_uri() + "?mode=ro&immutable=1"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+            return
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(lookups)")}
+        if "accessed" not in columns:
+            self._conn.execute("ALTER TABLE lookups ADD COLUMN accessed REAL")
+        if "version" not in columns:
+            # Rows from before versioning were produced by the current rules
+            self._conn.execute("ALTER TABLE lookups ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE lookups SET version = ?", (self.policy.version,))
+        self._conn.execute("CREATE INDEX IF NOT EXISTS lookups_accessed ON lookups (accessed)")
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+
+    # ─── Dict Interface ──────────────────────────────────────────
+
+    def __contains__(self, key):
+        return self._load(key) is not None
+
+    def __getitem__(self, key):
+        hit = self._load(key)
+        if hit is None:
+            raise KeyError(key)
+        return hit[0]
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._mem.pop(key, None)
+            if not self.readonly:
+                self._conn.execute("DELETE FROM lookups WHERE key = ?", (key,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM lookups").fetchone()[0]
+
+    def get(self, key, default=None):
+        hit = self._load(key)
+        return default if hit is None else hit[0]
+
+    def keys(self):
+        """Return all stored keys (loads the key column only, not the values)."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT key FROM lookups")]
+
+    def items(self):
+        """Return (key, value) for every live entry, read straight from the database.
+
+        Unlike cache[key], this neither fills the in-memory LRU nor updates access times.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM lookups WHERE version = ? AND (ttl IS NULL OR created + ttl >= ?)",
+                (self.policy.version, time.time())).fetchall()
+        return [(key, tuple(json.loads(value))) for key, value in rows]
+
+    # ─── Storage ─────────────────────────────────────────────────
+
+    def _remember(self, key, hit):
+        mem = self._mem
+        mem[key] = hit
+        mem.move_to_end(key)
+        while len(mem) > self.policy.max_memory_entries:
+            mem.popitem(last=False)
+
+    def _row(self, key, value, ttl, now):
+        if ttl is None:
+            ttl = self.policy.ttl_for(value)
+        self._remember(key, (value, now + ttl if ttl is not None else None))
+        return (key, json.dumps(value, ensure_ascii=False), now, ttl, now, self.policy.version)
+
+    def put(self, key, value, ttl=None):
+        """Insert or replace one entry. `ttl` (seconds) overrides the policy TTL."""
+        value = tuple(value)
+        with self._lock:
+            row = self._row(key, value, ttl, time.time())
+            if not self.readonly:
+                self._conn.execute(_UPSERT, row)
+
+    def _load(self, key):
+        """Return (value, expires_at) for a live entry, or None."""
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None and hit[1] is not None and hit[1] < time.time():
+                # Expired here, but another process may have stored a fresh row since
+                del self._mem[key]
+                hit = None
+            if hit is not None:
+                self._mem.move_to_end(key)
+            else:
+                row = self._conn.execute(
+                    "SELECT value, created, ttl, version FROM lookups WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                value, created, ttl, version = row
+                if version != self.policy.version:
+                    return None
+                hit = (tuple(json.loads(value)), created + ttl if ttl is not None else None)
+                self._remember(key, hit)
+                if not self.readonly:
+                    # Record the access once per load so eviction can find cold rows
+                    self._conn.execute("UPDATE lookups SET accessed = ? WHERE key = ?", (time.time(), key))
+        if hit[1] is not None and hit[1] < time.time():
+            return None
+        return hit
+
+    def update(self, items, ttl=None):
+        """Bulk insert (key, value) pairs in a single transaction."""
+        now = time.time()
+        with self._lock:
+            if self.readonly:
+                for key, value in items:
+                    self._row(key, tuple(value), ttl, now)
+                return
+            self._conn.execute("BEGIN")
+            try:
+                for key, value in items:
+                    self._conn.execute(_UPSERT, self._row(key, tuple(value), ttl, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def purge_expired(self):
+        """Delete expired and stale-version rows (and lapsed claims). Returns the number of rows removed."""
+        with self._lock:
+            now = time.time()
+            self._conn.execute("DELETE FROM claims WHERE expires < ?", (now,))
+            cur = self._conn.execute(
+                "DELETE FROM lookups WHERE (ttl IS NOT NULL AND created + ttl < ?) OR version != ?",
+                (now, self.policy.version))
+            return cur.rowcount
+
+    # ─── Claims ──────────────────────────────────────────────────
+
+    def claim(self, key, lease=CLAIM_LEASE):
+        """Claim `key` for `lease` seconds before fetching it, so other processes wait for the result.
+
+        Returns True if this instance now holds the claim, False while another one does.
+        """
+        if self.readonly:
+            return True
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(_CLAIM, (key, self.owner, now + lease, now))
+            return cur.rowcount == 1
+
+    def release(self, key):
+        """Drop our claim on `key`, if we hold one."""
+        if self.readonly:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM claims WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def evict(self):
+        """Purge dead rows, then drop least recently used rows above policy.max_entries.
+
+        Evicts down to 90% of the cap so the next few scans don't each pay for a delete.
+        Returns the number of rows removed.
+        """
+        with self._lock:
+            removed = self.purge_expired()
+            count = self._conn.execute("SELECT COUNT(*) FROM lookups").fetchone()[0]
+            cap = self.policy.max_entries
+            if cap is not None and count > cap:
+                excess = count - int(cap * 0.9)
+                cur = self._conn.execute(
+                    "DELETE FROM lookups WHERE key IN ("
+                    "SELECT key FROM lookups ORDER BY COALESCE(accessed, created) LIMIT ?)", (excess,))
+                removed += cur.rowcount
+                self._mem.clear()
+            return removed
+
+    def flush(self):
+        """Apply the eviction policy and checkpoint the WAL. Writes are already durable."""
+        with self._lock:
+            if self.readonly:
+                return
+            self.evict()
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def snapshot(self, path):
+        """Copy the database to `path` as a consistent, standalone file for SqliteCache(path, readonly=True)."""
+        with self._lock:
+            dest = sqlite3.connect(path)
+            try:
+                self._conn.backup(dest)
+                dest.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                dest.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def import_json_cache(cache, json_path):
+    """One-time import of a legacy cache.json into `cache`, then rename the JSON file aside.
+
+    Returns the number of entries imported.
+    """
+    if not os.path.exists(json_path):
+        return 0
+    with open(json_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    cache.update(raw.items())
+    os.replace(json_path, json_path + ".migrated")
+    return len(raw)
@@ -0,0 +1,221 @@
+"""Provider-aware request scheduling for the API fetchers.
+
+Every (provider, api_key, resource) gets its own queue guarded by one or more
+token buckets, plus any buckets its provider shares across resources. Any number of worker threads can call `acquire()`, and event-loop
+tasks queue alongside them with `enqueue()` / `poll()`; waiters are served in
+priority order, then first come, first served. A 429/420 response
+pauses the queue via `retry_after()` so that no other worker hits the provider
+during the cooldown.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0   # a single file the user is waiting on
+PRIORITY_SCAN = 10         # regular per-file lookups
+PRIORITY_PREFETCH = 20     # bulk/background harvesting
+
+# How often an event-loop waiter that is not at the head of its queue checks again
+POLL_INTERVAL = 0.01
+
+# provider -> list of (tokens per second, bucket capacity); a request needs a token from each.
+PROVIDER_LIMITS = {
+    # Google Books meters per day; keep requests ~0.5s apart so bursts don't trigger 429s
+    "google_books": [(2.0, 1)],
+    # ComicVine: ~200 requests per resource per hour
+    "comicvine": [(200 / 3600, 200)],
+}
+DEFAULT_LIMITS = [(1.0, 1)]
+
+# provider -> buckets shared by every resource queue of one API key, on top of PROVIDER_LIMITS
+SHARED_LIMITS = {
+    # ComicVine's velocity detection counts all of a key's requests, whatever the resource
+    "comicvine": [(1.0, 1)],
+}
+
+
+class TokenBucket:
+    """A classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_token(self):
+        """Seconds until one whole token is available (call refill first)."""
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _ProviderQueue:
+    def __init__(self, limits, shared=(), cond=None):
+        # Queues that share buckets also share `cond`, so taking a shared token is atomic
+        self.buckets = [TokenBucket(rate, capacity) for rate, capacity in limits] + list(shared)
+        self.blocked_until = 0.0
+        self.waiters = []  # heap of (priority, seq)
+        self.cond = cond or threading.Condition()
+        self.granted = 0
+        self.total_wait = 0.0
+
+    def delay(self, now):
+        """Seconds until the head waiter may go."""
+        wait = self.blocked_until - now
+        for bucket in self.buckets:
+            bucket.refill(now)
+            wait = max(wait, bucket.time_until_token())
+        return max(wait, 0.0)
+
+    def remove(self, ticket):
+        self.waiters.remove(ticket)
+        heapq.heapify(self.waiters)
+        self.cond.notify_all()
+
+
+class RequestScheduler:
+    """Shared rate limiter for all API providers.
+
+    Args:
+        limits: Optional dict overriding PROVIDER_LIMITS
+        shared_limits: Optional dict overriding SHARED_LIMITS
+    """
+
+    def __init__(self, limits=None, shared_limits=None):
+        self.limits = dict(PROVIDER_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self.shared_limits = dict(SHARED_LIMITS)
+        if shared_limits:
+            self.shared_limits.update(shared_limits)
+        self._queues = {}
+        self._shared = {}  # (provider, key) -> (buckets, condition)
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def _queue(self, provider, key, resource):
+        qkey = (provider, key or "", resource or "")
+        with self._lock:
+            queue = self._queues.get(qkey)
+            if queue is None:
+                shared, cond = (), None
+                if self.shared_limits.get(provider):
+                    group = self._shared.get(qkey[:2])
+                    if group is None:
+                        group = self._shared[qkey[:2]] = (
+                            [TokenBucket(rate, capacity) for rate, capacity in self.shared_limits[provider]],
+                            threading.Condition())
+                    shared, cond = group
+                queue = self._queues[qkey] = _ProviderQueue(self.limits.get(provider, DEFAULT_LIMITS),
+                                                            shared, cond)
+            return queue
+
+    def acquire(self, provider, key=None, resource=None, priority=PRIORITY_SCAN, timeout=None):
+        """Block until a request to `provider` may be sent.
+
+        Returns the seconds spent waiting, or None if `timeout` elapsed first.
+        """
+        queue = self._queue(provider, key, resource)
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        with queue.cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(queue.waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if queue.waiters[0] == ticket:
+                        wait = queue.delay(now)
+                        if wait <= 0:
+                            heapq.heappop(queue.waiters)
+                            for bucket in queue.buckets:
+                                bucket.tokens -= 1
+                            waited = now - start
+                            queue.granted += 1
+                            queue.total_wait += waited
+                            queue.cond.notify_all()
+                            return waited
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            queue.remove(ticket)
+                            return None
+                        wait = remaining if wait is None else min(wait, remaining)
+                    queue.cond.wait(wait)
+            except BaseException:
+                if ticket in queue.waiters:
+                    queue.remove(ticket)
+                raise
+
+    def enqueue(self, provider, key=None, resource=None, priority=PRIORITY_SCAN):
+        """Join the queue without blocking, for event-loop callers that must not block in acquire().
+
+        Returns a ticket to pass to poll() until it is granted, or to cancel().
+        The ticket is ordered with the threads waiting in acquire() by priority.
+        """
+        queue = self._queue(provider, key, resource)
+        with queue.cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(queue.waiters, ticket)
+        return queue, ticket
+
+    def poll(self, ticket):
+        """Take the slot for an enqueue() ticket if it is its turn.
+
+        Returns 0.0 once the slot is taken (the ticket is then used up), otherwise
+        the seconds to sleep before polling again.
+        """
+        queue, entry = ticket
+        with queue.cond:
+            now = time.monotonic()
+            if queue.waiters[0] != entry:
+                return max(queue.delay(now), POLL_INTERVAL)
+            wait = queue.delay(now)
+            if wait > 0:
+                return wait
+            heapq.heappop(queue.waiters)
+            for bucket in queue.buckets:
+                bucket.tokens -= 1
+            queue.granted += 1
+            queue.cond.notify_all()
+            return 0.0
+
+    def cancel(self, ticket):
+        """Leave the queue with an enqueue() ticket that has not been granted."""
+        queue, entry = ticket
+        with queue.cond:
+            if entry in queue.waiters:
+                queue.remove(entry)
+
+    def retry_after(self, provider, seconds, key=None, resource=None):
+        """Pause all requests to this provider queue for `seconds` (e.g. from a Retry-After header)."""
+        queue = self._queue(provider, key, resource)
+        with queue.cond:
+            queue.blocked_until = max(queue.blocked_until, time.monotonic() + seconds)
+            queue.cond.notify_all()
+
+    def stats(self):
+        """Return {(provider, key, resource): (requests granted, total seconds waited)}."""
+        with self._lock:
+            queues = dict(self._queues)
+        return {k: (q.granted, q.total_wait) for k, q in queues.items()}
+
+
+def parse_retry_after(value, default):
+    """Parse a Retry-After header (delta-seconds form); fall back to `default`."""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+# Process-wide scheduler shared by every fetcher and worker thread
+SCHEDULER = RequestScheduler()
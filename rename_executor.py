@@ -0,0 +1,403 @@
+"""Journaled, dependency-ordered rename execution.
+
+A batch of renames is planned before anything touches the disk:
+
+* a move waits for the move that vacates its target (A->B runs after B->C),
+* cycles such as A->B / B->A are broken by parking one file under a temp name,
+* independent moves are grouped into levels and run on a thread pool, which
+  mostly pays off on network shares where every rename is a round trip.
+
+The plan is written to an append-only JSON-lines journal before the first
+rename, and every completed step is appended as it happens. A failure part
+way through rolls the batch back; a crash leaves a journal that can be
+resumed or undone, and a finished batch can be undone from its journal too.
+"""
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from filename_parser import sanitize_filename
+
+DEFAULT_RENAME_WORKERS = 8
+JOURNAL_KEEP = 20          # newest journals kept by new_journal_path()
+TEMP_PREFIX = ".cbz-renamer-"
+ROLLBACK_NOTE = "All renames"
+
+# Journal end states
+COMPLETE = "complete"
+ROLLED_BACK = "rolled_back"
+UNDONE = "undone"
+
+
+# ─── Planning ─────────────────────────────────────────────────────────────────
+
+_case_insensitive_dirs = {}  # directory -> bool, filled in by _case_insensitive()
+
+
+def _cased_probe(directory, name):
+    """An existing name in `directory` that changes under swapcase(): `name` if it does, else the first listed."""
+    if name.swapcase() != name:
+        return name
+    try:
+        with os.scandir(directory) as it:
+            return next((e.name for e in it if e.name.swapcase() != e.name), None)
+    except OSError:
+        return None
+
+
+def _case_insensitive(directory, name):
+    """True if `directory` lives on a case-insensitive file system (probed with an existing file).
+
+    The answer is cached per directory, unless no file there has a cased letter to probe with.
+    """
+    result = _case_insensitive_dirs.get(directory)
+    if result is None:
+        probe = _cased_probe(directory, name)
+        if probe is None:
+            return False
+        result = _case_insensitive_dirs[directory] = os.path.exists(os.path.join(directory, probe.swapcase()))
+    return result
+
+
+def plan_renames(entries):
+    """Order the renames in `entries` into steps that can run level by level.
+
+    Args:
+        entries: Dicts with directory, original and final (as produced by a scan)
+
+    Returns (steps, skipped, errors):
+        steps:   list of {"src", "dst", "level", "original", "final", "temp"} sorted by level;
+                 steps in the same level never depend on each other
+        skipped: list of originals that already have their final name
+        errors:  list of (path, message) for renames that cannot be performed, path
+                 being the file's original path (directory joined with original)
+    """
+    skipped, errors, moves = [], [], []
+    for entry in entries:
+        directory, original = entry["directory"], entry["original"]
+        src = os.path.join(directory, original)
+        dst = os.path.join(directory, sanitize_filename(entry["final"]))
+        if src == dst:
+            skipped.append(original)
+            continue
+        fold = _case_insensitive(directory, original)
+        moves.append({"src": src, "dst": dst, "original": original, "final": entry["final"], "temp": False,
+                      "src_key": src.casefold() if fold else src, "dst_key": dst.casefold() if fold else dst})
+
+    # Each move waits for the move that frees its target, if there is one
+    by_src = {move["src_key"]: i for i, move in enumerate(moves)}
+    blocker = [by_src.get(move["dst_key"]) for move in moves]
+    blocker = [None if b == i else b for i, b in enumerate(blocker)]
+
+    # Drop moves that cannot work; anything waiting on a dropped move can't either
+    bad = {}
+    for i, move in enumerate(moves):
+        if not os.path.exists(move["src"]):
+            bad[i] = "File not found"
+        elif blocker[i] is None and move["src_key"] != move["dst_key"] and os.path.lexists(move["dst"]):
+            bad[i] = "Target already exists"
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(moves)):
+            if i not in bad and blocker[i] in bad:
+                bad[i] = "Target already exists"
+                changed = True
+    errors.extend((moves[i]["src"], msg) for i, msg in sorted(bad.items()))
+
+    steps = []
+    index = {}
+    for i, move in enumerate(moves):
+        if i not in bad:
+            index[i] = len(steps)
+            steps.append(move)
+    blocked_by = [index[blocker[i]] if blocker[i] is not None else None for i in index]
+
+    _break_cycles(steps, blocked_by)
+
+    levels = [None] * len(steps)
+    for i in range(len(steps)):
+        chain = []
+        j = i
+        while j is not None and levels[j] is None:
+            chain.append(j)
+            j = blocked_by[j]
+        level = -1 if j is None else levels[j]
+        for j in reversed(chain):
+            level += 1
+            levels[j] = level
+
+    for step, level in zip(steps, levels):
+        step["level"] = level
+        del step["src_key"], step["dst_key"]
+    order = sorted(range(len(steps)), key=lambda i: levels[i])
+    return [steps[i] for i in order], skipped, errors
+
+
+def _original_path(step):
+    """The path the step's file had before the batch (the second half of a split move starts at a temp name)."""
+    return os.path.join(os.path.dirname(step["dst"]), step["original"])
+
+
+def _break_cycles(steps, blocked_by):
+    """Split one move of every dependency cycle into src -> temp and temp -> dst (in place)."""
+    token = uuid.uuid4().hex[:8]
+    state = [0] * len(steps)  # 0 = unseen, 1 = on the current path, 2 = done
+    for start in range(len(steps)):
+        path = []
+        i = start
+        while i is not None and state[i] == 0:
+            state[i] = 1
+            path.append(i)
+            i = blocked_by[i]
+        if i is not None and state[i] == 1:
+            # `i` is on a cycle: park its file first, and let the last hop wait for the cycle to unwind
+            move = steps[i]
+            temp = os.path.join(os.path.dirname(move["src"]), f"{TEMP_PREFIX}{token}-{i}.tmp")
+            steps.append(dict(move, src=temp, src_key=temp))
+            blocked_by.append(blocked_by[i])
+            move.update(dst=temp, dst_key=temp, temp=True)
+            blocked_by[i] = None
+            state.append(2)
+        for j in path:
+            state[j] = 2
+
+
+# ─── Journal ──────────────────────────────────────────────────────────────────
+
+def new_journal_path(journal_dir):
+    """Return a fresh journal path in `journal_dir`, pruning all but the newest JOURNAL_KEEP."""
+    os.makedirs(journal_dir, exist_ok=True)
+    old = sorted(f for f in os.listdir(journal_dir) if f.endswith(".jsonl"))
+    for name in old[:max(0, len(old) - JOURNAL_KEEP + 1)]:
+        try:
+            os.remove(os.path.join(journal_dir, name))
+        except OSError:
+            pass
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"{int(now * 1000) % 1000:03d}"
+    return os.path.join(journal_dir, f"rename-{stamp}-{uuid.uuid4().hex[:6]}.jsonl")
+
+
+def latest_journal(journal_dir):
+    """Path of the most recent journal in `journal_dir`, or None."""
+    try:
+        names = sorted(f for f in os.listdir(journal_dir) if f.endswith(".jsonl"))
+    except OSError:
+        return None
+    return os.path.join(journal_dir, names[-1]) if names else None
+
+
+class _Journal:
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "a+", encoding="utf-8") if path else None
+        if self._f is not None and self._f.tell():
+            # Start on a fresh line if a crash left the last record half-written
+            self._f.seek(self._f.tell() - 1)
+            if self._f.read(1) != "\n":
+                self._f.write("\n")
+
+    def write(self, record, sync=False):
+        if self._f is None:
+            return
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        if sync:
+            os.fsync(self._f.fileno())
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+
+
+def read_journal(path):
+    """Parse a journal into {"steps", "done", "undone", "status"}.
+
+    "done" lists completed step indexes in completion order; "status" is the
+    last recorded end state, or None if the batch never finished.
+    """
+    journal = {"steps": [], "done": [], "undone": set(), "status": None}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # record torn by a crash
+            op = record.get("op")
+            if op == "plan":
+                journal["steps"] = record["steps"]
+            elif op == "done":
+                journal["done"].append(record["step"])
+            elif op == "undone":
+                journal["undone"].add(record["step"])
+            elif op == "end":
+                journal["status"] = record["status"]
+    return journal
+
+
+def can_undo(journal):
+    return journal["status"] in (None, COMPLETE) and any(i not in journal["undone"] for i in journal["done"])
+
+
+def can_resume(journal):
+    return journal["status"] is None and bool(journal["steps"])
+
+
+# ─── Execution ────────────────────────────────────────────────────────────────
+
+def _move(src, dst):
+    # os.rename silently replaces an existing target on POSIX; never let it (a case-only
+    # rename on a case-insensitive volume "exists" but is the same file)
+    if os.path.lexists(dst) and not os.path.samefile(src, dst):
+        raise FileExistsError(f"Target already exists: {os.path.basename(dst)}")
+    os.rename(src, dst)
+
+
+def _by_level(indexes, steps):
+    levels = {}
+    for i in indexes:
+        levels.setdefault(steps[i]["level"], []).append(i)
+    return [levels[level] for level in sorted(levels)]
+
+
+def _run_level(pool, jobs):
+    """Run {step index: (src, dst)} concurrently. Returns ({index: None or error message})."""
+    futures = {i: pool.submit(_move, src, dst) for i, (src, dst) in jobs.items()}
+    results = {}
+    for i, future in futures.items():
+        try:
+            future.result()
+            results[i] = None
+        except OSError as e:
+            results[i] = str(e)
+    return results
+
+
+def _run_steps(journal, steps, pending, workers, done=None):
+    """Execute `pending` step indexes level by level, rolling back everything in `done` on failure.
+
+    Returns (done, errors, status).
+    """
+    done = list(done or [])
+    errors = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rename") as pool:
+        for level in _by_level(pending, steps):
+            results = _run_level(pool, {i: (steps[i]["src"], steps[i]["dst"]) for i in level})
+            for i, error in results.items():
+                if error is None:
+                    journal.write({"op": "done", "step": i})
+                    done.append(i)
+                else:
+                    errors.append((_original_path(steps[i]), error))
+            journal.write({"op": "level", "level": steps[level[0]]["level"]}, sync=True)
+            if errors:
+                errors += _undo_steps(journal, steps, done, set(), pool)
+                journal.write({"op": "end", "status": ROLLED_BACK}, sync=True)
+                return done, errors, ROLLED_BACK
+    journal.write({"op": "end", "status": COMPLETE}, sync=True)
+    return done, errors, COMPLETE
+
+
+def _undo_steps(journal, steps, done, undone, pool):
+    """Reverse completed steps, newest level first. Returns errors for steps that could not be reversed."""
+    errors = []
+    for level in reversed(_by_level([i for i in done if i not in undone], steps)):
+        results = _run_level(pool, {i: (steps[i]["dst"], steps[i]["src"]) for i in level})
+        for i, error in results.items():
+            if error is None:
+                journal.write({"op": "undone", "step": i})
+                undone.add(i)
+            else:
+                errors.append((_original_path(steps[i]), f"Undo failed: {error}"))
+        journal.write({"op": "level", "level": steps[level[0]]["level"], "undo": True}, sync=True)
+    return errors
+
+
+def _report(steps, indexes, reverse=False):
+    pairs = [(steps[i]["original"], steps[i]["final"]) for i in indexes if not steps[i]["temp"]]
+    return [(new, old) for old, new in pairs] if reverse else pairs
+
+
+def apply_renames(entries, journal_path=None, workers=DEFAULT_RENAME_WORKERS):
+    """Plan and perform the renames in `entries`.
+
+    If any rename fails while running, every rename already done in the
+    batch is reverted. Problems known up front (missing file, occupied
+    target) only skip the affected entries.
+
+    Args:
+        entries: Dicts with directory, original and final
+        journal_path: Journal file to write (None = no journal, no undo)
+        workers: Renames performed concurrently within a level
+
+    Returns (renamed, skipped, errors) with renamed as (original, final) pairs and errors
+    as (original path, message) pairs, or (ROLLBACK_NOTE, message) after a rollback.
+    """
+    steps, skipped, errors = plan_renames(entries)
+    if not steps:
+        return [], skipped, errors
+    journal = _Journal(journal_path)
+    try:
+        journal.write({"op": "plan", "created": time.time(), "steps": steps}, sync=True)
+        done, run_errors, status = _run_steps(journal, steps, range(len(steps)), workers)
+    finally:
+        journal.close()
+    if status == ROLLED_BACK:
+        return [], skipped, errors + run_errors + [(ROLLBACK_NOTE, "Rolled back after an error; no files were renamed")]
+    return _report(steps, done), skipped, errors + run_errors
+
+
+def undo_journal(path, workers=DEFAULT_RENAME_WORKERS):
+    """Revert every completed, not yet reverted step recorded in the journal at `path`.
+
+    Returns (reverted, errors) with reverted as (final, original) pairs.
+    """
+    record = read_journal(path)
+    if not can_undo(record):
+        return [], []
+    steps, undone = record["steps"], set(record["undone"])
+    journal = _Journal(path)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rename") as pool:
+            errors = _undo_steps(journal, steps, record["done"], undone, pool)
+        if not errors:
+            journal.write({"op": "end", "status": UNDONE}, sync=True)
+    finally:
+        journal.close()
+    reverted = [i for i in record["done"] if i in undone and i not in record["undone"]]
+    return _report(steps, reverted, reverse=True), errors
+
+
+def resume_journal(path, workers=DEFAULT_RENAME_WORKERS):
+    """Finish an interrupted batch from its journal.
+
+    A step whose source is gone and whose target exists is taken as done
+    (the crash came after the rename but before it was journaled).
+
+    Returns (renamed, errors) like apply_renames.
+    """
+    record = read_journal(path)
+    if not can_resume(record):
+        return [], []
+    steps = record["steps"]
+    done = list(record["done"])
+    journal = _Journal(path)
+    try:
+        pending = []
+        for i, step in enumerate(steps):
+            if i in done:
+                continue
+            if not os.path.lexists(step["src"]) and os.path.lexists(step["dst"]):
+                journal.write({"op": "done", "step": i})
+                done.append(i)
+            else:
+                pending.append(i)
+        done, errors, status = _run_steps(journal, steps, pending, workers, done=done)
+    finally:
+        journal.close()
+    if status == ROLLED_BACK:
+        return [], errors + [(ROLLBACK_NOTE, "Rolled back after an error; no files were renamed")]
+    return _report(steps, done), errors
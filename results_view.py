@@ -0,0 +1,253 @@
+"""Windowed results table for the GUI.
+
+Scan results live in a plain dict model; the ttk.Treeview only ever holds
+the rows that fit on screen. Worker threads hand rows over through a queue
+that is drained on a Tk timer, so a 50k-file scan costs a few dozen
+coalesced flushes instead of 50k event-queue callbacks.
+"""
+import time
+import tkinter as tk
+from collections import deque
+from tkinter import ttk
+
+FLUSH_MS = 100       # how often streamed rows are moved into the model
+WHEEL_ROWS = 3       # rows scrolled per mouse-wheel notch
+
+
+class ResultsView:
+    """Drives a Treeview as a viewport over `rows`.
+
+    Rows are dicts with at least display, online, backup, final, status and
+    tag; a non-empty 'conflict' label overrides the status and shows the row
+    with the "duplicate" tag. Each row gets an explicit iid ("r0", "r1", ...)
+    that doubles as its key in `rows`, so tree.identify_row() and tree.bbox()
+    keep working for whichever rows are on screen.
+
+    Args:
+        tree: The Treeview to drive (its own yscrollcommand is not used)
+        scrollbar: Vertical scrollbar, rewired to scroll the whole model
+        on_scroll: Optional callback run before the window moves
+    """
+
+    def __init__(self, tree, scrollbar, on_scroll=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.on_scroll = on_scroll
+        self.rows = {}
+        self.order = []
+        self.first = 0
+        self.selected = None
+        self._pending = deque()
+        self._timer = None
+        self._on_flush = None
+        self._metrics = None
+        self._height = 0
+        self._header = None
+        self._row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+
+        tree.configure(yscrollcommand="")
+        scrollbar.configure(command=self._on_scrollbar)
+        tree.bind("<Configure>", self._on_configure)
+        tree.bind("<<TreeviewSelect>>", self._on_select)
+        tree.bind("<MouseWheel>", self._on_wheel)
+        tree.bind("<Button-4>", self._on_wheel)
+        tree.bind("<Button-5>", self._on_wheel)
+        for key, delta in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "-page"), ("<Next>", "page"),
+                           ("<Home>", "home"), ("<End>", "end")):
+            tree.bind(key, lambda e, d=delta: self._on_key(d))
+
+    # ─── Model ───────────────────────────────────────────────────
+
+    def add(self, row):
+        """Append a row to the model and return its key (Tk thread only)."""
+        key = f"r{len(self.order)}"
+        self.rows[key] = row
+        self.order.append(key)
+        return key
+
+    def update(self, key):
+        """Redraw one row after its data changed; a no-op if it is off screen."""
+        if self.tree.exists(key):
+            row = self.rows[key]
+            self.tree.item(key, values=self._values(row), tags=self._tags(row))
+
+    def clear(self):
+        self._pending.clear()
+        self.rows.clear()
+        self.order.clear()
+        self.first = 0
+        self.selected = None
+        self.refresh()
+
+    # ─── Streaming ───────────────────────────────────────────────
+
+    def submit(self, row):
+        """Queue a row from any thread; it appears on the next flush."""
+        self._pending.append(row)
+
+    def start(self, on_flush=None, metrics=None):
+        """Begin draining submitted rows every FLUSH_MS. `on_flush(row_count)` runs after each batch.
+
+        `metrics` is an optional callable returning the ScanMetrics to charge flush time to
+        (or None); the scan runs on another thread, so its run is not active on the Tk thread.
+        """
+        self.stop(flush=False)
+        self._on_flush = on_flush
+        self._metrics = metrics
+        self._timer = self.tree.after(FLUSH_MS, self._tick)
+
+    def stop(self, flush=True):
+        """Stop the flush timer, optionally draining whatever is still queued."""
+        if self._timer is not None:
+            self.tree.after_cancel(self._timer)
+            self._timer = None
+        if flush:
+            self.flush()
+
+    def _tick(self):
+        self._timer = None
+        self.flush()
+        self._timer = self.tree.after(FLUSH_MS, self._tick)
+
+    def flush(self):
+        """Move queued rows into the model and redraw once. Returns the number added."""
+        pending = self._pending
+        count = len(pending)
+        if not count:
+            return 0
+        start = time.perf_counter()
+        before = len(self.order)
+        for _ in range(count):
+            self.add(pending.popleft())
+        if before < self.first + self._window_rows():
+            self.refresh()
+        else:
+            self._update_scrollbar()
+        metrics = self._metrics() if self._metrics else None
+        if metrics is not None:
+            metrics.add_time("tk_flush", time.perf_counter() - start)
+        if self._on_flush:
+            self._on_flush(len(self.order))
+        return count
+
+    # ─── Viewport ────────────────────────────────────────────────
+
+    @staticmethod
+    def _values(row):
+        status = row.get('conflict') or row['status']
+        return (row['display'], row['online'], row['backup'], row['final'], status)
+
+    @staticmethod
+    def _tags(row):
+        return ("duplicate",) if row.get('conflict') else (row['tag'],)
+
+    def _full_rows(self):
+        """Rows that fit completely in the tree."""
+        header = self._header if self._header is not None else self._row_height
+        return max(1, (self._height - header) // self._row_height)
+
+    def _window_rows(self):
+        """Rows to materialize: every full row plus a partly visible last one."""
+        return self._full_rows() + 1
+
+    def refresh(self):
+        """Rebuild the tree so it holds exactly the rows in the current window."""
+        total = len(self.order)
+        self.first = max(0, min(self.first, total - self._full_rows()))
+        keys = self.order[self.first:self.first + self._window_rows()]
+        tree = self.tree
+        current = tree.get_children()
+        if list(current) != keys:
+            if current:
+                tree.delete(*current)
+            for key in keys:
+                row = self.rows[key]
+                tree.insert("", tk.END, iid=key, values=self._values(row), tags=self._tags(row))
+            if self.selected in self.rows and self.selected in keys:
+                tree.selection_set(self.selected)
+                tree.focus(self.selected)
+        if keys and self._header is None:
+            bbox = tree.bbox(keys[0])
+            if bbox:
+                self._header = bbox[1]
+        tree.yview_moveto(0)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.order)
+        if total <= self._full_rows():
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + self._full_rows()) / total))
+
+    def scroll_to(self, first):
+        first = max(0, min(first, len(self.order) - self._full_rows()))
+        if first != self.first:
+            if self.on_scroll:
+                self.on_scroll()
+            self.first = first
+            self.refresh()
+
+    def see(self, key):
+        """Scroll just enough for the row `key` to be fully visible."""
+        index = self._index(key)
+        if index < self.first:
+            self.scroll_to(index)
+        elif index >= self.first + self._full_rows():
+            self.scroll_to(index - self._full_rows() + 1)
+
+    @staticmethod
+    def _index(key):
+        return int(key[1:])
+
+    # ─── Event Handlers ──────────────────────────────────────────
+
+    def _on_configure(self, event):
+        if event.height != self._height:
+            self._height = event.height
+            self.refresh()
+
+    def _on_select(self, event):
+        # Deleting rows while scrolling also fires this with an empty selection; keep the model's choice
+        selection = self.tree.selection()
+        if selection:
+            self.selected = selection[0]
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.order)))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self._full_rows() if args[2] == "pages" else 1)
+            self.scroll_to(self.first + step)
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            notches = 1
+        elif event.num == 5:
+            notches = -1
+        else:
+            notches = event.delta // 120 or (1 if event.delta > 0 else -1)
+        self.scroll_to(self.first - notches * WHEEL_ROWS)
+        return "break"
+
+    def _on_key(self, delta):
+        if not self.order:
+            return "break"
+        last = len(self.order) - 1
+        current = self._index(self.selected) if self.selected in self.rows else self.first
+        if delta == "home":
+            target = 0
+        elif delta == "end":
+            target = last
+        elif delta == "page":
+            target = current + self._full_rows()
+        elif delta == "-page":
+            target = current - self._full_rows()
+        else:
+            target = current + delta
+        key = self.order[max(0, min(target, last))]
+        self.selected = key
+        self.see(key)
+        self.tree.selection_set(key)
+        self.tree.focus(key)
+        return "break"
@@ -0,0 +1,649 @@
+"""Tk-free scan engine shared by the GUI and the command line.
+
+Settings are plain dicts using the same keys as config.load_config().
+Each scanned file produces an entry dict:
+    {"directory", "original", "online", "backup", "final", "status", "tag", "metadata"}
+"""
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+from filename_parser import parse_filename, normalize, sanitize_filename
+from api_sources import (
+    google_books_name_steps, comicvine_name_steps, comicvine_name_bulk_steps,
+    harvest_google_books_steps, run_steps, run_cached, set_api_urls, cached_series_terms, MATCH_RULES_VERSION
+)
+from async_api import AsyncLookupPipeline, DEFAULT_MAX_CONCURRENCY
+from fuzzy_matcher import SeriesIndex
+from library_walker import accepts_file, walk_cbz_files
+from title_format import pad_volume_in_title, strip_subtitle_from_title
+from duplicate_index import target_key
+from comicinfo import read_comicinfo, comicinfo_result, comicinfo_number
+import scan_metrics
+from scan_metrics import ScanMetrics
+
+
+# Default size of the lookup worker pool when lookups run on threads (async_lookups
+# off). Providers are throttled by the shared rate_limit.SCHEDULER, so extra
+# workers only overlap network latency.
+DEFAULT_LOOKUP_WORKERS = 4
+
+# Threads reading embedded ComicInfo.xml. Each read is a few small seeks, so this
+# mostly hides the latency of network shares and spinning disks.
+COMICINFO_READERS = 4
+
+
+class LookupPipeline:
+    """Deduplicate online lookups and resolve them on a bounded worker pool.
+
+    Every unique (series, vol) key is resolved exactly once; later requests for
+    the same key share the original Future. Keys of the same series are drained
+    in submission order by a single worker, so series-level decisions such as
+    the subtitle probe stay consistent, while different series run in parallel.
+
+    Args:
+        resolve: Callable(series, vol) -> result, run on a worker thread
+        max_workers: Size of the worker pool
+        metrics: ScanMetrics the workers report to (see scan_metrics.activate)
+    """
+
+    def __init__(self, resolve, max_workers=DEFAULT_LOOKUP_WORKERS, metrics=None):
+        self._resolve = resolve
+        self._metrics = metrics
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lookup")
+        self._futures = {}
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def submit(self, series, vol=None):
+        """Queue a lookup for (series, vol) and return its Future."""
+        key = (series, vol)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future
+            future = Future()
+            self._futures[key] = future
+            queue = self._queues.get(series)
+            if queue is None:
+                self._queues[series] = deque([(vol, future)])
+                self._executor.submit(self._drain, series)
+            else:
+                queue.append((vol, future))
+            return future
+
+    def _drain(self, series):
+        with scan_metrics.activate(self._metrics):
+            while True:
+                with self._lock:
+                    queue = self._queues[series]
+                    if not queue:
+                        del self._queues[series]
+                        return
+                    vol, future = queue.popleft()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(self._resolve(series, vol))
+                except BaseException as e:
+                    future.set_exception(e)
+
+    @property
+    def unique_lookups(self):
+        return len(self._futures)
+
+    def cancel(self):
+        """Drop every lookup that has not started; running ones finish their current request."""
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+
+    def shutdown(self, cancel=False):
+        """Stop the worker pool. With cancel=True, lookups that have not started are dropped."""
+        if cancel:
+            self.cancel()
+        self._executor.shutdown(wait=not cancel, cancel_futures=cancel)
+
+
+# ─── Name Building ────────────────────────────────────────────────────────────
+
+NO_RESULT = (None, None, None, None)
+PLACEHOLDER = "\u2014"
+_DIGIT_RE = re.compile(r"\d")
+
+
+def library_options(settings):
+    """Keyword arguments for the library_walker functions from the library scan settings."""
+    return {
+        "recursive": settings.get("recursive_scan", False),
+        "include": settings.get("include_patterns", ""),
+        "exclude": settings.get("exclude_patterns", ""),
+        "max_depth": settings.get("max_depth") or None,
+    }
+
+
+def walk_library(root, settings, with_stat=False):
+    """Yield (directory, filename) pairs for `root` using the library scan settings.
+
+    With with_stat=True, yields (directory, filename, stat_result) for incremental scans.
+    """
+    return walk_cbz_files(root, with_stat=with_stat, **library_options(settings))
+
+
+def build_entry(filename, parsed, online_result, settings):
+    """Build the rename entry for one file from its parse and online lookup result.
+
+    Args:
+        filename: The original filename
+        parsed: (series_guess, vol_num_raw, type_str) from parse_filename
+        online_result: (series, raw_title, subtitle, sep) from a fetcher, or NO_RESULT
+        settings: Settings dict (see config.load_config)
+    """
+    series_guess, vol_num_raw, type_str = parsed
+    online_series, online_raw_title, online_subtitle, online_orig_sep = online_result
+    scan_mode = settings["scan_mode"]
+    include_subtitle = settings["include_subtitle"]
+
+    try:
+        number = str(int(vol_num_raw))
+        vol_num = number.zfill(settings["num_padding"])
+    except ValueError:
+        number = vol_num = vol_num_raw
+
+    # Determine prefix based on detected type
+    if type_str == "Volume":
+        prefix = "Vol."
+    else:
+        prefix = settings["chapter_prefix"]
+
+    # Build online name
+    online_name = PLACEHOLDER
+    if online_series:
+        if settings["use_source_format"] and online_raw_title and type_str == "Volume":
+            # Use the raw title from the API, just pad the number
+            # Only for Volumes — chapters should use standardized format
+            # since APIs always return volume-based titles
+            online_name = pad_volume_in_title(online_raw_title, vol_num)
+            # Handle subtitle stripping if subtitles are disabled
+            if not include_subtitle:
+                online_name = strip_subtitle_from_title(online_name)
+            online_name += ".cbz"
+        else:
+            # Standardized format
+            online_name = f"{online_series}, {prefix} {vol_num}"
+            if include_subtitle and online_subtitle:
+                online_name += f" - {online_subtitle}"
+            online_name += ".cbz"
+        online_name = sanitize_filename(online_name)
+
+    # Build local backup name
+    backup_name = PLACEHOLDER
+    if scan_mode in ("both", "local"):
+        backup_name = sanitize_filename(f"{series_guess}, {prefix} {vol_num}.cbz")
+
+    # Determine final name and status
+    if scan_mode == "online":
+        if online_series:
+            final = online_name
+            tag = "match"
+            status = "Online"
+        else:
+            final = filename
+            tag = "offline"
+            status = "No Match"
+    elif scan_mode == "local":
+        final = backup_name
+        tag = "ready"
+        status = "Ready"
+        if backup_name == filename:
+            status = "Perfect"
+            tag = "match"
+    else:
+        final = backup_name
+        tag = "ready"
+        status = "Ready"
+
+        if backup_name == filename:
+            status = "Perfect"
+            tag = "match"
+
+        if online_series:
+            final = online_name
+            if normalize(online_name) == normalize(backup_name):
+                status = "Verified"
+                tag = "match"
+            else:
+                status = "Conflict"
+                tag = "conflict"
+
+        if filename == final:
+            status = "Perfect"
+            tag = "match"
+
+    # ComicInfo.xml fields for comicinfo.embed_entries
+    metadata = None
+    series = online_series or (series_guess if scan_mode != "online" else None)
+    if series:
+        metadata = {"Series": series, "Number": number}
+        if include_subtitle and online_subtitle:
+            metadata["Title"] = online_subtitle
+
+    return {
+        "original": filename, "online": online_name, "backup": backup_name,
+        "final": final, "status": status, "tag": tag, "metadata": metadata,
+    }
+
+
+# ─── Scanner ──────────────────────────────────────────────────────────────────
+
+class Scanner:
+    """Resolve and build rename entries for a batch of files.
+
+    Args:
+        settings: Settings dict (see config.load_config)
+        cache: Dict-like lookup cache shared with the fetchers
+        status_callback: Optional callable(text, color) for provider status messages
+        max_workers: Lookups in flight at once (None = DEFAULT_MAX_CONCURRENCY with
+            async_lookups, else DEFAULT_LOOKUP_WORKERS threads)
+        manifest: Optional scan_manifest.ScanManifest; files scanned with a stat
+            (see walk_library) reuse its stored results when unchanged
+    """
+
+    def __init__(self, settings, cache, status_callback=None, max_workers=None, manifest=None):
+        self.settings = settings
+        self.cache = cache
+        self.status_callback = status_callback
+        self.max_workers = max_workers
+        self.manifest = manifest
+        self.cancelled = False
+        self._pipeline = None
+        self.submitted = 0
+        self.reused = 0
+        self.comicinfo_hits = 0
+        self.metrics = ScanMetrics()
+        self._probe_results = {}  # Track if series has subtitles (True/False)
+        self._harvested = set()   # Series already harvested from Google Books this scan
+        self._series_index = None # fuzzy_matcher.SeriesIndex, built on first lookup
+        self._index_lock = threading.Lock()
+
+        self._cv_key = (settings.get("comicvine_api_key") or "").strip()
+        self._gb_key = (settings.get("google_books_api_key") or "").strip() or None
+        # Add space for non-# prefixes
+        cv_prefix = (settings.get("comicvine_vol_prefix") or "#").strip()
+        self._cv_prefix = cv_prefix if cv_prefix == "#" else cv_prefix + " "
+        self._use_comicvine = settings["online_source"] == "comicvine" and bool(self._cv_key)
+        set_api_urls(settings.get("google_books_api_url"), settings.get("comicvine_api_url"))
+
+    @property
+    def online(self):
+        return self.settings["scan_mode"] in ("both", "online")
+
+    @property
+    def read_comicinfo(self):
+        """Whether embedded ComicInfo.xml is consulted before the online providers."""
+        return self.online and bool(self.settings.get("read_comicinfo", True))
+
+    @property
+    def fuzzy_match(self):
+        """Whether near-miss series guesses are mapped to already-known series before going online."""
+        return self.online and bool(self.settings.get("fuzzy_match", True))
+
+    def series_index(self):
+        """The fuzzy index of every series in the cache, built on first use."""
+        with self._index_lock:
+            if self._series_index is None:
+                index = SeriesIndex()
+                with scan_metrics.timed("fuzzy_index"):
+                    try:
+                        for term, series in cached_series_terms(self.cache):
+                            index.add(term, term, series)
+                            index.add(series, term, series)
+                    except Exception as e:
+                        print(f"Could not index cached series: {e}")
+                self._series_index = index
+            return self._series_index
+
+    def known_term(self, series_guess):
+        """Return the known lookup term closest to `series_guess`, or series_guess if none is close enough."""
+        with scan_metrics.timed("fuzzy_match"):
+            match = self.series_index().best(series_guess)
+        if match is None or match.term == series_guess:
+            return series_guess
+        scan_metrics.count("fuzzy", "matches")
+        self._status(f"Matched '{series_guess}' to known series '{match.name}' ({match.score:.0%})", "#e8e8e8")
+        return match.term
+
+    def lookup_vol(self, parsed):
+        """Return the volume part of the lookup key for a parsed file.
+
+        Google Books only needs per-volume queries when hunting subtitles; otherwise
+        every file of a series shares a single series-level lookup.
+        """
+        if self._use_comicvine or self.settings["include_subtitle"]:
+            return parsed[1]
+        return None
+
+    def _status(self, text, color):
+        if self.status_callback:
+            self.status_callback(text, color)
+
+    def lookup_signature(self):
+        """Settings that shape lookup results; stored results from other settings are re-fetched."""
+        s = self.settings
+        return repr((MATCH_RULES_VERSION, self.online, self._use_comicvine, s["include_subtitle"],
+                     self._cv_prefix, bool(s.get("comicvine_bulk")), bool(s.get("google_books_harvest")),
+                     self.read_comicinfo, self.fuzzy_match))
+
+    def comicinfo_lookup(self, directory, filename, parsed):
+        """Resolve a file from its embedded ComicInfo.xml. Never raises.
+
+        Returns (parsed, result): the parse gains ComicInfo's number when the filename
+        has none, and result is None when ComicInfo names no series.
+        """
+        try:
+            with scan_metrics.timed("comicinfo"):
+                info = read_comicinfo(os.path.join(directory, filename))
+        except Exception as e:
+            print(f"Could not read ComicInfo.xml from '{filename}': {e}")
+            return parsed, None
+        number = comicinfo_number(info)
+        if number and not _DIGIT_RE.search(filename):
+            parsed = (parsed[0], number, parsed[2])
+        return parsed, comicinfo_result(info, filename)
+
+    def lookup(self, series_guess, vol_num_raw):
+        """Resolve one (series, vol) key with blocking requests. Runs on a pipeline worker; never raises."""
+        return run_steps(self.lookup_steps(series_guess, vol_num_raw))
+
+    def lookup_steps(self, series_guess, vol_num_raw):
+        """lookup() as a step generator (see api_sources.ApiCall), for async_api.AsyncLookupPipeline."""
+        with scan_metrics.timed("lookup"):
+            return (yield from self._lookup_steps(series_guess, vol_num_raw))
+
+    def _lookup_steps(self, series_guess, vol_num_raw):
+        try:
+            if self.cancelled:
+                return NO_RESULT
+            if not self.fuzzy_match:
+                return (yield from self._online_steps(series_guess, vol_num_raw))
+            result = yield from self._online_steps(self.known_term(series_guess), vol_num_raw)
+            if result[0]:
+                # Later near-misses of this guess (or of the series' name) resolve locally
+                index = self.series_index()
+                index.add(series_guess, series_guess, result[0])
+                index.add(result[0], series_guess, result[0])
+            return result
+        except Exception as e:
+            print(f"Online lookup failed for '{series_guess}': {e}")
+            return NO_RESULT
+
+    def _online_steps(self, series_guess, vol_num_raw):
+        if self._use_comicvine:
+            self._status(f"Searching ComicVine for: {series_guess}", "#e8e8e8")
+            # Bulk mode resolves the series' volume once and answers each file from its issue list
+            steps = comicvine_name_bulk_steps if self.settings.get("comicvine_bulk") else comicvine_name_steps
+            return (yield from steps(series_guess, self.cache, self._cv_key,
+                                     vol_num=vol_num_raw,
+                                     vol_prefix=self._cv_prefix,
+                                     status_callback=self.status_callback))
+
+        include_subtitle = self.settings["include_subtitle"]
+        if include_subtitle and self.settings.get("google_books_harvest") \
+                and series_guess not in self._harvested:
+            # Fill the per-volume cache for the whole series in a few paged calls
+            self._harvested.add(series_guess)
+            yield from harvest_google_books_steps(series_guess, self.cache, api_key=self._gb_key,
+                                                  status_callback=self.status_callback)
+
+        # Smart Probe Logic
+        probe = self._probe_results
+        query_vol = None
+        if include_subtitle:
+            if series_guess not in probe:
+                query_vol = vol_num_raw  # Probe first file
+            elif probe[series_guess]:
+                query_vol = vol_num_raw  # Continue strict mode
+            else:
+                query_vol = None         # Fallback to fast mode
+
+        result = yield from google_books_name_steps(series_guess, self.cache,
+                                                    api_key=self._gb_key,
+                                                    status_callback=self.status_callback,
+                                                    vol_num=query_vol)
+
+        # Update probe results
+        if include_subtitle:
+            if result[2]:
+                probe[series_guess] = True
+            elif series_guess not in probe:
+                # First probe found NO subtitle. This result is likely generic enough for the series.
+                # Cache it under the generic series key to save a call for next files (which will use fast mode).
+                probe[series_guess] = False
+                if result[0] and self.settings["online_source"] == "comicvine":
+                    self.cache[series_guess] = result
+        return result
+
+    def resolve_cached(self, directory, filename):
+        """Build the entry for one file from its name, ComicInfo.xml and the cache alone.
+
+        Returns the entry, or None if the file needs an online lookup. Used by the
+        scan_shards workers, which never go online themselves.
+        """
+        with scan_metrics.timed("parse"):
+            parsed = parse_filename(filename)
+        result = NO_RESULT
+        if self.online:
+            result = None
+            if self.read_comicinfo:
+                parsed, result = self.comicinfo_lookup(directory, filename, parsed)
+                scan_metrics.count("comicinfo", "misses" if result is None else "hits")
+            if result is None:
+                result = run_cached(self.lookup_steps(parsed[0], self.lookup_vol(parsed)))
+                if result is None:
+                    return None
+        with scan_metrics.timed("build"):
+            entry = build_entry(filename, parsed, result, self.settings)
+        entry["directory"] = directory
+        return entry
+
+    def scan(self, files, on_entry, prune=True, root=None):
+        """Scan (directory, filename) pairs, calling on_entry(entry) as each one resolves.
+
+        `files` may be a lazy generator: each file is parsed and its lookup queued as
+        soon as it is yielded, and the pipeline sends each unique series/volume query
+        to the pool once. on_entry is called from worker threads. Returns the number
+        of files submitted.
+
+        Items may also be (directory, filename, stat_result); with a manifest, files
+        whose identity is unchanged are rebuilt from it without a parse or lookup.
+        Pass prune=False when `files` lists only part of its directories, so the
+        manifest keeps the files that were not listed. Pass `root` when `files` is
+        walk_library(root, ...), so the manifest also forgets folders under it that
+        were deleted or emptied since the last scan.
+
+        With read_comicinfo, each file needing a lookup first has its ComicInfo.xml
+        read on a small I/O pool; only files without a usable one reach the pipeline.
+
+        Stage timings and provider counters for the run are collected in self.metrics.
+        """
+        self.metrics = metrics = ScanMetrics()
+        with scan_metrics.activate(metrics):
+            try:
+                return self._scan(files, on_entry, prune, root)
+            finally:
+                metrics.finish()
+
+    def _new_pipeline(self):
+        if self.settings.get("async_lookups", True):
+            return AsyncLookupPipeline(self.lookup_steps, max_concurrency=self.max_workers or DEFAULT_MAX_CONCURRENCY,
+                                       metrics=self.metrics)
+        return LookupPipeline(self.lookup, max_workers=self.max_workers or DEFAULT_LOOKUP_WORKERS,
+                              metrics=self.metrics)
+
+    def _scan(self, files, on_entry, prune, root):
+        metrics = self.metrics
+        pipeline = self._pipeline = self._new_pipeline()
+        if self.cancelled:
+            pipeline.cancel()  # cancel() arrived before the pipeline existed
+        readers = ThreadPoolExecutor(max_workers=COMICINFO_READERS, thread_name_prefix="comicinfo") \
+            if self.read_comicinfo else None
+        pending = []
+        pending_lock = threading.Lock()
+        self.submitted = 0
+        self.reused = 0
+        self.comicinfo_hits = 0
+        manifest = self.manifest
+        signature = self.lookup_signature() if manifest else None
+        seen = {}  # directory -> names listed, for pruning the manifest
+
+        def _emit(directory, filename, parsed, result, st=None):
+            if not self.cancelled:
+                with metrics.stage("build"):
+                    entry = build_entry(filename, parsed, result, self.settings)
+                entry["directory"] = directory
+                if st is not None:
+                    manifest.record(directory, filename, st, parsed, result, signature,
+                                    sanitize_filename(entry["final"]))
+                on_entry(entry)
+
+        def _submit(directory, filename, parsed, st):
+            future = pipeline.submit(parsed[0], self.lookup_vol(parsed))
+            future.add_done_callback(
+                lambda f: f.cancelled() or f.exception() is not None
+                or _emit(directory, filename, parsed, f.result(), st))
+            with pending_lock:
+                pending.append(future)
+
+        def _read_comicinfo(directory, filename, parsed, st):
+            if self.cancelled:
+                return
+            with scan_metrics.activate(metrics):
+                parsed, result = self.comicinfo_lookup(directory, filename, parsed)
+            if result is None:
+                metrics.add("comicinfo", "misses")
+                _submit(directory, filename, parsed, st)
+            else:
+                metrics.add("comicinfo", "hits")
+                with pending_lock:
+                    self.comicinfo_hits += 1
+                _emit(directory, filename, parsed, result, st)
+
+        try:
+            for item in metrics.timed_iter("walk", files):
+                if self.cancelled:
+                    break
+                directory, filename = item[0], item[1]
+                st = item[2] if manifest and len(item) > 2 else None
+                self.submitted += 1
+
+                reuse = None
+                if st is not None:
+                    seen.setdefault(directory, set()).add(filename)
+                    with metrics.stage("manifest"):
+                        reuse = manifest.lookup(directory, filename, st, signature)
+                if reuse is None:
+                    with metrics.stage("parse"):
+                        parsed = parse_filename(filename)
+                    result, fresh = None, False
+                else:
+                    parsed, result, fresh = reuse
+                if not self.online:
+                    result = NO_RESULT
+                if result is not None:
+                    if reuse is not None:
+                        self.reused += 1
+                        metrics.add("manifest", "reused")
+                    _emit(directory, filename, parsed, result, None if fresh else st)
+                    continue
+
+                if readers is not None:
+                    readers.submit(_read_comicinfo, directory, filename, parsed, st)
+                else:
+                    _submit(directory, filename, parsed, st)
+            if readers is not None:
+                readers.shutdown(wait=True, cancel_futures=self.cancelled)
+            for future in pending:
+                if self.cancelled:
+                    break
+                try:
+                    future.exception()  # wait without raising; lookups never raise
+                except CancelledError:
+                    break
+        except BaseException:
+            self.cancel()  # e.g. Ctrl+C on the command line: don't wait for lookups in flight
+            raise
+        finally:
+            if readers is not None:
+                readers.shutdown(wait=True, cancel_futures=True)
+            pipeline.shutdown(cancel=self.cancelled)
+            if manifest:
+                with metrics.stage("manifest_commit"):
+                    if prune and not self.cancelled:
+                        options = library_options(self.settings)
+                        manifest.commit(seen, root, lambda path: accepts_file(root, path, **options))
+                    else:
+                        manifest.commit()
+        return self.submitted
+
+    def report(self, **extra):
+        """JSON run report of the last scan: metrics plus file counts and the settings that shape it."""
+        s = self.settings
+        return self.metrics.report(
+            files=self.submitted, reused=self.reused, comicinfo_hits=self.comicinfo_hits,
+            cancelled=self.cancelled,
+            settings={k: s.get(k) for k in ("scan_mode", "online_source", "include_subtitle",
+                                            "comicvine_bulk", "google_books_harvest", "read_comicinfo",
+                                            "incremental_scan")},
+            **extra)
+
+    def scan_library(self, root):
+        """Scan a library folder synchronously and return its entries in path order."""
+        entries = []
+        lock = threading.Lock()
+
+        def _collect(entry):
+            with lock:
+                entries.append(entry)
+
+        self.scan(walk_library(root, self.settings, with_stat=self.manifest is not None), _collect, root=root)
+        entries.sort(key=lambda e: (e["directory"], e["original"]))
+        return entries
+
+    def cancel(self):
+        """Stop the scan; safe to call from any thread. Async lookups in flight are abandoned at once."""
+        self.cancelled = True
+        pipeline = self._pipeline
+        if pipeline is not None:
+            pipeline.cancel()
+
+
+# ─── Applying Entries ─────────────────────────────────────────────────────────
+
+def find_duplicate_targets(entries):
+    """Return the (directory, final) targets that more than one pending rename would produce.
+
+    Names are compared case-insensitively after sanitizing, as they would be on NTFS;
+    each clash is reported once, under the first entry's spelling.
+    """
+    seen, dupes = {}, set()
+    for entry in entries:
+        if entry["original"] == entry["final"]:
+            continue
+        directory = entry.get("directory")
+        key = target_key(directory, entry["final"])
+        if key in seen:
+            dupes.add(seen[key])
+        else:
+            seen[key] = (directory, entry["final"])
+    return dupes
+
+
+def group_by_directory(entries):
+    """Group entries into a dict of directory -> list of entries, preserving order."""
+    groups = {}
+    for entry in entries:
+        groups.setdefault(entry["directory"], []).append(entry)
+    return groups
+
@@ -0,0 +1,168 @@
+"""Per-directory manifest of scanned files for incremental rescans.
+
+For every file a scan has seen, the manifest keeps its identity (inode,
+device, size, mtime), the parse result, the online lookup result and the
+name it resolved to. A rescan can then rebuild the entry of an unchanged
+file without parsing or querying anything; only new or modified files go
+through the lookup pipeline. Files renamed by an apply keep their identity,
+so they are recognized under their new name as well.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    directory TEXT NOT NULL,
+    name      TEXT NOT NULL,
+    ino       INTEGER NOT NULL,
+    dev       INTEGER NOT NULL,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    parsed    TEXT NOT NULL,
+    result    TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    final     TEXT NOT NULL,
+    PRIMARY KEY (directory, name)
+);
+"""
+
+_UPSERT = (
+    "INSERT OR REPLACE INTO files (directory, name, ino, dev, size, mtime_ns, parsed, result, signature, final) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def file_identity(st):
+    """(inode, device, size, mtime_ns) from an os.stat_result.
+
+    Inode and device read as 0 from os.scandir on Windows; size and mtime still
+    tell an edited file apart.
+    """
+    return (st.st_ino, st.st_dev, st.st_size, st.st_mtime_ns)
+
+
+class ScanManifest:
+    """SQLite-backed manifest, loaded one directory at a time.
+
+    Args:
+        path: Database file path
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirs = {}      # directory -> ({name: record}, {identity: record})
+        self._pending = []   # rows to upsert on commit()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _directory(self, directory):
+        with self._lock:
+            loaded = self._dirs.get(directory)
+            if loaded is None:
+                by_name, by_identity = {}, {}
+                rows = self._conn.execute(
+                    "SELECT name, ino, dev, size, mtime_ns, parsed, result, signature, final "
+                    "FROM files WHERE directory = ?", (directory,))
+                for name, ino, dev, size, mtime_ns, parsed, result, signature, final in rows:
+                    record = {"name": name, "identity": (ino, dev, size, mtime_ns),
+                              "parsed": tuple(json.loads(parsed)), "result": tuple(json.loads(result)),
+                              "signature": signature, "final": final}
+                    by_name[name] = record
+                    by_identity[record["identity"]] = record
+                loaded = self._dirs[directory] = (by_name, by_identity)
+            return loaded
+
+    def lookup(self, directory, name, st, signature):
+        """Find what can be reused for a file.
+
+        Returns None for a new or modified file, otherwise (parsed, result, fresh):
+            parsed: the stored parse result
+            result: the stored lookup result, or None if it must be fetched again
+                    (the lookup settings changed, or the last lookup found nothing)
+            fresh:  True if the stored record needs no update (same name, same settings)
+        """
+        by_name, by_identity = self._directory(directory)
+        identity = file_identity(st)
+        record = by_name.get(name)
+        if record is None or record["identity"] != identity:
+            # Renamed since the last scan? Only trust it if it now carries the name we proposed
+            record = by_identity.get(identity)
+            if record is None or record["final"] != name:
+                return None
+        same_settings = record["signature"] == signature
+        result = record["result"] if same_settings and any(record["result"]) else None
+        return record["parsed"], result, same_settings and record["name"] == name
+
+    def record(self, directory, name, st, parsed, result, signature, final):
+        """Queue a file's scan outcome for the next commit(). Safe to call from any thread."""
+        ino, dev, size, mtime_ns = file_identity(st)
+        row = (directory, name, ino, dev, size, mtime_ns, json.dumps(list(parsed), ensure_ascii=False),
+               json.dumps(list(result), ensure_ascii=False), signature, final)
+        with self._lock:
+            self._pending.append(row)
+
+    def _unlisted(self, root, seen, covers):
+        """(directory, name) rows under `root` in directories missing from `seen` that `covers` accepts."""
+        prefix = os.path.join(root, "")
+        directories = [d for (d,) in self._conn.execute("SELECT DISTINCT directory FROM files")
+                       if (d == root or d.startswith(prefix)) and d not in seen]
+        stale = []
+        for directory in directories:
+            for (name,) in self._conn.execute("SELECT name FROM files WHERE directory = ?", (directory,)):
+                if covers is None or covers(os.path.join(directory, name)):
+                    stale.append((directory, name))
+        return stale
+
+    def commit(self, seen=None, root=None, covers=None):
+        """Write queued records and drop files that have disappeared.
+
+        Args:
+            seen: Optional {directory: set of names} for directories that were listed
+                  completely; manifest rows for other names in them are deleted
+            root: Optional folder the listing in `seen` started from. Rows of directories
+                  under it that are missing from `seen` (deleted or emptied folders) are
+                  deleted too
+            covers: Optional callable(path) -> True if the listing from `root` would have
+                    included a file at `path`; rows it rejects (e.g. deeper than the walk
+                    went) are kept. Default: every row under `root`
+        """
+        with self._lock:
+            rows, self._pending = self._pending, []
+            stale = []
+            for directory, names in (seen or {}).items():
+                loaded = self._dirs.get(directory)
+                if loaded is not None:
+                    stale.extend((directory, name) for name in loaded[0] if name not in names)
+            if seen is not None and root is not None:
+                stale.extend(self._unlisted(root, seen, covers))
+            if not rows and not stale:
+                return
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("DELETE FROM files WHERE directory = ? AND name = ?", stale)
+                self._conn.executemany(_UPSERT, rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            # Reload touched directories from the database on next use
+            for directory in {row[0] for row in rows} | {d for d, _ in stale}:
+                self._dirs.pop(directory, None)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_manifest(path):
+    """Open the manifest at `path`, or return None (full rescans) if it can't be opened."""
+    try:
+        return ScanManifest(path)
+    except sqlite3.Error as e:
+        print(f"Scan manifest unavailable ({e}); rescans will be full scans")
+        return None
@@ -0,0 +1,176 @@
+"""Timing and counters for a scan run.
+
+A Scanner creates one ScanMetrics per scan and activates it for the duration,
+so code deep in the fetchers can report without the object being threaded
+through every call: record_time(), count() and the timed() context manager
+add to whichever run is active and do nothing when none is. The active run is
+a context variable, so scans in different threads don't see each other's run;
+threads a scan starts activate its run themselves (see scan_engine.LookupPipeline).
+
+Stage times are summed across threads (four workers waiting on HTTP for one
+second each add four seconds to "http"), so they show where the work goes
+rather than adding up to the wall-clock duration.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+REPORT_VERSION = 1
+
+_active = ContextVar("scan_metrics", default=None)
+
+
+class ScanMetrics:
+    """Stage timers, per-provider counters and throughput for one scan. Thread-safe."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.finished = None
+        self._t0 = time.monotonic()
+        self._lock = threading.Lock()
+        self.stages = {}      # stage -> [seconds, count]
+        self.providers = {}   # provider -> {counter: value}
+        self._rate = None     # smoothed files/s for the ETA
+        self._last = (self._t0, 0)
+
+    # ─── Recording ───────────────────────────────────────────────
+
+    def add_time(self, stage, seconds, count=1):
+        with self._lock:
+            totals = self.stages.get(stage)
+            if totals is None:
+                self.stages[stage] = [seconds, count]
+            else:
+                totals[0] += seconds
+                totals[1] += count
+
+    def add(self, provider, counter, value=1):
+        with self._lock:
+            counters = self.providers.setdefault(provider, {})
+            counters[counter] = counters.get(counter, 0) + value
+
+    def merge(self, report):
+        """Add the stage times and provider counters of another run's report (e.g. a scan shard's)."""
+        for stage, totals in report.get("stages", {}).items():
+            self.add_time(stage, totals["seconds"], totals["count"])
+        for provider, counters in report.get("providers", {}).items():
+            for counter, value in counters.items():
+                self.add(provider, counter, value)
+
+    @contextmanager
+    def stage(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def timed_iter(self, stage, iterable):
+        """Yield from `iterable`, charging the time spent producing each item to `stage`."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(stage, time.perf_counter() - start, 0)
+                return
+            self.add_time(stage, time.perf_counter() - start)
+            yield item
+
+    def finish(self):
+        self.finished = time.time()
+
+    # ─── Readouts ────────────────────────────────────────────────
+
+    @property
+    def elapsed(self):
+        if self.finished is not None:
+            return self.finished - self.started
+        return time.monotonic() - self._t0
+
+    def progress(self, done, total):
+        """Status line text, e.g. "Scanning 120 of 500 \u2014 35.2 files/s, ETA 0:11\u2026".
+
+        Throughput is smoothed over recent calls, so call it at a steady cadence
+        (the results view's flush) rather than once per file.
+        """
+        now = time.monotonic()
+        last_time, last_done = self._last
+        if now > last_time and done >= last_done:
+            rate = (done - last_done) / (now - last_time)
+            self._rate = rate if self._rate is None else 0.7 * self._rate + 0.3 * rate
+            self._last = (now, done)
+        total = max(total, done)
+        text = f"Scanning {done} of {total}"
+        if self._rate:
+            text += f" \u2014 {self._rate:.1f} files/s"
+            if total > done:
+                eta = int((total - done) / self._rate)
+                text += f", ETA {eta // 60}:{eta % 60:02d}"
+        return text + "\u2026"
+
+    def report(self, **extra):
+        """The run as a JSON-serializable dict; `extra` is merged in at the top level."""
+        with self._lock:
+            stages = {name: {"seconds": round(seconds, 6), "count": count}
+                      for name, (seconds, count) in sorted(self.stages.items())}
+            providers = {name: dict(sorted(counters.items())) for name, counters in sorted(self.providers.items())}
+        for counters in providers.values():
+            for key, value in counters.items():
+                if isinstance(value, float):
+                    counters[key] = round(value, 6)
+        elapsed = self.elapsed
+        report = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "duration": round(elapsed, 3),
+            "stages": stages,
+            "providers": providers,
+        }
+        report.update(extra)
+        files = report.get("files")
+        if files and elapsed > 0:
+            report["files_per_second"] = round(files / elapsed, 2)
+        return report
+
+
+def write_report(path, runs):
+    """Write run reports (see ScanMetrics.report) to `path` as {"version", "runs"} JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": REPORT_VERSION, "runs": runs}, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+# ─── Active Run ───────────────────────────────────────────────────────────────
+
+@contextmanager
+def activate(metrics):
+    """Make `metrics` the run that record_time()/count()/timed() report to in this thread or task."""
+    token = _active.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _active.reset(token)
+
+
+def record_time(stage, seconds, count=1):
+    metrics = _active.get()
+    if metrics is not None:
+        metrics.add_time(stage, seconds, count)
+
+
+def count(provider, counter, value=1):
+    metrics = _active.get()
+    if metrics is not None:
+        metrics.add(provider, counter, value)
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_time(stage, time.perf_counter() - start)
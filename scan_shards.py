@@ -0,0 +1,154 @@
+"""Sharded batch scans for very large libraries.
+
+Parsing, ComicInfo reads, fuzzy matching and name building are CPU-bound and
+run on one core under the GIL. scan_sharded() splits the file list into
+contiguous runs of path order (so a series' files mostly stay together) and
+resolves them on a process pool. Workers read a snapshot of the lookup cache
+and never go online: a file they cannot resolve from its name, its
+ComicInfo.xml and the snapshot comes back to the parent, which looks it up
+with an ordinary Scanner. API calls therefore still leave from one process
+and stay within its rate limits. The merged plan is checked for duplicate
+targets across all shards.
+"""
+import math
+import os
+import re
+import signal
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import scan_metrics
+from api_sources import load_cache_snapshot
+from scan_engine import Scanner, find_duplicate_targets
+from scan_metrics import ScanMetrics
+
+# Shards per worker process, so that a slow shard doesn't leave the others idle at the end
+SHARDS_PER_PROCESS = 4
+# Below this, a shard costs more to ship to a worker than to scan
+MIN_SHARD_SIZE = 250
+
+_scanner = None  # the worker process' Scanner, set up by _init_worker
+
+
+def default_processes():
+    """One worker per CPU core."""
+    return os.cpu_count() or 1
+
+
+_STEM_RE = re.compile(r"\D*")
+
+
+def _stem(item):
+    """(directory, name up to its first digit): files of one series share it."""
+    return item[0], _STEM_RE.match(item[1]).group().casefold()
+
+
+def shard_files(files, shards):
+    """Split (directory, filename) pairs into about `shards` contiguous runs of path order.
+
+    Each cut is moved forward to where the name stem changes, so the files of a series
+    land in one shard and are resolved in order (the Google Books subtitle probe
+    depends on which volume of a series is seen first). A cut moves at most one
+    shard's length, so a single huge series still splits.
+    """
+    files = sorted(files)
+    size = max(MIN_SHARD_SIZE, math.ceil(len(files) / max(shards, 1)))
+    result = []
+    start = 0
+    while start < len(files):
+        end = min(start + size, len(files))
+        limit = min(end + size, len(files))
+        while end < limit and _stem(files[end]) == _stem(files[end - 1]):
+            end += 1
+        result.append(files[start:end])
+        start = end
+    return result
+
+
+def _init_worker(settings, snapshot_path):
+    global _scanner
+    # Ctrl+C is handled by the parent, which stops handing out shards
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _scanner = Scanner(settings, load_cache_snapshot(snapshot_path))
+
+
+def _scan_shard(files):
+    """Resolve one shard in a worker. Returns (entries, files that need a lookup, metrics report)."""
+    metrics = ScanMetrics()
+    entries, unresolved = [], []
+    with scan_metrics.activate(metrics):
+        for directory, filename in files:
+            entry = _scanner.resolve_cached(directory, filename)
+            if entry is None:
+                unresolved.append((directory, filename))
+            else:
+                entries.append(entry)
+    metrics.finish()
+    return entries, unresolved, metrics.report()
+
+
+def scan_sharded(files, settings, cache, processes=None, status_callback=None, max_workers=None):
+    """Scan (directory, filename) pairs on a process pool.
+
+    Args:
+        files: Iterable of (directory, filename), e.g. walk_library(root, settings)
+        settings: Settings dict (see config.load_config)
+        cache: The lookup cache from api_sources.load_disk_cache; snapshotted for the
+            workers, and filled by the online pass in this process
+        processes: Worker processes (None = one per CPU core)
+        status_callback: Optional callable(text, color) for the online pass
+        max_workers: Lookups in flight at once during the online pass (see Scanner)
+
+    Returns:
+        (entries, report): entries in path order, and a run report like Scanner.report()
+        with "offline"/"online" file counts and the duplicate targets of the merged plan.
+    """
+    processes = processes or default_processes()
+    metrics = ScanMetrics()
+    with scan_metrics.activate(metrics), metrics.stage("walk"):
+        files = list(files)
+    shards = shard_files(files, processes * SHARDS_PER_PROCESS)
+    entries, unresolved = [], []
+
+    if not hasattr(cache, "snapshot"):
+        # The cache is the in-memory fallback; nothing to share, so scan everything online
+        unresolved = files
+    elif shards:
+        with tempfile.TemporaryDirectory(prefix="cbz-shards-") as tmp:
+            snapshot_path = os.path.join(tmp, "cache.db")
+            with metrics.stage("snapshot"):
+                cache.snapshot(snapshot_path)
+            with ProcessPoolExecutor(max_workers=min(processes, len(shards)), initializer=_init_worker,
+                                     initargs=(settings, snapshot_path)) as pool:
+                try:
+                    for shard_entries, shard_unresolved, report in pool.map(_scan_shard, shards):
+                        entries.extend(shard_entries)
+                        unresolved.extend(shard_unresolved)
+                        metrics.merge(report)
+                except BaseException:
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    raise
+
+    offline = len(entries)
+    scanner = Scanner(settings, cache, status_callback=status_callback, max_workers=max_workers)
+    if unresolved:
+        # Everything the snapshot couldn't answer goes through the regular pipeline
+        lock = threading.Lock()
+
+        def _collect(entry):
+            with lock:
+                entries.append(entry)
+
+        scanner.scan(unresolved, _collect)
+        metrics.merge(scanner.report())
+    metrics.finish()
+
+    entries.sort(key=lambda e: (e["directory"], e["original"]))
+    dupes = sorted(find_duplicate_targets(entries))
+    report = metrics.report(
+        files=len(files), processes=processes, shards=len(shards),
+        offline=offline, online=len(entries) - offline,
+        duplicates=[os.path.join(directory, name) for directory, name in dupes],
+        settings=scanner.report()["settings"])
+    return entries, report
@@ -0,0 +1,91 @@
+"""Time-to-first-window breakdown for `cbz_file_renamer.py --profile-startup`.
+
+Imported before anything else in the GUI script, so its load time is the
+zero point. The GUI calls STARTUP.mark() after each startup stage (imports,
+Tk, settings, building the window, the window appearing, the first idle
+moment); with --profile-startup it writes the report and exits once the
+window is up.
+
+The report also gives how long the process existed before the zero point
+(interpreter start-up, and unpacking for builds that unpack in-process),
+and which of the modules deferred until the first scan were loaded anyway.
+For the one-file build the bootloader unpacks in a parent process that is
+not counted, so compare the one-folder build or time the launch externally.
+"""
+import ctypes
+import json
+import os
+import sys
+import time
+
+# Modules the GUI imports only when a scan, rename or dialog needs them
+DEFERRED_MODULES = ("scan_engine", "api_sources", "async_api", "http_pool", "ssl", "asyncio",
+                    "rename_executor", "comicinfo", "scan_manifest", "webbrowser", "tkinter.filedialog",
+                    "tkinter.messagebox", "tkinter.simpledialog")
+
+
+def process_age():
+    """Seconds since the OS created this process, or None where that can't be read."""
+    try:
+        if sys.platform == "win32":
+            creation, exit_, kernel, user, now = (ctypes.c_ulonglong() for _ in range(5))
+            kernel32 = ctypes.windll.kernel32
+            if not kernel32.GetProcessTimes(kernel32.GetCurrentProcess(), ctypes.byref(creation),
+                                            ctypes.byref(exit_), ctypes.byref(kernel), ctypes.byref(user)):
+                return None
+            kernel32.GetSystemTimeAsFileTime(ctypes.byref(now))
+            return (now.value - creation.value) / 1e7  # FILETIME counts 100 ns
+        with open("/proc/self/stat") as f:
+            # starttime (field 22, clock ticks after boot) follows the parenthesised command name
+            started = int(f.read().rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/uptime") as f:
+            return float(f.read().split()[0]) - started
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupProfile:
+    """Named checkpoints on the perf_counter clock, relative to when this module loaded."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.before_start = process_age()
+        self.marks = []
+
+    def mark(self, stage):
+        """Record that `stage` just finished."""
+        self.marks.append((stage, time.perf_counter()))
+
+    def report(self):
+        """Return the stages as a dict: per-stage and cumulative ms, plus the deferred-module check."""
+        stages = []
+        previous = self.start
+        for stage, at in self.marks:
+            stages.append({"stage": stage, "ms": round((at - previous) * 1000, 1),
+                           "total_ms": round((at - self.start) * 1000, 1)})
+            previous = at
+        return {
+            "frozen": bool(getattr(sys, "frozen", False)),
+            "before_script_ms": round(self.before_start * 1000, 1) if self.before_start is not None else None,
+            "stages": stages,
+            "modules_loaded": len(sys.modules),
+            "deferred_loaded_early": [name for name in DEFERRED_MODULES if name in sys.modules],
+        }
+
+    def write(self, path):
+        """Write report() as JSON to `path`, and as a table to stdout when there is one."""
+        report = self.report()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        if sys.stdout is None:  # windowed build
+            return
+        if report["before_script_ms"] is not None:
+            print(f"{'process start → script':<28}{report['before_script_ms']:>9.1f} ms")
+        for s in report["stages"]:
+            print(f"{s['stage']:<28}{s['ms']:>9.1f} ms{s['total_ms']:>9.1f} ms total")
+        print(f"{report['modules_loaded']} modules loaded; deferred modules loaded early: "
+              f"{', '.join(report['deferred_loaded_early']) or 'none'}")
+        print(f"Report written to {path}")
+
+
+STARTUP = StartupProfile()
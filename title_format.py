@@ -0,0 +1,103 @@
+"""Tk-free helpers that take apart and reformat the titles the APIs return.
+
+These run once per file while building names, and once per search result in
+the fetchers, so every pattern is compiled once at import time and each
+helper makes as few passes over the title as it can.
+"""
+import re
+from functools import lru_cache
+
+_SUBTITLE_SEPARATORS = r"[:\-\u2013\u2014]"
+
+# pad_volume_in_title: the first number of each kind, tried in this order
+_PAD_PATTERNS = (
+    re.compile(r"((?:Vol\.?|Volume|v\.)\s*)(\d+)", re.IGNORECASE),
+    re.compile(r"((?:Chapter|Ch\.?)\s*)(\d+)", re.IGNORECASE),
+    re.compile(r"(#)(\d+)"),  # ComicVine style
+)
+
+# strip_subtitle_from_title: a volume/issue number followed by a separator and a subtitle
+_STRIP_PATTERNS = (
+    re.compile(r"((?:Vol\.?|Volume|v\.)\s*\d+)\s*" + _SUBTITLE_SEPARATORS + r"\s*.+", re.IGNORECASE),
+    re.compile(r"(#\d+)\s*" + _SUBTITLE_SEPARATORS + r"\s*.+"),
+)
+
+# extract_series_from_title: the series name ends at the first volume or chapter number
+_SERIES_END_RE = re.compile(r"[,:\-]?\s*(?:Vol\.?|Volume|v\.|Chapter|Ch\.?)\s*\d", re.IGNORECASE)
+_TRAILING_NUMBER_RE = re.compile(r"\s+\d+\s*$")
+_SUBTITLE_RE = re.compile(r"(?:Vol\.?|Volume|v\.)\s*\d+\s*(" + _SUBTITLE_SEPARATORS + r")\s*(.+)",
+                          re.IGNORECASE)
+_LEADING_ARTICLE_RE = re.compile(r"^(the|a|an)\s+")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]")
+
+_NO_SERIES = (None, None, None, None)
+
+
+def pad_volume_in_title(raw_title, vol_num_padded):
+    """Replace the volume number in a raw API title with the zero-padded version.
+
+    e.g. "Berserk Volume 1" + "01" -> "Berserk Volume 01"
+         "Berserk, Vol. 3"  + "03" -> "Berserk, Vol. 03"
+         "Berserk #1"       + "01" -> "Berserk #01"
+
+    Vol/Volume numbers are tried first, then Chapter, then "#"; a kind whose first
+    number already reads `vol_num_padded` is passed over for the next one.
+    """
+    for pattern in _PAD_PATTERNS:
+        m = pattern.search(raw_title)
+        if m is not None and m.group(2) != vol_num_padded:
+            return raw_title[:m.start(2)] + vol_num_padded + raw_title[m.end(2):]
+    return raw_title
+
+
+def strip_subtitle_from_title(raw_title):
+    """Remove the subtitle portion from a raw title.
+
+    e.g. "Berserk, Vol. 1: The Black Swordsman" -> "Berserk, Vol. 1"
+         "Berserk #1 - The Black Swordsman"      -> "Berserk #1"
+    """
+    for pattern in _STRIP_PATTERNS:
+        m = pattern.search(raw_title)
+        if m is not None:
+            return raw_title[:m.start()] + m.group(1)
+    return raw_title
+
+
+@lru_cache(maxsize=4096)
+def _match_key(text):
+    """Comparison form of a series name: lower case, no leading article, letters and digits only."""
+    return _NON_ALNUM_RE.sub("", _LEADING_ARTICLE_RE.sub("", text.lower().strip()))
+
+
+def same_series(a, b):
+    """True if two series names are the same once case, leading articles and punctuation are ignored."""
+    return _match_key(a) == _match_key(b)
+
+
+def extract_series_from_title(title, search_term):
+    """Extract (series, raw_title, subtitle, orig_separator) from a book/comic title string.
+
+    Returns all None unless the search term is contained in the series name
+    (compared with _match_key): "Berserk" finds "Berserk Deluxe", but a result
+    missing words of the search, such as "Solo Leveling" for "Solo Leveling
+    Ragnarok", is rejected.
+
+    Returns:
+        series: The clean series name (e.g. "Berserk")
+        raw_title: The original unmodified title from the API (e.g. "Berserk Volume 1")
+        subtitle: Subtitle text if present (e.g. "The Black Swordsman"), or None
+        orig_sep: The separator used before the subtitle in the source (": " or " - ")
+    """
+    end = _SERIES_END_RE.search(title)
+    clean = title[:end.start()] if end is not None else title
+    clean = _TRAILING_NUMBER_RE.sub("", clean).strip(" ,:-")
+    if not clean or _match_key(search_term) not in _match_key(clean):
+        return _NO_SERIES
+
+    subtitle = None
+    orig_sep = " - "
+    sub_match = _SUBTITLE_RE.search(title)
+    if sub_match is not None:
+        subtitle = sub_match.group(2).strip()
+        orig_sep = ": " if sub_match.group(1) == ":" else " - "
+    return clean, title, subtitle, orig_sep
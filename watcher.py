@@ -0,0 +1,330 @@
+"""Watch library folders and rename new arrivals as they land.
+
+New or rewritten .cbz files are collected until they have been quiet for a
+debounce period, then go through the scan engine as one small batch (with
+the scan manifest, only the new files are looked up). Entries whose status
+is in the auto-apply set are renamed through the journaled executor right
+away; the rest are logged for review.
+
+On Linux the folders are watched with inotify (through ctypes, no extra
+dependency), so an idle library costs nothing: the watcher sleeps in
+select() until the kernel reports a change. Elsewhere, or when inotify is
+unavailable or out of watches, the folders are polled.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from config import JOURNAL_DIR
+from filename_parser import sanitize_filename
+from api_sources import save_disk_cache
+from scan_engine import Scanner, library_options, find_duplicate_targets
+from library_walker import walk_cbz_files, walk_folders, accepts_file
+from rename_executor import ROLLBACK_NOTE, apply_renames, new_journal_path
+from comicinfo import embed_entries
+from scan_manifest import file_identity
+from duplicate_index import target_key
+
+DEBOUNCE_SECONDS = 2.0     # quiet time before an arrival is scanned
+POLL_SECONDS = 5.0         # folder poll interval when inotify is not available
+AUTO_APPLY_STATUSES = ("Verified", "Perfect")
+
+# inotify(7)
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE_SELF = 0x00000400
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_Q_OVERFLOW = 0x00004000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_MOVED_FROM | _IN_CREATE | _IN_DELETE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+# ─── Change Sources ───────────────────────────────────────────────────────────
+
+class _Inotify:
+    """Minimal inotify binding. Raises OSError when inotify can't be used."""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        try:
+            self._add = libc.inotify_add_watch
+            init = libc.inotify_init1
+        except AttributeError:
+            raise OSError("inotify is not supported by this C library")
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths = {}  # watch descriptor -> directory
+
+    def add(self, directory):
+        wd = self._add(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"Cannot watch '{directory}': {os.strerror(errno)}")
+        self.paths[wd] = directory
+
+    def read(self):
+        """Yield (directory, name, mask) for every queued event."""
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            pos = 0
+            while pos + _EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, pos)
+                pos += _EVENT_HEADER.size
+                name = os.fsdecode(data[pos:pos + length].rstrip(b"\0"))
+                pos += length
+                if mask & _IN_IGNORED:
+                    self.paths.pop(wd, None)
+                    continue
+                yield self.paths.get(wd), name, mask
+
+    def close(self):
+        os.close(self.fd)
+
+
+# ─── Watcher ──────────────────────────────────────────────────────────────────
+
+class LibraryWatcher:
+    """Rename .cbz files arriving under `roots` until stop() is called.
+
+    Args:
+        roots: Library folders to watch (the library scan settings decide subfolders)
+        settings: Settings dict (see config.load_config)
+        cache: Lookup cache shared with the fetchers
+        cache_path: Where to save `cache` after each batch (None = don't save)
+        manifest: Optional scan_manifest.ScanManifest
+        auto_apply: Statuses that are renamed without review
+        debounce: Seconds a file must be quiet before it is scanned
+        poll_interval: Folder poll interval when inotify is not used
+        use_inotify: False forces polling
+        workers: Lookups in flight per batch (None = the Scanner default)
+        log: Callable(text) for progress messages
+    """
+
+    def __init__(self, roots, settings, cache, cache_path=None, manifest=None,
+                 auto_apply=AUTO_APPLY_STATUSES, debounce=DEBOUNCE_SECONDS,
+                 poll_interval=POLL_SECONDS, use_inotify=True, workers=None, log=print):
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.settings = settings
+        self.cache = cache
+        self.cache_path = cache_path
+        self.manifest = manifest
+        self.auto_apply = set(auto_apply)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.workers = workers
+        self.log = log
+        self.options = library_options(settings)
+        self._pending = {}        # path -> monotonic time it becomes due
+        self._own = {}            # path -> identity of a file we just renamed or rewrote
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = os.pipe()
+
+    def stop(self):
+        """Ask run() to return; safe to call from any thread or a signal handler."""
+        self._stop.set()
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b"x")
+            except OSError:
+                pass
+
+    def run(self, scan_existing=False):
+        """Watch until stop(). With scan_existing, files already present are processed first."""
+        notify = None
+        try:
+            if self.use_inotify:
+                try:
+                    notify = _Inotify()
+                    for root in self.roots:
+                        for directory in walk_folders(root, recursive=self.options["recursive"],
+                                                      exclude=self.options["exclude"],
+                                                      max_depth=self.options["max_depth"]):
+                            notify.add(directory)
+                except OSError as e:
+                    if notify is not None:
+                        notify.close()
+                        notify = None
+                    self.log(f"inotify unavailable ({e}); polling every {self.poll_interval:g}s")
+
+            # Watches are in place first, so nothing arriving during this pass is missed
+            if scan_existing:
+                for root in self.roots:
+                    for directory, name in walk_cbz_files(root, **self.options):
+                        self._pending[os.path.join(directory, name)] = 0.0
+                self._process_due()
+
+            if notify is not None:
+                self.log(f"Watching {len(notify.paths)} folder(s)")
+                self._run_inotify(notify)
+            else:
+                self._run_polling()
+        finally:
+            if notify is not None:
+                notify.close()
+            wake_r, wake_w, self._wake_w = self._wake_r, self._wake_w, None
+            os.close(wake_r)
+            os.close(wake_w)
+
+    # ─── Event Loops ─────────────────────────────────────────────
+
+    def _timeout(self):
+        """Seconds until the next pending file is due, or None to sleep until an event."""
+        if not self._pending:
+            return None
+        return max(0.0, min(self._pending.values()) - time.monotonic())
+
+    def _run_inotify(self, notify):
+        while not self._stop.is_set():
+            ready, _, _ = select.select([notify.fd, self._wake_r], [], [], self._timeout())
+            if notify.fd in ready:
+                for directory, name, mask in notify.read():
+                    if mask & _IN_Q_OVERFLOW:
+                        self.log("Too many changes at once; rescanning watched folders")
+                        self._queue_all()
+                    elif directory is None:
+                        continue
+                    elif mask & _IN_ISDIR:
+                        if mask & (_IN_CREATE | _IN_MOVED_TO):
+                            self._add_folder(notify, os.path.join(directory, name))
+                    elif mask & (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE):
+                        self._touch(os.path.join(directory, name))
+                    elif mask & _IN_MOVED_FROM:
+                        self._pending.pop(os.path.join(directory, name), None)
+            self._process_due()
+
+    def _add_folder(self, notify, folder):
+        """Start watching a new subfolder (and its subfolders) and queue the files moved in with it."""
+        root = next((r for r in self.roots if folder.startswith(r + os.sep)), None)
+        if root is None or not self.options["recursive"]:
+            return
+        for directory in walk_folders(folder, recursive=True):
+            # A folder is watched if files directly inside it would be scanned
+            if not accepts_file(root, os.path.join(directory, "_.cbz"), recursive=True,
+                                exclude=self.options["exclude"], max_depth=self.options["max_depth"]):
+                continue
+            try:
+                notify.add(directory)
+            except OSError as e:
+                self.log(str(e))
+            for _, name in walk_cbz_files(directory):
+                self._touch(os.path.join(directory, name))
+
+    def _queue_all(self):
+        for root in self.roots:
+            for directory, name in walk_cbz_files(root, **self.options):
+                self._touch(os.path.join(directory, name))
+
+    def _snapshot(self):
+        snapshot = {}
+        for root in self.roots:
+            for directory, name, st in walk_cbz_files(root, with_stat=True, **self.options):
+                snapshot[os.path.join(directory, name)] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def _run_polling(self):
+        previous = self._snapshot()
+        self.log(f"Polling {len(self.roots)} folder(s) every {self.poll_interval:g}s")
+        while not self._stop.is_set():
+            timeout = self._timeout()
+            self._stop.wait(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+            if self._stop.is_set():
+                break
+            current = self._snapshot()
+            for path, state in current.items():
+                if previous.get(path) != state:
+                    self._touch(path)  # a file still growing keeps pushing its deadline back
+            previous = current
+            self._process_due()
+
+    # ─── Batches ─────────────────────────────────────────────────
+
+    def _touch(self, path):
+        root = next((r for r in self.roots if path.startswith(r + os.sep)), None)
+        if root is not None and accepts_file(root, path, **self.options):
+            self._pending[path] = time.monotonic() + self.debounce
+
+    def _process_due(self):
+        now = time.monotonic()
+        due = sorted(path for path, deadline in self._pending.items() if deadline <= now)
+        if not due:
+            return
+        for path in due:
+            del self._pending[path]
+
+        items = []
+        for path in due:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # moved away or deleted again before it settled
+            if self._own.pop(path, None) == file_identity(st):
+                continue  # our own rename or ComicInfo write
+            items.append((os.path.dirname(path), os.path.basename(path), st))
+        if items:
+            try:
+                self._process(items)
+            except Exception as e:
+                self.log(f"Watch batch failed: {e}")
+
+    def _process(self, items):
+        entries = []
+        lock = threading.Lock()
+
+        def _collect(entry):
+            with lock:
+                entries.append(entry)
+
+        scanner = Scanner(self.settings, self.cache, manifest=self.manifest, max_workers=self.workers)
+        scanner.scan(items, _collect, prune=False)
+        if self.cache_path:
+            save_disk_cache(self.cache, self.cache_path)
+
+        ready, held = [], []
+        for entry in sorted(entries, key=lambda e: (e["directory"], e["original"])):
+            if entry["original"] == entry["final"]:
+                continue
+            (ready if entry["status"] in self.auto_apply else held).append(entry)
+        # Hold every entry of a clash, whatever case its target is spelled in
+        dupes = {target_key(directory, final) for directory, final in find_duplicate_targets(ready)}
+        held.extend(e for e in ready if target_key(e["directory"], e["final"]) in dupes)
+        ready = [e for e in ready if target_key(e["directory"], e["final"]) not in dupes]
+
+        for entry in held:
+            self.log(f"Needs review ({entry['status']}): {os.path.join(entry['directory'], entry['original'])}")
+        if not ready:
+            return
+
+        renamed, _, errors = apply_renames(ready, journal_path=new_journal_path(JOURNAL_DIR))
+        failed = {path for path, _ in errors}
+        if self.settings.get("embed_comicinfo") and ROLLBACK_NOTE not in failed:
+            _, embed_errors = embed_entries(ready, skip=failed)
+            errors = errors + embed_errors
+        for entry in ready:
+            if os.path.join(entry["directory"], entry["original"]) in failed:
+                continue
+            path = os.path.join(entry["directory"], sanitize_filename(entry["final"]))
+            try:
+                self._own[path] = file_identity(os.stat(path))
+            except OSError:
+                pass
+        for old, new in renamed:
+            self.log(f"Renamed: {old} -> {new}")
+        for name, err in errors:
+            self.log(f"{name}: {err}")